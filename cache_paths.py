@@ -0,0 +1,7 @@
+import os
+
+# -------------------------------
+# Local cache directory
+# -------------------------------
+# Every on-disk cache, index and log the dashboard keeps lives under this directory
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aws-cost-dashboard")
@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from cache_paths import CACHE_DIR
+
+# -------------------------------
+# Cache settings
+# -------------------------------
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "cost_explorer.sqlite")
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+# Cost Explorer keeps revising recent days (estimated charges, late usage records).
+# Days older than this window are treated as final and never expire.
+FINALIZATION_DAYS = 3
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], "%Y-%m-%d").date()
+
+
+def iter_days(start_date, end_date):
+    # Cost Explorer ranges are end-exclusive
+    day = _as_date(start_date)
+    end_date = _as_date(end_date)
+    while day < end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def contiguous_ranges(days):
+    # Collapse sorted days into [start, end) runs so each gap costs one request
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [tuple(r) for r in ranges]
+
+
+def make_query_key(granularity, group_by, metric):
+    group_by = group_by or []
+    groups = ",".join(f"{g['Type']}:{g['Key']}" for g in group_by)
+    return f"{granularity}|{groups}|{metric}"
+
+
+# -------------------------------
+# Persistent day-partitioned cache
+# -------------------------------
+class CostExplorerCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 finalization_days=FINALIZATION_DAYS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.finalization_days = finalization_days
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Streamlit runs each session on its own thread, so share one guarded connection
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cost_days ("
+            " query_key TEXT NOT NULL,"
+            " day TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " rows TEXT NOT NULL,"
+            " PRIMARY KEY (query_key, day))"
+        )
+        self._conn.commit()
+
+    def is_final(self, day, today=None):
+        today = today or datetime.utcnow().date()
+        return _as_date(day) < today - timedelta(days=self.finalization_days)
+
+    def _is_fresh(self, day, fetched_at, now):
+        if self.is_final(day, datetime.utcfromtimestamp(now).date()):
+            return True
+        return now - fetched_at < self.ttl_seconds
+
+    def get(self, query_key, days, now=None):
+        now = now or time.time()
+        wanted = {d.isoformat(): d for d in days}
+        if not wanted:
+            return {}, []
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT day, fetched_at, rows FROM cost_days WHERE query_key = ? AND day >= ? AND day <= ?",
+                (query_key, min(wanted), max(wanted))
+            )
+            records = cursor.fetchall()
+
+        cached = {}
+        for day_str, fetched_at, rows in records:
+            if day_str in wanted and self._is_fresh(wanted[day_str], fetched_at, now):
+                cached[wanted[day_str]] = json.loads(rows)
+        missing = [d for d in wanted.values() if d not in cached]
+        return cached, missing
+
+    def put(self, query_key, rows_by_day, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cost_days (query_key, day, fetched_at, rows) VALUES (?, ?, ?, ?)",
+                [(query_key, _as_date(day).isoformat(), fetched_at, json.dumps(rows))
+                 for day, rows in rows_by_day.items()]
+            )
+            self._conn.commit()
+
+    def evict_expired(self, now=None):
+        now = now or time.time()
+        final_before = (datetime.utcfromtimestamp(now).date()
+                        - timedelta(days=self.finalization_days)).isoformat()
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM cost_days WHERE day >= ? AND fetched_at < ?",
+                (final_before, now - self.ttl_seconds)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cost_days")
+            self._conn.commit()
+
+
+# -------------------------------
+# Cached range query
+# -------------------------------
+def cached_cost_query(cache, fetch_range, start_date, end_date, granularity="DAILY",
+                      group_by=None, metric="UnblendedCost", refresh=False):
+    # fetch_range(start, end) must return row dicts carrying an ISO "Date" field
+    query_key = make_query_key(granularity, group_by, metric)
+
+    if granularity == "MONTHLY":
+        # Monthly buckets do not split by day, so the exact range is the cache slot
+        query_key = f"{query_key}|{_as_date(start_date)}:{_as_date(end_date)}"
+        days = [_as_date(start_date)]
+    else:
+        days = list(iter_days(start_date, end_date))
+
+    cache.evict_expired()
+    cached, missing = cache.get(query_key, days)
+    if refresh:
+        # A manual refresh re-fetches everything that Cost Explorer may still revise
+        stale = [d for d in cached if granularity == "MONTHLY" or not cache.is_final(d)]
+        for day in stale:
+            del cached[day]
+        missing.extend(stale)
+
+    if granularity == "MONTHLY":
+        missing_ranges = [(_as_date(start_date), _as_date(end_date))] if missing else []
+    else:
+        missing_ranges = contiguous_ranges(missing)
+
+    for range_start, range_end in missing_ranges:
+        rows = fetch_range(range_start, range_end)
+        fetched = {d: [] for d in (days if granularity == "MONTHLY" else iter_days(range_start, range_end))}
+        for row in rows:
+            slot = days[0] if granularity == "MONTHLY" else _as_date(row["Date"])
+            fetched.setdefault(slot, []).append(row)
+        cache.put(query_key, fetched)
+        cached.update(fetched)
+
+    return [row for day in sorted(cached) for row in cached[day]]
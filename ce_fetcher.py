@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from ce_cache import _as_date
+from throttling import RateLimiter
+
+# -------------------------------
+# Fetch settings
+# -------------------------------
+# Cost Explorer throttles GetCostAndUsage at roughly 5 requests per second per account
+CE_MAX_TPS = 5
+DEFAULT_MAX_WORKERS = 4
+
+
+def month_windows(start_date, end_date):
+    # Split [start, end) on calendar-month boundaries
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    windows = []
+    window_start = start_date
+    while window_start < end_date:
+        next_month = (window_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        window_end = min(next_month, end_date)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+
+# -------------------------------
+# Paginated fetch of a single window
+# -------------------------------
+def fetch_window(ce, limiter, start_date, end_date, granularity, metrics, group_by):
+    request = {
+        "TimePeriod": {"Start": start_date.strftime("%Y-%m-%d"), "End": end_date.strftime("%Y-%m-%d")},
+        "Granularity": granularity,
+        "Metrics": list(metrics),
+    }
+    if group_by:
+        request["GroupBy"] = list(group_by)
+
+    results = []
+    while True:
+        limiter.acquire()
+        response = ce.get_cost_and_usage(**request)
+        results.extend(response["ResultsByTime"])
+        token = response.get("NextPageToken")
+        if not token:
+            return results
+        request["NextPageToken"] = token
+
+
+def merge_results_by_time(results):
+    # A page break can land in the middle of a period's groups, so the same period may
+    # show up on consecutive pages; fold those back into one entry.
+    merged = []
+    by_start = {}
+    for result in results:
+        start = result["TimePeriod"]["Start"]
+        existing = by_start.get(start)
+        if existing is None:
+            entry = dict(result)
+            entry["Groups"] = list(result.get("Groups", []))
+            by_start[start] = entry
+            merged.append(entry)
+        else:
+            existing["Groups"].extend(result.get("Groups", []))
+            if not existing.get("Total") and result.get("Total"):
+                existing["Total"] = result["Total"]
+    return sorted(merged, key=lambda r: r["TimePeriod"]["Start"])
+
+
+# -------------------------------
+# Sharded, rate-limited fetch of a full range
+# -------------------------------
+def fetch_cost_and_usage(ce, start_date, end_date, granularity="DAILY", metrics=("UnblendedCost",),
+                         group_by=None, max_workers=DEFAULT_MAX_WORKERS, max_tps=CE_MAX_TPS,
+                         limiter=None):
+    limiter = limiter or RateLimiter(max_tps)
+    windows = month_windows(start_date, end_date)
+
+    def fetch(window):
+        return fetch_window(ce, limiter, window[0], window[1], granularity, metrics, group_by)
+
+    # pool.map keeps window order, so the stitched result stays chronological
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as pool:
+        pages = [result for window_results in pool.map(fetch, windows) for result in window_results]
+
+    return merge_results_by_time(pages)
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Chart payload settings
+# -------------------------------
+# A wide-layout chart is roughly this many pixels across; more points than that are invisible
+DEFAULT_MAX_POINTS = 1000
+DEFAULT_BINS = 20
+
+
+# -------------------------------
+# Server-side aggregates
+# -------------------------------
+def status_counts(status):
+    counts = status.value_counts(sort=True)
+    counts = counts[counts > 0]
+    return pd.DataFrame({"status": counts.index.astype(str), "count": counts.to_numpy()})
+
+
+def histogram_bins(values, bins=DEFAULT_BINS):
+    # Returns one row per bin (left edge, right edge, centre, count) instead of every value
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return pd.DataFrame(columns=["left", "right", "center", "count"])
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame({"left": edges[:-1], "right": edges[1:],
+                         "center": (edges[:-1] + edges[1:]) / 2, "count": counts})
+
+
+# -------------------------------
+# Largest-Triangle-Three-Buckets downsampling
+# -------------------------------
+def lttb_indices(x, y, threshold=DEFAULT_MAX_POINTS):
+    # Keeps the first and last points and, from each bucket in between, the point forming
+    # the largest triangle with the previous pick and the next bucket's mean
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        picked[bucket + 1] = previous
+    return picked
+
+
+def downsample(df, x, y, group=None, max_points=DEFAULT_MAX_POINTS):
+    # LTTB per series (per group), so every line keeps its own peaks and troughs
+    if group is None:
+        frames = [df]
+    else:
+        frames = [part for _, part in df.groupby(group, observed=True, sort=False)]
+
+    kept = []
+    for part in frames:
+        part = part.sort_values(x)
+        if len(part) <= max_points:
+            kept.append(part)
+            continue
+        xs = part[x]
+        if not pd.api.types.is_numeric_dtype(xs):
+            # Dates (datetime64 or the datetime.date objects Arrow hands back) as epoch numbers
+            xs = pd.to_datetime(xs).astype("int64")
+        ys = pd.to_numeric(part[y], errors="coerce").fillna(0)
+        kept.append(part.iloc[lttb_indices(xs.to_numpy(), ys.to_numpy(), max_points)])
+    return pd.concat(kept, ignore_index=True) if kept else df.iloc[:0]
+
+
+# -------------------------------
+# Payload comparison
+# -------------------------------
+def run_benchmark(rows=50_000):
+    import plotly.express as px
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "status": pd.Categorical(rng.choice(["idle", "active", "error"], rows)),
+        "avg_cpu": (rng.random(rows) * 60).astype(np.float32),
+    })
+    full_hist = px.histogram(df, x="avg_cpu", nbins=DEFAULT_BINS).to_json()
+    bins = histogram_bins(df["avg_cpu"])
+    agg_hist = px.bar(bins, x="center", y="count").to_json()
+    print(f"histogram payload: {len(full_hist) / 1024:,.0f} KiB raw vs {len(agg_hist) / 1024:,.1f} KiB binned")
+
+    days = pd.date_range("2024-01-01", periods=rows, freq="h")
+    series = pd.DataFrame({"Date": days, "Cost": np.abs(np.cumsum(rng.standard_normal(rows))),
+                           "Service": "Amazon EC2"})
+    full_line = px.line(series, x="Date", y="Cost").to_json()
+    small_line = px.line(downsample(series, "Date", "Cost"), x="Date", y="Cost").to_json()
+    print(f"line payload: {len(full_line) / 1024:,.0f} KiB raw vs {len(small_line) / 1024:,.1f} KiB LTTB")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,115 @@
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from cache_paths import CACHE_DIR
+from ce_cache import FINALIZATION_DAYS, contiguous_ranges, iter_days, _as_date
+
+# -------------------------------
+# Store layout
+# -------------------------------
+# <root>/Date=YYYY-MM-DD/part.parquet, one file per day. An empty file marks a day
+# that was fetched and had no spend, so it is never re-fetched.
+DEFAULT_STORE_PATH = os.path.join(CACHE_DIR, "cost_store")
+PART_FILE = "part.parquet"
+
+COST_SCHEMA = pa.schema([
+    ("Service", pa.string()),
+    ("UsageType", pa.string()),
+    ("Cost", pa.float64()),
+])
+PARTITION_SCHEMA = pa.schema([("Date", pa.string())])
+DATASET_SCHEMA = pa.unify_schemas([COST_SCHEMA, PARTITION_SCHEMA])
+
+
+class CostStore:
+    def __init__(self, root=DEFAULT_STORE_PATH, finalization_days=FINALIZATION_DAYS):
+        self.root = root
+        self.finalization_days = finalization_days
+        os.makedirs(root, exist_ok=True)
+
+    def _partition_dir(self, day):
+        return os.path.join(self.root, f"Date={_as_date(day).isoformat()}")
+
+    def stored_days(self):
+        days = set()
+        for name in os.listdir(self.root):
+            if name.startswith("Date=") and os.path.exists(os.path.join(self.root, name, PART_FILE)):
+                days.add(_as_date(name[len("Date="):]))
+        return days
+
+    def days_to_sync(self, start_date, end_date, today):
+        # Missing days, plus stored days Cost Explorer may still revise
+        stored = self.stored_days()
+        final_before = today.toordinal() - self.finalization_days
+        return [d for d in iter_days(start_date, end_date)
+                if d not in stored or d.toordinal() >= final_before]
+
+    def write_day(self, day, rows):
+        table = pa.Table.from_pylist(
+            [{"Service": r["Service"], "UsageType": r.get("UsageType", ""), "Cost": float(r["Cost"])}
+             for r in rows],
+            schema=COST_SCHEMA
+        )
+        partition = self._partition_dir(day)
+        os.makedirs(partition, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a half-written file
+        tmp_path = os.path.join(partition, f".{uuid.uuid4().hex}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(partition, PART_FILE))
+
+    # -------------------------------
+    # Lazy reads with predicate pushdown
+    # -------------------------------
+    def dataset(self):
+        return ds.dataset(self.root, format="parquet", schema=DATASET_SCHEMA,
+                          partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+                          exclude_invalid_files=True)
+
+    def _filter(self, start_date, end_date, services=None):
+        expr = ((ds.field("Date") >= _as_date(start_date).isoformat())
+                & (ds.field("Date") < _as_date(end_date).isoformat()))
+        if services:
+            expr = expr & ds.field("Service").isin(list(services))
+        return expr
+
+    def scan(self, start_date, end_date, services=None, columns=None):
+        # Date prunes whole partitions; Service is pushed down to row-group statistics
+        return self.dataset().to_table(columns=columns,
+                                       filter=self._filter(start_date, end_date, services))
+
+    def read(self, start_date, end_date, services=None):
+        return self.scan(start_date, end_date, services).to_pandas()
+
+    def daily_by_service(self, start_date, end_date, services=None):
+        table = self.scan(start_date, end_date, services, columns=["Date", "Service", "Cost"])
+        grouped = table.group_by(["Date", "Service"]).aggregate([("Cost", "sum")])
+        return (grouped.rename_columns(["Date", "Service", "Cost"]).to_pandas()
+                .sort_values(["Date", "Service"], ignore_index=True))
+
+    def service_totals(self, start_date, end_date, services=None):
+        table = self.scan(start_date, end_date, services, columns=["Service", "Cost"])
+        grouped = table.group_by("Service").aggregate([("Cost", "sum")])
+        return grouped.rename_columns(["Service", "Cost"]).to_pandas()
+
+    def total_cost(self, start_date, end_date, services=None):
+        table = self.scan(start_date, end_date, services, columns=["Cost"])
+        return pc.sum(table["Cost"]).as_py() or 0.0
+
+
+# -------------------------------
+# Incremental sync from Cost Explorer
+# -------------------------------
+def sync_cost_store(store, fetch_range, start_date, end_date, today):
+    # fetch_range(start, end) returns row dicts with Date/Service/UsageType/Cost
+    days = store.days_to_sync(start_date, end_date, _as_date(today))
+    for range_start, range_end in contiguous_ranges(days):
+        rows = fetch_range(range_start, range_end)
+        by_day = {d: [] for d in iter_days(range_start, range_end)}
+        for row in rows:
+            by_day.setdefault(_as_date(row["Date"]), []).append(row)
+        for day, day_rows in by_day.items():
+            store.write_day(day, day_rows)
+    return days
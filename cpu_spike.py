@@ -1,26 +1,101 @@
+import json
+import multiprocessing
+import os
+import sys
 import time
 
-def simulate_cpu_spike(duration=30, cpu_percent=80):
-    print(f"Simulating CPU spike at {cpu_percent}%...")
-    start_time = time.time()
+# -------------------------------
+# Load generator settings
+# -------------------------------
+# Each worker runs busy for cpu_percent of every slice and sleeps the rest; short slices
+# keep the 1-minute CloudWatch average flat instead of saw-toothed
+DEFAULT_SLICE_SECONDS = 0.1
+# Standard library only: this file is pushed to instances as-is over SSM
 
-    # Calculate the number of iterations needed to achieve the desired CPU utilization
-    target_percent = cpu_percent / 100
-    total_iterations = int(target_percent * 5_000_000)  # Adjust the number as needed
 
-    # Perform simple arithmetic operations to spike CPU utilization
-    for _ in range(total_iterations):
-        result = 0
-        for i in range(1, 1001):
-            result += i
+def _cpu_times():
+    # (busy, total) jiffies for the whole machine from /proc/stat; None off Linux
+    try:
+        with open("/proc/stat") as f:
+            fields = [int(v) for v in f.readline().split()[1:]]
+    except OSError:
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    return sum(fields) - idle, sum(fields)
 
-    # Wait for the rest of the time interval
-    elapsed_time = time.time() - start_time
-    remaining_time = max(0, duration - elapsed_time)
-    time.sleep(remaining_time)
 
+# -------------------------------
+# Duty-cycle worker (one per core)
+# -------------------------------
+def _burn(target, start_at, duration, slice_seconds, results):
+    # Slices are scheduled against absolute deadlines, so a late wake-up shortens the
+    # next sleep instead of drifting the whole run
+    busy_seconds = slice_seconds * target
+    end_at = start_at + duration
+    while time.monotonic() < start_at:
+        time.sleep(min(0.01, max(0.0, start_at - time.monotonic())))
+    cpu_started = time.process_time()
+    deadline = start_at
+    while deadline < end_at:
+        busy_until = min(deadline + busy_seconds, end_at)
+        x = 0
+        while time.monotonic() < busy_until:
+            for i in range(200):
+                x += i
+        deadline += slice_seconds
+        pause = min(deadline, end_at) - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+    results.put(time.process_time() - cpu_started)
+
+
+def simulate_cpu_spike(duration=30, cpu_percent=80, workers=None, slice_seconds=DEFAULT_SLICE_SECONDS):
+    # Holds cpu_percent across every core for the full duration and returns the target
+    # next to what the machine actually reported
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    target = min(max(cpu_percent, 0), 100) / 100
+    print(f"Simulating CPU spike at {cpu_percent}% on {workers} worker(s) / {cores} core(s) for {duration}s...")
+
+    results = multiprocessing.Queue()
+    start_at = time.monotonic() + 0.2
+    processes = [multiprocessing.Process(target=_burn, args=(target, start_at, duration, slice_seconds, results),
+                                         daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    while time.monotonic() < start_at:
+        time.sleep(0.01)
+    before = _cpu_times()
+    started = time.monotonic()
+    worker_cpu = [results.get() for _ in processes]
+    elapsed = time.monotonic() - started
+    after = _cpu_times()
+    for process in processes:
+        process.join()
+
+    report = {
+        "target_cpu_percent": float(cpu_percent),
+        # Share of the whole machine the workers themselves consumed
+        "achieved_cpu_percent": round(100 * sum(worker_cpu) / (cores * elapsed), 2),
+        # Whole-machine utilization as the kernel (and CloudWatch) sees it, including other load
+        "system_cpu_percent": None,
+        "cores": cores,
+        "workers": workers,
+        "duration_seconds": round(elapsed, 2),
+    }
+    if before and after and after[1] > before[1]:
+        report["system_cpu_percent"] = round(100 * (after[0] - before[0]) / (after[1] - before[1]), 2)
+    print(f"target {report['target_cpu_percent']:.1f}% | achieved {report['achieved_cpu_percent']:.1f}%"
+          f" | system {report['system_cpu_percent'] if report['system_cpu_percent'] is not None else 'n/a'}%"
+          f" over {report['duration_seconds']}s")
     print("CPU spike simulation completed.")
+    return report
+
 
 if __name__ == '__main__':
-    # Simulate a CPU spike for 30 seconds with 80% CPU utilization
-    simulate_cpu_spike(duration=30, cpu_percent=80)
+    # python3 cpu_spike.py [duration] [cpu_percent] [workers]; prints a JSON report on the last line
+    args = sys.argv[1:]
+    report = simulate_cpu_spike(duration=float(args[0]) if args[0:] else 30,
+                                cpu_percent=float(args[1]) if args[1:] else 80,
+                                workers=int(args[2]) if args[2:] else None)
+    print(json.dumps(report))
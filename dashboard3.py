@@ -1,9 +1,19 @@
 import streamlit as st
 import boto3
-import json
 import pandas as pd
+import time
 import plotly.express as px
 from datetime import datetime, timedelta
+from analysis_stream import read_analysis_header
+from ce_cache import CostExplorerCache, cached_cost_query
+from ce_fetcher import CE_MAX_TPS, fetch_cost_and_usage
+from chart_data import downsample
+from cost_store import CostStore, sync_cost_store
+from pricing_catalog import default_catalog
+from s3_cache import S3ObjectCache
+from stale_cleanup import RESOURCE_ID_FIELDS, AuditLog, iter_cleanup
+from stale_scanner import RESOURCE_TYPES, iter_stale_resources, list_enabled_regions, total_estimated_savings
+from throttling import RateLimiter
 
 # -------------------------------
 # Streamlit Page Configuration
@@ -29,12 +39,17 @@ def get_aws_clients():
 # -------------------------------
 # Helper: Read JSON from S3
 # -------------------------------
-def get_lambda_results_from_s3(bucket_name, key):
+@st.cache_resource
+def get_s3_cache():
+    return S3ObjectCache()
+
+
+def get_lambda_results_from_s3(bucket_name, key, force_revalidate=False):
     try:
         clients = get_aws_clients()
-        response = clients["s3"].get_object(Bucket=bucket_name.strip(), Key=key.strip())
-        data = json.loads(response["Body"].read())
-        return data
+        # Revalidate the local copy with its ETag; this page only needs metadata and summary
+        with get_s3_cache().open(clients["s3"], bucket_name, key, force_revalidate) as body:
+            return read_analysis_header(body)
     except Exception as e:
         st.error(f"Error reading from S3: {str(e)}")
         return None
@@ -42,92 +57,163 @@ def get_lambda_results_from_s3(bucket_name, key):
 # -------------------------------
 # Helper: Fetch Cost Explorer Data
 # -------------------------------
-def fetch_cost_explorer_data(start_date=None, end_date=None, granularity="DAILY"):
+COST_GROUP_BY = [{"Type": "DIMENSION", "Key": "SERVICE"}, {"Type": "DIMENSION", "Key": "USAGE_TYPE"}]
+COST_METRIC = "UnblendedCost"
+# Cost Explorer exposes at most 13 months of daily history
+COST_HISTORY_DAYS = 395
+
+
+@st.cache_resource
+def get_cost_cache():
+    return CostExplorerCache()
+
+
+@st.cache_resource
+def get_cost_store():
+    return CostStore()
+
+
+@st.cache_resource
+def get_cost_explorer_limiter():
+    # One budget for every session, since the Cost Explorer throttle is per account
+    return RateLimiter(CE_MAX_TPS)
+
+
+def query_cost_explorer(start_date, end_date, granularity="DAILY"):
     ce = get_aws_clients()["ce"]
 
+    # Follows NextPageToken and fetches month-sized windows concurrently
+    results = fetch_cost_and_usage(
+        ce, start_date, end_date,
+        granularity=granularity,
+        metrics=[COST_METRIC],
+        group_by=COST_GROUP_BY,
+        limiter=get_cost_explorer_limiter()
+    )
+
+    rows = []
+    for result in results:
+        time_period = result["TimePeriod"]["Start"]
+        for group in result.get("Groups", []):
+            service, usage_type = group["Keys"]
+            amount = float(group["Metrics"][COST_METRIC]["Amount"])
+            rows.append({"Date": time_period, "Service": service, "UsageType": usage_type, "Cost": amount})
+
+    return rows
+
+
+def fetch_cost_explorer_data(start_date=None, end_date=None, granularity="DAILY", refresh=False):
     if not end_date:
         end_date = datetime.utcnow().date()
     if not start_date:
         start_date = end_date - timedelta(days=7)
 
-    response = ce.get_cost_and_usage(
-        TimePeriod={
-            "Start": start_date.strftime("%Y-%m-%d"),
-            "End": end_date.strftime("%Y-%m-%d")
-        },
-        Granularity=granularity,
-        Metrics=["UnblendedCost"],
-        GroupBy=[{"Type": "DIMENSION", "Key": "SERVICE"}]
+    # Only days missing from (or expired in) the local cache hit Cost Explorer
+    rows = cached_cost_query(
+        get_cost_cache(),
+        lambda range_start, range_end: query_cost_explorer(range_start, range_end, granularity),
+        start_date, end_date,
+        granularity=granularity, group_by=COST_GROUP_BY, metric=COST_METRIC, refresh=refresh
     )
 
-    rows = []
-    for result in response["ResultsByTime"]:
-        time_period = result["TimePeriod"]["Start"]
-        for group in result.get("Groups", []):
-            service = group["Keys"][0]
-            amount = float(group["Metrics"]["UnblendedCost"]["Amount"])
-            rows.append({"Date": time_period, "Service": service, "Cost": amount})
+    return pd.DataFrame(rows, columns=["Date", "Service", "UsageType", "Cost"])
+
 
-    return pd.DataFrame(rows)
+def sync_cost_history(start_date, end_date, refresh=False):
+    # Append days the Parquet store lacks (and re-write days Cost Explorer may still revise)
+    return sync_cost_store(
+        get_cost_store(),
+        lambda range_start, range_end: fetch_cost_explorer_data(range_start, range_end,
+                                                                refresh=refresh).to_dict("records"),
+        start_date, end_date, today=datetime.utcnow().date()
+    )
 
 # -------------------------------
 # Helper: Detect Stale Resources with Cost Estimation
 # -------------------------------
-def detect_stale_resources_with_cost():
-    clients = get_aws_clients()
-    ec2 = clients["ec2"]
-
-    # Pricing assumptions
-    EBS_COST_PER_GB = 0.10
-    EIP_COST_PER_MONTH = 3.6
-    SNAPSHOT_COST_PER_GB = 0.05
-
-    # 1️⃣ Unattached EBS Volumes
-    volumes = ec2.describe_volumes(Filters=[{"Name": "status", "Values": ["available"]}])
-    unattached_volumes = [
-        {
-            "VolumeId": v["VolumeId"],
-            "Size (GiB)": v["Size"],
-            "CreationDate": v["CreateTime"].strftime("%Y-%m-%d"),
-            "Region": ec2.meta.region_name,
-            "EstimatedMonthlyCost($)": round(v["Size"] * EBS_COST_PER_GB, 2)
-        }
-        for v in volumes["Volumes"]
-    ]
-
-    # 2️⃣ Unassociated Elastic IPs
-    addresses = ec2.describe_addresses()
-    unassociated_eips = [
-        {
-            "PublicIp": addr["PublicIp"],
-            "AllocationId": addr["AllocationId"],
-            "Domain": addr.get("Domain", "N/A"),
-            "EstimatedMonthlyCost($)": EIP_COST_PER_MONTH
-        }
-        for addr in addresses["Addresses"] if "InstanceId" not in addr
-    ]
-
-    # 3️⃣ Old Snapshots (older than 60 days
-    snapshots = ec2.describe_snapshots(OwnerIds=['self'])
-    cutoff_date = datetime.utcnow() - timedelta(days=60)
-    old_snapshots = [
-        {
-            "SnapshotId": s["SnapshotId"],
-            "VolumeId": s["VolumeId"],
-            "StartTime": s["StartTime"].strftime("%Y-%m-%d"),
-            "State": s["State"],
-            "Size (GiB)": s.get("VolumeSize", 0),
-            "EstimatedMonthlyCost($)": round(s.get("VolumeSize", 0) * SNAPSHOT_COST_PER_GB, 2)
-        }
-        for s in snapshots["Snapshots"] if s["StartTime"].replace(tzinfo=None) < cutoff_date
-    ]
-
-    total_savings = sum(v["EstimatedMonthlyCost($)"] for v in unattached_volumes) \
-                    + sum(e["EstimatedMonthlyCost($)"] for e in unassociated_eips) \
-                    + sum(s["EstimatedMonthlyCost($)"] for s in old_snapshots)
+def detect_stale_resources_with_cost(regions=None, on_result=None):
+    unattached_volumes, unassociated_eips, old_snapshots = [], [], []
+    found = {"volumes": unattached_volumes, "eips": unassociated_eips, "snapshots": old_snapshots}
+
+    # Paginated scan of every enabled region; results arrive per (region, resource type)
+    for result in iter_stale_resources(regions=regions):
+        found[result.resource_type].extend(result.rows)
+        if on_result:
+            on_result(result, unattached_volumes, unassociated_eips, old_snapshots)
+
+    total_savings = total_estimated_savings(unattached_volumes, unassociated_eips, old_snapshots)
 
     return unattached_volumes, unassociated_eips, old_snapshots, total_savings
 
+# -------------------------------
+# Helper: Stale resource cleanup
+# -------------------------------
+def stale_row_id(resource_type, row):
+    return row[RESOURCE_ID_FIELDS[resource_type]]
+
+
+def select_stale_rows(title, rows, resource_type, empty_message):
+    st.subheader(title)
+    if not rows:
+        st.info(empty_message)
+        return []
+    df = pd.DataFrame(rows)
+    df.insert(0, "select", st.checkbox("Select all", key=f"select_all_{resource_type}"))
+    edited = st.data_editor(
+        df,
+        column_config={"select": st.column_config.CheckboxColumn("Clean Up")},
+        disabled=[c for c in df.columns if c != "select"],
+        use_container_width=True,
+        key=f"stale_{resource_type}"
+    )
+    selected = set(edited.loc[edited["select"], RESOURCE_ID_FIELDS[resource_type]])
+    return [row for row in rows if stale_row_id(resource_type, row) in selected]
+
+
+def run_stale_cleanup(selections, final_snapshots=True):
+    # Streams outcomes as they finish; returns the IDs actually removed per resource type
+    total = sum(len(rows) for rows in selections.values())
+    progress = st.progress(0.0, text="Starting cleanup...")
+    stats = st.empty()
+    live = st.empty()
+    removed = {kind: set() for kind in selections}
+    outcomes = []
+    # Shown after the rerun that refreshes the tables, which would otherwise clear them
+    messages = st.session_state.cleanup_messages = []
+    started = time.perf_counter()
+    try:
+        for outcome in iter_cleanup(selections, final_snapshots=final_snapshots):
+            outcomes.append(outcome._asdict())
+            if outcome.status != "failed":
+                removed[outcome.resource_type].add(outcome.resource_id)
+            elapsed = time.perf_counter() - started
+            progress.progress(len(outcomes) / total, text=f"{len(outcomes)}/{total} resources processed")
+            with stats.container():
+                c1, c2, c3 = st.columns(3)
+                c1.metric("Removed", sum(len(ids) for ids in removed.values()))
+                c2.metric("Failed", sum(1 for o in outcomes if o["status"] == "failed"))
+                c3.metric("Throughput", f"{len(outcomes) / elapsed:.1f}/s" if elapsed else "—")
+            live.dataframe(pd.DataFrame(outcomes), use_container_width=True)
+    except Exception as e:
+        messages.append(("error", f"Cleanup stopped: {str(e)}"))
+    failed = [o for o in outcomes if o["status"] == "failed"]
+    if failed:
+        messages.append(("error", f"{len(failed)} of {len(outcomes)} resources could not be removed; "
+                                  f"see the audit log."))
+    else:
+        messages.append(("success", f"Removed {len(outcomes)} resources."))
+    return removed
+
+# -------------------------------
+# Sidebar: S3 cache statistics
+# -------------------------------
+def render_s3_cache_stats():
+    stats = get_s3_cache().stats
+    st.sidebar.subheader("🗄️ S3 Results Cache")
+    st.sidebar.metric("Hits", stats["hits"])
+    st.sidebar.metric("Misses (full download)", stats["misses"])
+    st.sidebar.metric("Revalidated (304)", stats["revalidations"])
+
 # -------------------------------
 # Initialize Session State
 # -------------------------------
@@ -154,9 +240,10 @@ with col2:
     s3_key = st.text_input("S3 Key", value="lambda-outputs/idle-instance-analysis.json")
 
 if st.button("Refresh Idle EC2 Analysis"):
-    st.session_state.idle_data = get_lambda_results_from_s3(s3_bucket, s3_key)
+    st.session_state.idle_data = get_lambda_results_from_s3(s3_bucket, s3_key, force_revalidate=True)
 
 data = st.session_state.idle_data or get_lambda_results_from_s3(s3_bucket, s3_key)
+render_s3_cache_stats()
 
 if data:
     summary = data.get("summary", {})
@@ -186,20 +273,26 @@ with col2:
 if start_date >= end_date:
     st.error("End Date must be after Start Date")
 else:
-    # Refresh Cost Explorer Data
-    if st.button("Refresh Cost Explorer Data"):
-        st.session_state.cost_data = fetch_cost_explorer_data(start_date=start_date, end_date=end_date)
-
-    # Load data safely
-    if st.session_state.cost_data is None:
-        df_cost = fetch_cost_explorer_data(start_date=start_date, end_date=end_date)
-    else:
-        df_cost = st.session_state.cost_data
+    # Refresh re-fetches recent days; otherwise only days missing from the store are queried,
+    # and every aggregate below is read straight from the day-partitioned Parquet files
+    col1, col2 = st.columns(2)
+    with col1:
+        refresh = st.button("Refresh Cost Explorer Data")
+    with col2:
+        if st.button("Backfill 13 Months of History"):
+            with st.spinner("Fetching daily cost history..."):
+                today = datetime.utcnow().date()
+                synced = sync_cost_history(today - timedelta(days=COST_HISTORY_DAYS), today)
+            st.success(f"Synced {len(synced)} days into the local cost store")
+    sync_cost_history(start_date, end_date, refresh=refresh)
+    store = get_cost_store()
+    df_cost = store.daily_by_service(start_date, end_date)
+    st.session_state.cost_data = df_cost
 
     if not df_cost.empty:
-        total_cost = df_cost["Cost"].sum()
+        total_cost = store.total_cost(start_date, end_date)
         st.metric(f"Total Cost ({start_date} → {end_date})", f"${total_cost:,.2f}")
-        service_summary = df_cost.groupby("Service")["Cost"].sum().reset_index()
+        service_summary = store.service_totals(start_date, end_date)
         st.subheader("📋 Cost by Service")
         st.dataframe(service_summary.sort_values("Cost", ascending=False))
 
@@ -209,7 +302,9 @@ else:
                              title=f"Cost by AWS Service ({start_date} → {end_date})")
             st.plotly_chart(fig_pie, use_container_width=True)
         with col2:
-            fig_line = px.line(df_cost, x="Date", y="Cost", color="Service",
+            # LTTB keeps each service's shape while sending at most ~one point per pixel
+            fig_line = px.line(downsample(df_cost, "Date", "Cost", group="Service"),
+                               x="Date", y="Cost", color="Service",
                                title=f"Daily Cost by Service ({start_date} → {end_date})")
             st.plotly_chart(fig_line, use_container_width=True)
     else:
@@ -219,28 +314,70 @@ else:
 # SECTION 3: Stale Resource Detection
 # -------------------------------
 st.header("🛠️ Stale Resource Detection & Cost Savings")
+price_index = default_catalog().index
+st.caption(f"Prices from the local Price List index ({len(price_index):,} entries)" if price_index
+           else "No Price List index built; using us-east-1 list prices (python pricing_catalog.py <offer files>)")
 if st.button("Detect Stale Resources & Estimate Savings"):
-    st.session_state.stale_data = detect_stale_resources_with_cost()
+    regions = list_enabled_regions()
+    total_tasks = len(regions) * len(RESOURCE_TYPES)
+    progress = st.progress(0.0, text="Scanning regions...")
+    live = st.empty()
+    completed = []
+
+    def show_partial(result, volumes, eips, snapshots):
+        completed.append(result)
+        progress.progress(min(len(completed) / total_tasks, 1.0),
+                          text=f"Scanned {result.resource_type} in {result.region} "
+                               f"({len(completed)}/{total_tasks})")
+        if result.error:
+            st.warning(f"{result.region} {result.resource_type}: {result.error}")
+        with live.container():
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Unattached Volumes", len(volumes))
+            c2.metric("Unassociated EIPs", len(eips))
+            c3.metric("Old Snapshots", len(snapshots))
+
+    st.session_state.stale_data = detect_stale_resources_with_cost(regions, on_result=show_partial)
+    progress.empty()
+    live.empty()
 
 if st.session_state.stale_data:
     unattached_volumes, unassociated_eips, old_snapshots, total_savings = st.session_state.stale_data
 
     st.subheader("💰 Potential Monthly Savings: ${:,.2f}".format(total_savings))
 
-    st.subheader("📦 Unattached EBS Volumes")
-    if unattached_volumes:
-        st.dataframe(pd.DataFrame(unattached_volumes), use_container_width=True)
-    else:
-        st.info("No unattached volumes found.")
-
-    st.subheader("🔌 Unassociated Elastic IPs")
-    if unassociated_eips:
-        st.dataframe(pd.DataFrame(unassociated_eips), use_container_width=True)
-    else:
-        st.info("No unassociated Elastic IPs found.")
-
-    st.subheader("📦 Old Snapshots (>90 days)")
-    if old_snapshots:
-        st.dataframe(pd.DataFrame(old_snapshots), use_container_width=True)
-    else:
-        st.info("No old snapshots found.")
+    # Tick rows to clean up; selections are collected per resource type
+    selections = {
+        "volumes": select_stale_rows("📦 Unattached EBS Volumes", unattached_volumes, "volumes",
+                                     "No unattached volumes found."),
+        "eips": select_stale_rows("🔌 Unassociated Elastic IPs", unassociated_eips, "eips",
+                                  "No unassociated Elastic IPs found."),
+        "snapshots": select_stale_rows("📦 Old Snapshots (>90 days)", old_snapshots, "snapshots",
+                                       "No old snapshots found."),
+    }
+    selected_count = sum(len(rows) for rows in selections.values())
+
+    st.subheader("🧹 Clean Up Selected Resources")
+    final_snapshots = st.checkbox("Create a final snapshot of each volume before deleting it", value=True)
+    confirmed = st.checkbox(f"I understand {selected_count} selected resources will be permanently removed")
+    for level, message in st.session_state.pop("cleanup_messages", []):
+        getattr(st, level)(message)
+    if st.button(f"Clean Up {selected_count} Resources", disabled=not (selected_count and confirmed)):
+        removed = run_stale_cleanup(selections, final_snapshots)
+        # Drop cleaned-up rows so the tables and savings reflect what is left
+        remaining = [[row for row in rows if stale_row_id(kind, row) not in removed[kind]]
+                     for kind, rows in zip(("volumes", "eips", "snapshots"),
+                                           (unattached_volumes, unassociated_eips, old_snapshots))]
+        st.session_state.stale_data = (*remaining, total_estimated_savings(*remaining))
+        # The editors' ticks are stored by row position, so they would land on other rows
+        for kind in selections:
+            st.session_state.pop(f"stale_{kind}", None)
+            st.session_state.pop(f"select_all_{kind}", None)
+        st.rerun()
+
+    with st.expander("📜 Cleanup Audit Log"):
+        audit = AuditLog().tail()
+        if audit:
+            st.dataframe(pd.DataFrame(audit[::-1]), use_container_width=True)
+        else:
+            st.info("No cleanup actions recorded yet.")
@@ -0,0 +1,208 @@
+import itertools
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from idle_classifier import DEFAULT_NETWORK_THRESHOLD, classify_fleet, load_agent_config
+from load_profiles import compile_profile
+
+# -------------------------------
+# Benchmark grid
+# -------------------------------
+# Detection latency = time from an instance going idle to the first scheduled Lambda run
+# that classifies it idle. It is bounded by the agent's collection interval (config.json),
+# the EventBridge schedule (ec2-idle-detection-schedule.yaml) and the evaluation window.
+SCHEDULES = ("rate(15 minutes)", "rate(1 hour)", "rate(6 hours)")
+EVALUATION_PERIODS_MINUTES = (60, 360, 1440)
+CPU_THRESHOLDS = (2.0, 5.0, 10.0)
+NETWORK_THRESHOLDS = (DEFAULT_NETWORK_THRESHOLD,)
+DEFAULT_HORIZON_MINUTES = 3 * 24 * 60
+# Bounds the (instances x runs x window) block handed to the classifier at once
+CHUNK_ELEMENTS = 4_000_000
+
+# Synthetic fleet: CPU curves are load_profiles specs, so the same shapes can be played on
+# real instances with the load generator
+BUSY = {"shape": "constant", "value": 35}
+IDLE = {"shape": "constant", "value": 1.0}
+FLEET_MIX = {
+    # kind: (share of the fleet, profile spec); goes_idle switches from BUSY to IDLE
+    "goes_idle": (0.5, None),
+    "steady_busy": (0.2, BUSY),
+    "business_hours": (0.15, {"shape": "diurnal", "low": 2, "high": 25, "period": 86400}),
+    "nightly_batch": (0.15, {"shape": "square", "low": 1, "high": 90, "period": 86400, "duty": 1 / 24}),
+}
+DEFAULT_NOISE = {"bias": 0.0, "noise": 2.0}
+
+
+def schedule_minutes(expression):
+    # "rate(15 minutes)" / "rate(1 hour)" / "rate(2 days)" -> minutes; cron isn't periodic enough
+    match = re.fullmatch(r"rate\((\d+) (minute|minutes|hour|hours|day|days)\)", expression.strip())
+    if not match:
+        raise ValueError(f"Only rate() schedules can be benchmarked: {expression}")
+    value, unit = int(match.group(1)), match.group(2)
+    return value * {"m": 1, "h": 60, "d": 1440}[unit[0]]
+
+
+# -------------------------------
+# Closed loop: calibrate noise with the load generator
+# -------------------------------
+def calibrate_with_generator(busy=BUSY["value"], idle=IDLE["value"], datapoints=16, seconds_per_datapoint=0.25):
+    # Plays a busy -> idle step through load_profiles on this machine, one sample per
+    # (time-compressed) datapoint, and measures how far achieved CPU strays from the target
+    from load_profiles import run_profile
+    half = datapoints * seconds_per_datapoint / 2
+    report = run_profile({"cpu": [{"shape": "step", "levels": [[half, busy], [half, idle]]}]},
+                         sample_seconds=seconds_per_datapoint)
+    errors = np.array([achieved - target for _, target, achieved in report["channels"]["cpu"]["samples"]
+                       if achieved is not None and target in (busy, idle)], dtype=np.float32)
+    if not len(errors):
+        return dict(DEFAULT_NOISE)
+    return {"bias": float(errors.mean()), "noise": float(max(errors.std(), 0.5))}
+
+
+# -------------------------------
+# Synthetic fleet timelines
+# -------------------------------
+def _curve(spec, seconds):
+    _, value_at = compile_profile({**spec, "duration": float(seconds[-1]) + 1})
+    return np.array([value_at(float(t)) for t in seconds], dtype=np.float32)
+
+
+def synthetic_fleet(instances, horizon_minutes, warmup_minutes, settle_minutes, interval_seconds=60,
+                    noise=DEFAULT_NOISE, seed=0):
+    # Returns cpu and network (instances x datapoints), each datapoint's end time in seconds
+    # (0 = start of the measured horizon), the kind of each instance and its idle transition
+    # time in seconds (inf for instances that never go idle)
+    rng = np.random.default_rng(seed)
+    warmup = warmup_minutes * 60 // interval_seconds
+    points = warmup + horizon_minutes * 60 // interval_seconds
+    end_seconds = (np.arange(points) - warmup + 1) * interval_seconds
+
+    names = list(FLEET_MIX)
+    kinds = rng.choice(len(names), instances, p=[FLEET_MIX[k][0] for k in names])
+    # Periodic curves are evaluated once over one extra period and sliced at a random phase per instance
+    span = points + 86400 // interval_seconds
+    grid = np.arange(span, dtype=np.float64) * interval_seconds
+    offsets = rng.integers(0, 86400 // interval_seconds, instances)
+    columns = offsets[:, None] + np.arange(points)[None, :]
+
+    target = np.empty((instances, points), dtype=np.float32)
+    transition = np.full(instances, np.inf)
+    for code, kind in enumerate(names):
+        rows = np.flatnonzero(kinds == code)
+        if not len(rows):
+            continue
+        if FLEET_MIX[kind][1] is None:
+            latest = max(horizon_minutes - settle_minutes, 1) * 60
+            transition[rows] = rng.uniform(0, latest, len(rows))
+            busy = end_seconds[None, :] <= transition[rows, None]
+            target[rows] = np.where(busy, np.float32(BUSY["value"]), np.float32(IDLE["value"]))
+        else:
+            target[rows] = _curve(FLEET_MIX[kind][1], grid)[columns[rows]]
+
+    cpu = target + np.float32(noise["bias"]) + rng.standard_normal(target.shape, dtype=np.float32) \
+        * np.float32(noise["noise"])
+    np.clip(cpu, 0, 100, out=cpu)
+    # Network follows load: ~50 bytes per datapoint at idle, tens of KB when busy
+    network = (np.float32(50) + np.float32(1_000) * np.maximum(target - 2, 0)) \
+        * rng.random(target.shape, dtype=np.float32) * np.float32(2)
+    return cpu, network, end_seconds, np.array(names)[kinds], transition
+
+
+# -------------------------------
+# Replay through the detection logic
+# -------------------------------
+def replay(cpu, network, end_seconds, run_seconds, window_points, interval_seconds=60, delay_seconds=60,
+           chunk_elements=CHUNK_ELEMENTS, **thresholds):
+    # (instances x runs) boolean "classified idle" matrix. Each run sees the window_points
+    # datapoints published by run time (a datapoint lands delay_seconds after it closes);
+    # windows are strided views, copied a chunk of runs at a time into classify_fleet.
+    n = len(cpu)
+    last = np.searchsorted(end_seconds, run_seconds - delay_seconds, side="right") - 1
+    starts = last - window_points + 1
+    if starts.min() < 0:
+        raise ValueError("warmup is shorter than the evaluation window")
+    cpu_windows = sliding_window_view(cpu, window_points, axis=1)
+    network_windows = sliding_window_view(network, window_points, axis=1)
+    idle = np.empty((n, len(run_seconds)), dtype=bool)
+    per_chunk = max(1, chunk_elements // (n * window_points))
+    for j in range(0, len(run_seconds), per_chunk):
+        chosen = starts[j:j + per_chunk]
+        result = classify_fleet(cpu_windows[:, chosen].reshape(-1, window_points),
+                                network_windows[:, chosen].reshape(-1, window_points),
+                                interval_seconds=interval_seconds, **thresholds)
+        idle[:, j:j + per_chunk] = (result["status"] == "idle").reshape(n, len(chosen))
+    return idle
+
+
+def score(idle, run_seconds, transition):
+    # A run is a false positive if it flags an instance that is still busy at run time;
+    # a goes-idle instance never flagged before the horizon ends is a false negative
+    active = run_seconds[None, :] < transition[:, None]
+    detected = idle & ~active
+    goes_idle = np.isfinite(transition)
+    hit = goes_idle & detected.any(axis=1)
+    first = np.argmax(detected, axis=1)
+    latency = (run_seconds[first[hit]] - transition[hit]) / 60
+    return {
+        "latency_p50_min": float(np.percentile(latency, 50)) if len(latency) else np.nan,
+        "latency_p95_min": float(np.percentile(latency, 95)) if len(latency) else np.nan,
+        "latency_max_min": float(latency.max()) if len(latency) else np.nan,
+        "false_positive_rate": float((idle & active).sum() / max(active.sum(), 1)),
+        "false_negative_rate": float(1 - hit.sum() / max(goes_idle.sum(), 1)),
+    }
+
+
+def run_grid(instances=100, horizon_minutes=DEFAULT_HORIZON_MINUTES, schedules=SCHEDULES,
+             evaluation_periods=EVALUATION_PERIODS_MINUTES, cpu_thresholds=CPU_THRESHOLDS,
+             network_thresholds=NETWORK_THRESHOLDS, interval_seconds=None, delay_seconds=None,
+             noise=DEFAULT_NOISE, seed=0):
+    # One row per (schedule, evaluation period, cpu threshold, network threshold)
+    interval_seconds = interval_seconds or load_agent_config()["cpu"]["interval"]
+    delay_seconds = interval_seconds if delay_seconds is None else delay_seconds
+    periods = {s: schedule_minutes(s) for s in schedules}
+    warmup = max(evaluation_periods) + delay_seconds // 60 + 1
+    settle = max(evaluation_periods) + max(periods.values()) + delay_seconds // 60 + 1
+    cpu, network, end_seconds, kinds, transition = synthetic_fleet(
+        instances, horizon_minutes, warmup, settle, interval_seconds, noise, seed)
+
+    rows = []
+    for schedule, evaluation, cpu_threshold, network_threshold in itertools.product(
+            schedules, evaluation_periods, cpu_thresholds, network_thresholds):
+        run_seconds = np.arange(periods[schedule], horizon_minutes + 1, periods[schedule]) * 60.0
+        idle = replay(cpu, network, end_seconds, run_seconds, evaluation * 60 // interval_seconds,
+                      interval_seconds, delay_seconds, cpu_threshold=cpu_threshold,
+                      network_threshold=network_threshold)
+        row = {"schedule": schedule, "evaluation_period_minutes": evaluation, "cpu_threshold": cpu_threshold,
+               "network_threshold": network_threshold, "runs": len(run_seconds),
+               **score(idle, run_seconds, transition)}
+        # Which kinds of busy instance get mistaken for idle
+        for kind in FLEET_MIX:
+            rows_of_kind = kinds == kind
+            active = run_seconds[None, :] < transition[rows_of_kind, None]
+            row[f"fp_{kind}"] = float((idle[rows_of_kind] & active).sum() / max(active.sum(), 1))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def run_benchmark(calibrate=False, **kwargs):
+    noise = calibrate_with_generator() if calibrate else DEFAULT_NOISE
+    print(f"CPU noise model: bias {noise['bias']:+.2f} pts, std {noise['noise']:.2f} pts"
+          f"{' (measured with the load generator)' if calibrate else ''}")
+    started = time.perf_counter()
+    report = run_grid(noise=noise, **kwargs)
+    elapsed = time.perf_counter() - started
+    print(f"{len(report)} combinations in {elapsed:.1f}s")
+    columns = ["schedule", "evaluation_period_minutes", "cpu_threshold", "latency_p50_min", "latency_p95_min",
+               "false_positive_rate", "false_negative_rate", "fp_business_hours", "fp_nightly_batch"]
+    print(report[columns].sort_values(["false_positive_rate", "latency_p95_min"]).to_string(
+        index=False, float_format=lambda v: f"{v:.3f}"))
+    return report
+
+
+if __name__ == "__main__":
+    # python detection_benchmark.py [calibrate]; "calibrate" measures CPU noise by running the
+    # load generator on this machine before replaying the synthetic fleet
+    run_benchmark(calibrate="calibrate" in sys.argv[1:])
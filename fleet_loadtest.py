@@ -0,0 +1,417 @@
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from collections import namedtuple
+import boto3
+import pandas as pd
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from cache_paths import CACHE_DIR
+from throttling import RateLimiter, call_with_backoff
+
+# -------------------------------
+# Load test settings
+# -------------------------------
+HERE = os.path.dirname(os.path.abspath(__file__))
+GENERATOR_FILES = ("cpu_spike.py", "load_profiles.py")
+DEFAULT_INSTALL_ROOT = "/opt/loadgen"
+# SendCommand takes at most 50 instance IDs; a few dozen commands in flight keeps well
+# under the account's concurrent-invocation and API rate limits
+MAX_TARGETS_PER_COMMAND = 50
+DEFAULT_MAX_IN_FLIGHT = 20
+SEND_COMMANDS_PER_SECOND = 3
+POLLS_PER_SECOND = 10
+DEFAULT_POLL_SECONDS = 5
+# Instances get this long past the profile's duration before they are marked timed out
+GRACE_SECONDS = 120
+INSTALLED_PATH = os.path.join(CACHE_DIR, "loadgen-installed.json")
+# A load command exits with this when the generator directory is gone (instance replaced
+# or /opt wiped), so the orchestrator knows its install registry is stale
+MISSING_INSTALL_EXIT_CODE = 86
+
+TERMINAL_STATUSES = ("Success", "Failed", "Cancelled", "TimedOut")
+
+# status is an SSM invocation status (Success, Failed, TimedOut, ...); report is the
+# generator's JSON summary when the command printed one; response_code is the script's exit code
+Result = namedtuple("Result", ["instance_id", "status", "report", "message", "response_code"],
+                    defaults=(None,))
+
+
+def _batches(ids, size=MAX_TARGETS_PER_COMMAND):
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+# -------------------------------
+# Targeting by tag
+# -------------------------------
+def find_instances(ec2, tags):
+    # tags: {key: value or [values]}; running instances only
+    filters = [{"Name": f"tag:{key}", "Values": value if isinstance(value, list) else [value]}
+               for key, value in tags.items()]
+    filters.append({"Name": "instance-state-name", "Values": ["running"]})
+    ids = []
+    for page in ec2.get_paginator("describe_instances").paginate(Filters=filters):
+        for reservation in page["Reservations"]:
+            ids.extend(i["InstanceId"] for i in reservation["Instances"])
+    return ids
+
+
+# -------------------------------
+# Generator bundle and shell commands
+# -------------------------------
+def generator_bundle(files=GENERATOR_FILES, base_dir=HERE):
+    # Content-addressed, so a changed generator installs into a fresh directory
+    contents = {}
+    digest = hashlib.sha256()
+    for name in files:
+        with open(os.path.join(base_dir, name), "rb") as f:
+            contents[name] = f.read()
+        digest.update(name.encode() + b"\0" + contents[name])
+    return digest.hexdigest()[:16], contents
+
+
+def _root_lines(install_root, digest):
+    # LOADGEN_ROOT lets the local SSM stand-in give every fake instance its own directory
+    return [f'ROOT="${{LOADGEN_ROOT:-{install_root}}}"', f'DIR="$ROOT/{digest}"']
+
+
+def install_commands(digest, contents, install_root=DEFAULT_INSTALL_ROOT):
+    lines = _root_lines(install_root, digest) + ['if [ ! -f "$DIR/.complete" ]; then', '  mkdir -p "$DIR"']
+    for name, data in contents.items():
+        lines.append(f'  echo {base64.b64encode(data).decode()} | base64 -d > "$DIR/{name}"')
+    lines += ['  touch "$DIR/.complete"', "fi", f"echo installed {digest}"]
+    return lines
+
+
+def load_commands(digest, profile, install_root=DEFAULT_INSTALL_ROOT):
+    # Only the generator's one-line JSON summary is printed, so it survives the 2500
+    # character output limit of ListCommandInvocations
+    spec = base64.b64encode(json.dumps(profile).encode()).decode()
+    return _root_lines(install_root, digest) + [
+        f'[ -f "$DIR/.complete" ] || {{ echo "load generator {digest} is not installed"; '
+        f'exit {MISSING_INSTALL_EXIT_CODE}; }}',
+        'WORK="$(mktemp -d)"',
+        f'echo {spec} | base64 -d > "$WORK/profile.json"',
+        'python3 "$DIR/load_profiles.py" "$WORK/profile.json" > "$WORK/out.txt" 2>&1',
+        "STATUS=$?",
+        'tail -n 1 "$WORK/out.txt"',
+        'rm -rf "$WORK"',
+        "exit $STATUS",
+    ]
+
+
+def profile_duration(profile):
+    from load_profiles import compile_profile
+    return max(compile_profile(segments)[0] for name, segments in profile.items() if name != "options")
+
+
+# -------------------------------
+# Dispatch and polling
+# -------------------------------
+def _parse_report(output):
+    for line in reversed((output or "").strip().splitlines()):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue
+    return None
+
+
+class FleetLoadTest:
+    def __init__(self, ssm, install_root=DEFAULT_INSTALL_ROOT, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 poll_seconds=DEFAULT_POLL_SECONDS, installed_path=INSTALLED_PATH):
+        self.ssm = ssm
+        self.install_root = install_root
+        self.max_in_flight = max_in_flight
+        self.poll_seconds = poll_seconds
+        self.installed_path = installed_path
+        self.send_limiter = RateLimiter(SEND_COMMANDS_PER_SECOND, burst=SEND_COMMANDS_PER_SECOND)
+        self.poll_limiter = RateLimiter(POLLS_PER_SECOND, burst=POLLS_PER_SECOND)
+
+    def _send(self, instance_ids, commands, comment, timeout_seconds):
+        response = call_with_backoff(
+            self.ssm.send_command, limiter=self.send_limiter, InstanceIds=instance_ids,
+            DocumentName="AWS-RunShellScript", Comment=comment[:100],
+            Parameters={"commands": commands, "executionTimeout": [str(int(timeout_seconds))]},
+            MaxConcurrency=str(len(instance_ids)), MaxErrors=str(len(instance_ids)))
+        return response["Command"]["CommandId"]
+
+    def online(self, instance_ids):
+        # SendCommand rejects a whole call with InvalidInstanceId if any one target isn't an
+        # SSM managed instance that is online, so targets are checked before batching
+        found = set()
+        for batch in _batches(list(dict.fromkeys(instance_ids))):
+            kwargs = {"Filters": [{"Key": "InstanceIds", "Values": batch},
+                                  {"Key": "PingStatus", "Values": ["Online"]}]}
+            while True:
+                page = call_with_backoff(self.ssm.describe_instance_information, limiter=self.poll_limiter,
+                                         **kwargs)
+                found.update(i["InstanceId"] for i in page.get("InstanceInformationList", []))
+                if not page.get("NextToken"):
+                    break
+                kwargs["NextToken"] = page["NextToken"]
+        return found
+
+    def _invocations(self, command_id):
+        kwargs = {"CommandId": command_id, "Details": True}
+        while True:
+            page = call_with_backoff(self.ssm.list_command_invocations, limiter=self.poll_limiter, **kwargs)
+            yield from page.get("CommandInvocations", [])
+            if not page.get("NextToken"):
+                return
+            kwargs["NextToken"] = page["NextToken"]
+
+    def iter_run(self, instance_ids, commands, comment, timeout_seconds):
+        # Keeps up to max_in_flight commands of 50 instances running; new batches go out as
+        # soon as earlier ones finish, and results are yielded as each instance completes
+        pending = _batches(list(dict.fromkeys(instance_ids)))
+        in_flight = {}
+        while pending or in_flight:
+            while pending and len(in_flight) < self.max_in_flight:
+                batch = pending.pop(0)
+                try:
+                    command_id = self._send(batch, commands, comment, timeout_seconds)
+                except ClientError as e:
+                    if e.response.get("Error", {}).get("Code") == "InvalidInstanceId" and len(batch) > 1:
+                        # A target dropped offline after online(); retry the halves so it
+                        # can't fail its batch-mates
+                        pending[:0] = [batch[:len(batch) // 2], batch[len(batch) // 2:]]
+                        continue
+                    yield [Result(i, "Failed", None, f"SendCommand: {e}") for i in batch]
+                    continue
+                in_flight[command_id] = (set(batch), time.monotonic() + timeout_seconds + GRACE_SECONDS)
+
+            for command_id in list(in_flight):
+                waiting, deadline = in_flight[command_id]
+                finished = []
+                for invocation in self._invocations(command_id):
+                    instance_id = invocation["InstanceId"]
+                    if instance_id not in waiting or invocation["Status"] not in TERMINAL_STATUSES:
+                        continue
+                    plugins = invocation.get("CommandPlugins") or [{}]
+                    output = plugins[-1].get("Output", "")
+                    # StatusDetails only repeats the status; on failure the output says why
+                    message = invocation.get("StatusDetails", "") if invocation["Status"] == "Success" \
+                        else output.strip()[-200:] or invocation.get("StatusDetails", "")
+                    finished.append(Result(instance_id, invocation["Status"], _parse_report(output), message,
+                                           plugins[-1].get("ResponseCode")))
+                    waiting.discard(instance_id)
+                if time.monotonic() > deadline:
+                    finished += [Result(i, "TimedOut", None, "no result before the deadline") for i in waiting]
+                    waiting.clear()
+                if finished:
+                    yield finished
+                if not waiting:
+                    del in_flight[command_id]
+            if in_flight:
+                time.sleep(self.poll_seconds)
+
+    # ---------------------------
+    # Install once, then run
+    # ---------------------------
+    def _load_installed(self):
+        try:
+            with open(self.installed_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_installed(self, installed):
+        os.makedirs(os.path.dirname(os.path.abspath(self.installed_path)), exist_ok=True)
+        with open(f"{self.installed_path}.tmp", "w") as f:
+            json.dump(installed, f)
+        os.replace(f"{self.installed_path}.tmp", self.installed_path)
+
+    def forget_installed(self, digest, instance_ids):
+        installed = self._load_installed()
+        installed[digest] = sorted(set(installed.get(digest, [])) - set(instance_ids))
+        self._save_installed(installed)
+
+    def ensure_installed(self, instance_ids, bundle=None):
+        # Pushes the generator only to instances not yet known to have this version; the
+        # remote side also skips the write if the directory is already complete
+        digest, contents = bundle or generator_bundle()
+        installed = self._load_installed()
+        known = set(installed.get(digest, []))
+        todo = [i for i in instance_ids if i not in known]
+        failed = []
+        if todo:
+            commands = install_commands(digest, contents, self.install_root)
+            for results in self.iter_run(todo, commands, f"Install load generator {digest}", 300):
+                known.update(r.instance_id for r in results if r.status == "Success")
+                failed += [r for r in results if r.status != "Success"]
+            installed[digest] = sorted(known)
+            self._save_installed(installed)
+        return digest, len(todo), failed
+
+    def run(self, instance_ids, profile, bundle=None):
+        # Instances the registry wrongly lists as installed fail fast with
+        # MISSING_INSTALL_EXIT_CODE; they are dropped from the registry, reinstalled and retried once
+        bundle = bundle or generator_bundle()
+        duration = profile_duration(profile)
+        online = self.online(instance_ids)
+        results = [Result(i, "Undeliverable", None, "not an online SSM managed instance")
+                   for i in dict.fromkeys(instance_ids) if i not in online]
+        pushed, todo = 0, [i for i in dict.fromkeys(instance_ids) if i in online]
+        for attempt in range(2):
+            digest, count, failed = self.ensure_installed(todo, bundle)
+            pushed += count
+            results += failed
+            ready = [i for i in todo if i not in {r.instance_id for r in failed}]
+            finished = [r for batch in self.iter_run(ready, load_commands(digest, profile, self.install_root),
+                                                     f"Load test {digest}", duration + GRACE_SECONDS)
+                        for r in batch]
+            todo = [r.instance_id for r in finished if r.response_code == MISSING_INSTALL_EXIT_CODE] \
+                if attempt == 0 else []
+            if todo:
+                self.forget_installed(digest, todo)
+                finished = [r for r in finished if r.response_code != MISSING_INSTALL_EXIT_CODE]
+            results += finished
+            if not todo:
+                break
+        return build_report(results), pushed
+
+
+def build_report(results):
+    # One row per instance: SSM status plus target / achieved / error for every channel
+    rows = []
+    for result in results:
+        row = {"instance_id": result.instance_id, "status": result.status, "message": result.message}
+        for name, channel in ((result.report or {}).get("channels") or {}).items():
+            row[f"{name}_target"] = channel.get("mean_target")
+            row[f"{name}_achieved"] = channel.get("mean_achieved")
+            row[f"{name}_error"] = channel.get("mean_abs_error")
+        if result.report:
+            row["tick_lateness_p99_ms"] = result.report.get("tick_lateness_ms", {}).get("p99")
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# -------------------------------
+# Local SSM stand-in
+# -------------------------------
+class LocalSSM:
+    # Implements the SSM calls the orchestrator makes by running each command as a
+    # local bash script, with one LOADGEN_ROOT directory per fake instance, so install
+    # reuse, batching, polling and output parsing are exercised end to end
+    def __init__(self, root=None, max_workers=4, page_size=50, offline=()):
+        # offline: instance IDs that behave like stopped or unmanaged instances
+        self.root = root or tempfile.mkdtemp(prefix="local-ssm-")
+        self.offline = set(offline)
+        self.page_size = page_size
+        self.commands = {}
+        self.calls = {"send_command": 0, "list_command_invocations": 0, "describe_instance_information": 0}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+
+    def _execute(self, invocation, script, timeout_seconds):
+        invocation["Status"] = "InProgress"
+        env = {**os.environ, "LOADGEN_ROOT": os.path.join(self.root, invocation["InstanceId"])}
+        try:
+            done = subprocess.run(["bash", "-c", script], capture_output=True, text=True, env=env,
+                                  timeout=timeout_seconds)
+            output, status = done.stdout + done.stderr, "Success" if done.returncode == 0 else "Failed"
+            code = done.returncode
+        except subprocess.TimeoutExpired:
+            output, status, code = "", "TimedOut", -1
+        invocation["CommandPlugins"] = [{"Name": "aws:runShellScript", "Output": output[:2500],
+                                         "ResponseCode": code}]
+        invocation["StatusDetails"] = status
+        invocation["Status"] = status
+
+    def describe_instance_information(self, Filters, **kwargs):
+        with self._lock:
+            self.calls["describe_instance_information"] += 1
+        values = {f["Key"]: f["Values"] for f in Filters}
+        return {"InstanceInformationList": [{"InstanceId": i, "PingStatus": "Online"}
+                                            for i in values["InstanceIds"] if i not in self.offline]}
+
+    def send_command(self, InstanceIds, DocumentName, Parameters, **kwargs):
+        if self.offline.intersection(InstanceIds):
+            raise ClientError({"Error": {"Code": "InvalidInstanceId", "Message": "Instances not in a valid state"}},
+                              "SendCommand")
+        command_id = str(uuid.uuid4())
+        script = "\n".join(Parameters["commands"])
+        timeout_seconds = float(Parameters.get("executionTimeout", ["3600"])[0])
+        invocations = [{"CommandId": command_id, "InstanceId": i, "Status": "Pending", "StatusDetails": "Pending"}
+                       for i in InstanceIds]
+        with self._lock:
+            self.calls["send_command"] += 1
+            self.commands[command_id] = invocations
+        for invocation in invocations:
+            self._pool.submit(self._execute, invocation, script, timeout_seconds)
+        return {"Command": {"CommandId": command_id, "InstanceIds": list(InstanceIds), "DocumentName": DocumentName}}
+
+    def list_command_invocations(self, CommandId, Details=False, NextToken=None, **kwargs):
+        with self._lock:
+            self.calls["list_command_invocations"] += 1
+        invocations = self.commands[CommandId]
+        start = int(NextToken or 0)
+        page = [dict(i) for i in invocations[start:start + self.page_size]]
+        response = {"CommandInvocations": page}
+        if start + self.page_size < len(invocations):
+            response["NextToken"] = str(start + self.page_size)
+        return response
+
+
+# -------------------------------
+# Demo against the local stand-in
+# -------------------------------
+def run_local_demo(instances=120, seconds=2, cpu=10):
+    ssm = LocalSSM(max_workers=4)
+    cache = os.path.join(ssm.root, "installed.json")
+    runner = FleetLoadTest(ssm, poll_seconds=0.5, installed_path=cache)
+    fleet = [f"i-local{n:010d}" for n in range(instances)]
+    profile = {"cpu": [{"shape": "constant", "value": cpu, "duration": seconds}],
+               "options": {"cpu": {"workers": 1}}}
+
+    for attempt in ("first run", "second run"):
+        before = dict(ssm.calls)
+        started = time.perf_counter()
+        report, pushed = runner.run(fleet, profile)
+        elapsed = time.perf_counter() - started
+        calls = {k: ssm.calls[k] - before[k] for k in ssm.calls}
+        print(f"{attempt}: {len(report)} instances in {elapsed:.1f}s, generator pushed to {pushed}, "
+              f"{calls['send_command']} SendCommand / {calls['list_command_invocations']} list calls, "
+              f"statuses {report['status'].value_counts().to_dict()}")
+    print(report.head(5).to_string(index=False))
+
+
+if __name__ == "__main__":
+    # python3 fleet_loadtest.py Key=Value [Key=Value ...] <seconds> cpu=80 [rss=512 disk=20 ...]
+    # or a profile file in place of the seconds and targets:
+    # python3 fleet_loadtest.py Environment=loadtest profile.json
+    # no arguments runs the local stand-in demo
+    args = sys.argv[1:]
+    if not args:
+        run_local_demo()
+        sys.exit(0)
+    tags = dict(a.split("=", 1) for a in args if "=" in a and a.split("=", 1)[0] not in
+                ("cpu", "memory", "rss", "disk", "network"))
+    rest = [a for a in args if a.split("=", 1)[0] not in tags]
+    if not rest:
+        sys.exit("usage: python3 fleet_loadtest.py Key=Value [Key=Value ...] (<seconds> cpu=80 ... | profile.json)")
+    if rest[0].endswith(".json"):
+        with open(rest[0]) as f:
+            profile = json.load(f)
+    else:
+        from load_profiles import constant_profile
+        profile = constant_profile(float(rest[0]), **{k: float(v) for k, v in (a.split("=", 1) for a in rest[1:])})
+
+    config = Config(retries={"mode": "adaptive", "max_attempts": 10})
+    fleet = find_instances(boto3.client("ec2", config=config), tags)
+    print(f"{len(fleet)} running instances tagged {tags}")
+    report, pushed = FleetLoadTest(boto3.client("ssm", config=config)).run(fleet, profile)
+    print(f"generator pushed to {pushed} instance(s)")
+    print(report.to_string(index=False))
+    path = f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.csv"
+    report.to_csv(path, index=False)
+    print(f"report written to {path}")
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Defaults (mirrors the Lambda's analysis metadata)
+# -------------------------------
+DEFAULT_CPU_THRESHOLD = 5.0            # percent
+DEFAULT_NETWORK_THRESHOLD = 5_000_000  # bytes over the evaluation window
+DEFAULT_CHUNK_ROWS = 1024
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+
+# -------------------------------
+# CloudWatch agent configuration
+# -------------------------------
+def load_agent_config(path=CONFIG_PATH):
+    # Returns {section: {"measurement": [...], "interval": seconds}} from config.json
+    with open(path) as f:
+        collected = json.load(f)["metrics"]["metrics_collected"]
+    return {
+        section: {
+            "measurement": settings.get("measurement", []),
+            "interval": settings.get("metrics_collection_interval", 60),
+        }
+        for section, settings in collected.items()
+    }
+
+
+def cpu_from_idle(cpu_usage_idle):
+    # The agent reports cpu_usage_idle; utilisation is its complement
+    return np.subtract(100.0, cpu_usage_idle, dtype=np.float32)
+
+
+# -------------------------------
+# Batched classification
+# -------------------------------
+def classify_chunk(cpu, network, interval_seconds=60, cpu_threshold=DEFAULT_CPU_THRESHOLD,
+                   network_threshold=DEFAULT_NETWORK_THRESHOLD, idle_hour_fraction=None):
+    # cpu:     (instances, datapoints) utilisation in percent, NaN where missing
+    # network: (instances, datapoints) bytes in + out per datapoint, NaN where missing
+    cpu = np.asarray(cpu, dtype=np.float32)
+    network = np.asarray(network, dtype=np.float32)
+    n, t = cpu.shape
+    if t == 0:
+        # No datapoints in the window at all: every row is the no-data result
+        nan = np.full(n, np.nan, dtype=np.float32)
+        return {"avg_cpu": nan, "max_cpu": nan.copy(), "p95_cpu": nan.copy(),
+                "total_network": np.zeros(n), "idle_hour_fraction": nan.copy(),
+                "datapoints": np.zeros(n, dtype=np.int64), "status": np.full(n, "error")}
+
+    valid = ~np.isnan(cpu)
+    count = valid.sum(axis=1)
+    filled = np.where(valid, cpu, np.float32(0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_cpu = filled.sum(axis=1, dtype=np.float64) / count
+
+    # fmax ignores NaN, so this is a NaN-aware max without a Python-level mask
+    max_cpu = np.fmax.reduce(cpu, axis=1)
+
+    # Sorting pushes NaN to the end of each row; the p95 index then depends only on that row's count
+    ordered = np.sort(cpu, axis=1)
+    position = np.maximum(count - 1, 0) * 0.95
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+    low_values = np.take_along_axis(ordered, lower[:, None], axis=1)[:, 0]
+    high_values = np.take_along_axis(ordered, upper[:, None], axis=1)[:, 0]
+    p95_cpu = low_values + (high_values - low_values) * (position - lower)
+
+    total_network = np.where(np.isnan(network), np.float32(0), network).sum(axis=1, dtype=np.float64)
+
+    # Idle hours: hourly mean CPU below the threshold (partial trailing hour padded with NaN)
+    per_hour = max(1, int(round(3600 / interval_seconds)))
+    hours = -(-t // per_hour)
+    pad = hours * per_hour - t
+    hourly_sum = np.pad(filled, ((0, 0), (0, pad))).reshape(n, hours, per_hour).sum(axis=2)
+    hourly_count = np.pad(valid, ((0, 0), (0, pad))).reshape(n, hours, per_hour).sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hourly_mean = hourly_sum / hourly_count
+        observed_hours = (hourly_count > 0).sum(axis=1)
+        idle_fraction = (hourly_mean < cpu_threshold).sum(axis=1) / observed_hours
+
+    is_idle = (avg_cpu < cpu_threshold) & (total_network < network_threshold)
+    if idle_hour_fraction is not None:
+        is_idle &= idle_fraction >= idle_hour_fraction
+    status = np.where(count == 0, "error", np.where(is_idle, "idle", "active"))
+
+    return {
+        "avg_cpu": avg_cpu.astype(np.float32),
+        "max_cpu": max_cpu.astype(np.float32),
+        "p95_cpu": p95_cpu.astype(np.float32),
+        "total_network": total_network,
+        "idle_hour_fraction": idle_fraction.astype(np.float32),
+        "datapoints": count,
+        "status": status,
+    }
+
+
+def classify_fleet(cpu, network, chunk_rows=DEFAULT_CHUNK_ROWS, **thresholds):
+    # Row chunks keep the sort and hourly buffers in cache-sized pieces
+    parts = [classify_chunk(cpu[i:i + chunk_rows], network[i:i + chunk_rows], **thresholds)
+             for i in range(0, len(cpu), chunk_rows)]
+    if not parts:
+        return classify_chunk(np.empty((0, 0)), np.empty((0, 0)), **thresholds)
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def to_frame(result, instance_ids, instance_types=None):
+    df = pd.DataFrame(result)
+    df.insert(0, "instance_id", instance_ids)
+    if instance_types is not None:
+        df.insert(1, "instance_type", instance_types)
+    df["status"] = df["status"].astype("category")
+    return df
+
+
+# -------------------------------
+# Synthetic metrics (benchmark and offline fan-out runs)
+# -------------------------------
+def synthetic_chunk(rng, rows, points, idle_share=0.4):
+    # (rows x points) CPU percent and network bytes; idle_share of the rows idle
+    busy = rng.random(rows) >= idle_share
+    base = np.where(busy, 35.0, 1.5).astype(np.float32)[:, None]
+    cpu = base + rng.standard_normal((rows, points), dtype=np.float32) * np.float32(2.0)
+    np.clip(cpu, 0, 100, out=cpu)
+    cpu[rng.random((rows, points), dtype=np.float32) < 0.001] = np.nan
+    network = np.where(busy[:, None], np.float32(40_000), np.float32(50)) \
+        * rng.random((rows, points), dtype=np.float32)
+    return cpu, network
+
+
+# -------------------------------
+# Benchmark: 50k instances x 14 days of 1-minute datapoints
+# -------------------------------
+def run_benchmark(instances=50_000, days=14, interval_seconds=None, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0):
+    rng = np.random.default_rng(seed)
+    interval_seconds = interval_seconds or load_agent_config()["cpu"]["interval"]
+    points = days * 24 * 3600 // interval_seconds
+    print(f"{instances} instances x {points} datapoints "
+          f"({instances * points * 2 * 4 / 1e9:.1f} GB of float32 CPU + network)")
+
+    classify_seconds = 0.0
+    statuses = {}
+    for start in range(0, instances, chunk_rows):
+        rows = min(chunk_rows, instances - start)
+        cpu, network = synthetic_chunk(rng, rows, points)
+        started = time.perf_counter()
+        result = classify_chunk(cpu, network, interval_seconds=interval_seconds)
+        classify_seconds += time.perf_counter() - started
+        for value, count in zip(*np.unique(result["status"], return_counts=True)):
+            statuses[str(value)] = statuses.get(str(value), 0) + int(count)
+
+    rate = instances * points / classify_seconds / 1e6
+    print(f"classified in {classify_seconds:.1f}s ({rate:.0f}M datapoints/s, "
+          f"{classify_seconds / instances * 1e6:.0f}us per instance): {statuses}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,274 @@
+import json
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import boto3
+import numpy as np
+from botocore.config import Config
+from idle_classifier import DEFAULT_CPU_THRESHOLD, DEFAULT_NETWORK_THRESHOLD, synthetic_chunk
+from metric_collector import AGENT_NAMESPACE, EC2_METRICS, MetricCube, MetricSpec, classify_cube, collect_fleet
+from rightsizing import memory_p95
+
+# -------------------------------
+# Fan-out settings
+# -------------------------------
+DEFAULT_SHARD_SIZE = 500
+DEFAULT_MAX_WORKERS = 32
+PARTIALS_PREFIX = "lambda-outputs/partials"
+# The merged analysis replaces the single results object the dashboard reads
+DEFAULT_RESULTS_KEY = "lambda-outputs/idle-instance-analysis.json"
+HOURS_PER_MONTH = 730
+# The agent's memory metric feeds p95_mem for rightsizing; without the agent it stays null
+SHARD_METRICS = EC2_METRICS + [MetricSpec("mem_used_percent", AGENT_NAMESPACE, "Average", "mean")]
+
+DEFAULT_SETTINGS = {
+    "evaluation_period_minutes": 14 * 24 * 60,
+    "period_seconds": 300,
+    "cpu_threshold": DEFAULT_CPU_THRESHOLD,
+    "network_threshold": DEFAULT_NETWORK_THRESHOLD,
+    # {instance_type: on-demand USD per hour}; unknown types save 0
+    "hourly_prices": {},
+    # "cloudwatch" reads real metrics; "synthetic" generates them for offline runs
+    "metrics_source": "cloudwatch",
+}
+
+
+# -------------------------------
+# Inventory and sharding
+# -------------------------------
+def list_region_instances(ec2):
+    region = ec2.meta.region_name
+    paginator = ec2.get_paginator("describe_instances")
+    instances = []
+    for page in paginator.paginate(Filters=[{"Name": "instance-state-name", "Values": ["running"]}]):
+        for reservation in page["Reservations"]:
+            for instance in reservation["Instances"]:
+                instances.append({"instance_id": instance["InstanceId"],
+                                  "instance_type": instance["InstanceType"],
+                                  "region": region})
+    return instances
+
+
+def list_fleet(regions, session=None, max_workers=16):
+    session = session or boto3.session.Session()
+    config = Config(retries={"mode": "adaptive", "max_attempts": 10})
+    clients = [session.client("ec2", region_name=r, config=config) for r in regions]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return [i for region_instances in pool.map(list_region_instances, clients) for i in region_instances]
+
+
+def shard_inventory(instances, shard_size=DEFAULT_SHARD_SIZE):
+    # Shards never span regions, so each worker talks to a single CloudWatch endpoint
+    by_region = {}
+    for instance in instances:
+        by_region.setdefault(instance["region"], []).append(instance)
+    shards = []
+    for region in sorted(by_region):
+        members = by_region[region]
+        for start in range(0, len(members), shard_size):
+            shards.append({"shard_id": f"{len(shards):05d}", "region": region,
+                           "instances": members[start:start + shard_size]})
+    return shards
+
+
+# -------------------------------
+# Worker: analyse one shard
+# -------------------------------
+def _shard_cube(shard, settings):
+    # (instance x time x metric) cube for the shard's instances, in shard order
+    ids = [i["instance_id"] for i in shard["instances"]]
+    period = settings["period_seconds"]
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    start = end - timedelta(minutes=settings["evaluation_period_minutes"])
+    if settings["metrics_source"] == "synthetic":
+        points = settings["evaluation_period_minutes"] * 60 // period
+        seed = int(shard["shard_id"]) if shard["shard_id"].isdigit() else 0
+        rng = np.random.default_rng(seed)
+        cpu, network = synthetic_chunk(rng, len(ids), points)
+        memory = rng.uniform(10, 90, (len(ids), 1)) + rng.standard_normal((len(ids), points)) * 3
+        timestamps = np.array([start + timedelta(seconds=period * i) for i in range(points)])
+        return MetricCube(ids, [shard["region"]] * len(ids), timestamps,
+                          ["CPUUtilization", "NetworkIn", "mem_used_percent"],
+                          np.stack([cpu, network, np.clip(memory, 0, 100).astype(np.float32)], axis=2), 0)
+    return collect_fleet({shard["region"]: ids}, start, end, period, specs=SHARD_METRICS)
+
+
+def _json_number(value, digits=None):
+    # NaN (no datapoints) becomes null; json.dumps would emit a bare NaN that strict
+    # readers such as ijson reject
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+    return round(value, digits) if digits is not None else value
+
+
+def analyze_shard(shard, settings=None):
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    started = time.time()
+    cube = _shard_cube(shard, settings)
+    result = classify_cube(cube, settings["period_seconds"], cpu_threshold=settings["cpu_threshold"],
+                           network_threshold=settings["network_threshold"])
+    memory = memory_p95(cube)
+
+    records = []
+    for i, instance in enumerate(shard["instances"]):
+        status = str(result["status"][i])
+        hourly = settings["hourly_prices"].get(instance["instance_type"], 0.0)
+        records.append({
+            "instance_id": instance["instance_id"],
+            "instance_type": instance["instance_type"],
+            "region": instance["region"],
+            "status": status,
+            "avg_cpu": _json_number(result["avg_cpu"][i], 2),
+            "max_cpu": _json_number(result["max_cpu"][i], 2),
+            "p95_cpu": _json_number(result["p95_cpu"][i], 2),
+            "p95_mem": _json_number(memory[i], 2),
+            "total_network": _json_number(result["total_network"][i]),
+            "recommendation": {"idle": "Stop or terminate idle instance",
+                               "active": "Keep running",
+                               "error": "No metrics available"}[status],
+            "estimated_savings": round(hourly * HOURS_PER_MONTH, 2) if status == "idle" else 0.0,
+        })
+    return {"shard_id": shard["shard_id"], "region": shard["region"],
+            "detailed_analysis": records, "elapsed": time.time() - started}
+
+
+# -------------------------------
+# Reducer: partials -> dashboard schema
+# -------------------------------
+def merge_partials(partials, settings=None):
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    detailed = [r for p in sorted(partials, key=lambda p: p["shard_id"]) for r in p["detailed_analysis"]]
+    idle = [r for r in detailed if r["status"] == "idle"]
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "evaluation_period_minutes": settings["evaluation_period_minutes"],
+            "cpu_threshold": settings["cpu_threshold"],
+            "network_threshold": settings["network_threshold"],
+            "shards": len(partials),
+        },
+        "summary": {
+            "total_instances_analyzed": len(detailed),
+            "idle_instances": len(idle),
+            "active_instances": sum(1 for r in detailed if r["status"] == "active"),
+            "potential_monthly_savings": round(sum(r["estimated_savings"] for r in idle), 2),
+        },
+        "detailed_analysis": detailed,
+        "idle_instances": [
+            {k: r[k] for k in ("instance_id", "instance_type", "region", "avg_cpu",
+                               "total_network", "estimated_savings")}
+            for r in idle
+        ],
+    }
+
+
+# -------------------------------
+# Backends
+# -------------------------------
+class LocalProcessBackend:
+    # Runs every shard in a local process pool; no AWS access needed with synthetic metrics
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+
+    def run(self, shards, settings):
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(analyze_shard, shards, [settings] * len(shards)))
+
+
+class LambdaBackend:
+    # Invokes one worker Lambda per shard; each writes its partial to S3 for the reducer
+    def __init__(self, function_name, bucket_name, lambda_client=None, s3=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        self.function_name = function_name
+        self.bucket_name = bucket_name
+        self.lambda_client = lambda_client or boto3.client(
+            "lambda", config=Config(read_timeout=900, retries={"max_attempts": 2}))
+        self.s3 = s3 or boto3.client("s3")
+        self.max_workers = max_workers
+
+    def run(self, shards, settings):
+        # Second resolution alone lets two coordinators started together share partial keys
+        run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+        def invoke(shard):
+            partial_key = f"{PARTIALS_PREFIX}/{run_id}/{shard['shard_id']}.json"
+            response = self.lambda_client.invoke(
+                FunctionName=self.function_name,
+                InvocationType="RequestResponse",
+                Payload=json.dumps({"mode": "worker", "shard": shard, "settings": settings,
+                                    "bucket": self.bucket_name, "partial_key": partial_key}).encode()
+            )
+            if response.get("FunctionError"):
+                raise RuntimeError(f"Shard {shard['shard_id']} failed: {response['Payload'].read()!r}")
+            body = self.s3.get_object(Bucket=self.bucket_name, Key=partial_key)["Body"].read()
+            return json.loads(body)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(invoke, shards))
+
+
+def worker_handler(event, context=None):
+    # Lambda entry point for {"mode": "worker"} events sent by LambdaBackend
+    partial = analyze_shard(event["shard"], event.get("settings"))
+    boto3.client("s3").put_object(Bucket=event["bucket"], Key=event["partial_key"],
+                                  Body=json.dumps(partial, allow_nan=False).encode(),
+                                  ContentType="application/json")
+    return {"shard_id": partial["shard_id"], "records": len(partial["detailed_analysis"])}
+
+
+# -------------------------------
+# Publishing: latest results + run history
+# -------------------------------
+def publish_analysis(s3, bucket_name, analysis, results_key=DEFAULT_RESULTS_KEY, sharded=True):
+    # Writes the merged analysis where the dashboard loads the latest run (a sharded
+    # manifest by default) and keeps a timestamped copy plus an index row for trends.
+    # Imported here so shard workers don't load the Arrow / zstd writers.
+    from results_format import write_sharded_results
+    from run_history import record_run
+    if sharded:
+        write_sharded_results(s3, bucket_name, results_key, analysis)
+    else:
+        s3.put_object(Bucket=bucket_name, Key=results_key, Body=json.dumps(analysis, default=str).encode(),
+                      ContentType="application/json")
+    return record_run(s3, bucket_name, analysis, sharded=sharded)
+
+
+# -------------------------------
+# Coordinator
+# -------------------------------
+def run_fanout(backend, instances, settings=None, shard_size=DEFAULT_SHARD_SIZE, s3=None, bucket_name=None,
+               results_key=DEFAULT_RESULTS_KEY, sharded=True):
+    # With a bucket the merged analysis is published (see publish_analysis) before it is returned
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    shards = shard_inventory(instances, shard_size)
+    partials = backend.run(shards, settings)
+    analysis = merge_partials(partials, settings)
+    if bucket_name:
+        publish_analysis(s3 or boto3.client("s3"), bucket_name, analysis, results_key, sharded)
+    return analysis
+
+
+def run_offline_demo(instances=20_000, regions=("us-east-1", "eu-west-1", "ap-south-1")):
+    # Synthetic metrics in local processes, published to a moto bucket
+    from moto import mock_aws
+    from results_format import is_sharded
+
+    fleet = [{"instance_id": f"i-{i:017x}", "instance_type": "t3.medium", "region": regions[i % len(regions)]}
+             for i in range(instances)]
+    settings = {"metrics_source": "synthetic", "hourly_prices": {"t3.medium": 0.0416}}
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1", aws_access_key_id="testing",
+                          aws_secret_access_key="testing")
+        s3.create_bucket(Bucket="fanout-demo")
+        started = time.perf_counter()
+        analysis = run_fanout(LocalProcessBackend(), fleet, settings, s3=s3, bucket_name="fanout-demo")
+        elapsed = time.perf_counter() - started
+        manifest = json.loads(s3.get_object(Bucket="fanout-demo", Key=DEFAULT_RESULTS_KEY)["Body"].read())
+    print(f"{analysis['metadata']['shards']} shards reduced and published in {elapsed:.1f}s: {analysis['summary']}")
+    print(f"{DEFAULT_RESULTS_KEY}: sharded={is_sharded(manifest)}, {len(manifest['shards'])} result shards")
+
+
+if __name__ == "__main__":
+    run_offline_demo()
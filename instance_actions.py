@@ -0,0 +1,132 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# -------------------------------
+# Bulk stop / hibernate settings
+# -------------------------------
+MAX_IDS_PER_CALL = 1000
+DEFAULT_MAX_WORKERS = 8
+
+# status is one of: stopping, stopped, would-stop (dry run), failed
+Outcome = namedtuple("Outcome", ["instance_id", "region", "action", "status", "message"])
+
+
+def _error_code(error):
+    return error.response.get("Error", {}).get("Code")
+
+
+def _batches(ids, size=MAX_IDS_PER_CALL):
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+# -------------------------------
+# Per-batch calls
+# -------------------------------
+# Errors that apply to the caller rather than to any one instance; bisecting won't help
+CALLER_ERROR_CODES = ("UnauthorizedOperation", "AuthFailure", "OptInRequired")
+
+
+def stop_batch(ec2, region, instance_ids, hibernate=False, dry_run=False):
+    action = "hibernate" if hibernate else "stop"
+    try:
+        response = ec2.stop_instances(InstanceIds=instance_ids, Hibernate=hibernate, DryRun=dry_run)
+    except ClientError as e:
+        code = _error_code(e)
+        if code == "DryRunOperation":
+            return [Outcome(i, region, action, f"would-{action}", "dry run passed") for i in instance_ids]
+        if len(instance_ids) == 1 or code in CALLER_ERROR_CODES:
+            message = f"{code}: {e.response['Error'].get('Message', '')}"
+            return [Outcome(i, region, action, "failed", message) for i in instance_ids]
+        # One bad ID (already terminated, not hibernation-enabled, ...) fails the whole
+        # call; bisect so the rest still go through in a handful of extra calls
+        middle = len(instance_ids) // 2
+        return (stop_batch(ec2, region, instance_ids[:middle], hibernate, dry_run)
+                + stop_batch(ec2, region, instance_ids[middle:], hibernate, dry_run))
+
+    if dry_run:
+        # Some endpoints accept DryRun without raising; treat that as a pass
+        return [Outcome(i, region, action, f"would-{action}", "dry run passed") for i in instance_ids]
+    return [Outcome(change["InstanceId"], region, action, change["CurrentState"]["Name"],
+                    f"{change['PreviousState']['Name']} -> {change['CurrentState']['Name']}")
+            for change in response.get("StoppingInstances", [])]
+
+
+# -------------------------------
+# Fleet-wide executor
+# -------------------------------
+def iter_stop_instances(instances_by_region, hibernate=False, dry_run_only=False, session=None,
+                        max_workers=DEFAULT_MAX_WORKERS):
+    # instances_by_region: {region: [instance_id, ...]}. Every batch is dry-run first and
+    # only instances that pass are acted on; each batch is its own task, so outcomes are
+    # yielded as soon as that batch finishes and an error fails only that batch.
+    session = session or boto3.session.Session()
+    action = "hibernate" if hibernate else "stop"
+    # botocore's adaptive mode is the only retry layer: it backs off throttled calls and
+    # rate-limits the one client that all of a region's batches share
+    config = Config(retries={"mode": "adaptive", "max_attempts": 10})
+    clients = {r: session.client("ec2", region_name=r, config=config)
+               for r, ids in instances_by_region.items() if ids}
+
+    def run_batch(region, batch):
+        ec2 = clients[region]
+        checked = stop_batch(ec2, region, batch, hibernate, dry_run=True)
+        if dry_run_only:
+            return checked
+        failed = [o for o in checked if o.status == "failed"]
+        passed = [o.instance_id for o in checked if o.status != "failed"]
+        return failed + (stop_batch(ec2, region, passed, hibernate) if passed else [])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_batch, region, batch): (region, batch)
+                   for region in clients for batch in _batches(list(dict.fromkeys(instances_by_region[region])))}
+        for future in as_completed(futures):
+            region, batch = futures[future]
+            try:
+                outcomes = future.result()
+            except Exception as e:
+                outcomes = [Outcome(i, region, action, "failed", str(e)) for i in batch]
+            yield outcomes
+
+
+def stop_instances(instances_by_region, **kwargs):
+    return [outcome for batch in iter_stop_instances(instances_by_region, **kwargs) for outcome in batch]
+
+
+# -------------------------------
+# Benchmark against moto
+# -------------------------------
+def run_benchmark(per_region=500, regions=("us-east-1", "eu-west-1")):
+    import os
+    from moto import mock_aws
+
+    os.environ.setdefault("MOTO_EC2_LOAD_DEFAULT_AMIS", "false")
+    with mock_aws():
+        session = boto3.session.Session(aws_access_key_id="testing", aws_secret_access_key="testing",
+                                        region_name=regions[0])
+        fleet = {}
+        for region in regions:
+            ec2 = session.client("ec2", region_name=region)
+            reservation = ec2.run_instances(ImageId="ami-12345678", MinCount=per_region, MaxCount=per_region,
+                                            InstanceType="t3.micro")
+            fleet[region] = [i["InstanceId"] for i in reservation["Instances"]]
+        fleet[regions[0]].append("i-0000000000000dead")
+
+        calls = []
+        session.events.register("before-call.ec2.StopInstances", lambda **kw: calls.append(1))
+        started = time.perf_counter()
+        outcomes = stop_instances(fleet, session=session)
+        elapsed = time.perf_counter() - started
+
+        statuses = {}
+        for outcome in outcomes:
+            statuses[outcome.status] = statuses.get(outcome.status, 0) + 1
+        print(f"{len(outcomes)} instances in {elapsed:.2f}s with {len(calls)} StopInstances calls "
+              f"(dry runs included): {statuses}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,249 @@
+import json
+import os
+import sys
+import time
+import ijson
+import numpy as np
+import pandas as pd
+from cache_paths import CACHE_DIR
+
+# -------------------------------
+# Index layout
+# -------------------------------
+# One dense float32 array of effective hourly USD prices, indexed by
+#   instance type x region x operating system x tenancy x license model x purchase option
+# (NaN where AWS has no offer), saved as .npy so it can be memory-mapped, plus a small
+# JSON sidecar holding the layout version and the axis labels. An index written in another
+# layout is refused rather than read with the wrong shape.
+INDEX_VERSION = 2
+HOURS_PER_MONTH = 730
+DEFAULT_INDEX_DIR = CACHE_DIR
+AXES = ("instance_type", "region", "operating_system", "tenancy", "license_model", "purchase_option")
+# Without an explicit license model, a lookup takes the first of these the OS is offered
+# with: Linux is "No License required", Windows "License Included" (BYOL only when asked)
+DEFAULT_LICENSE_MODELS = ("No License required", "License Included")
+
+ON_DEMAND = "On-Demand"
+PURCHASE_OPTIONS = [ON_DEMAND] + [f"{term} {option}" for term in ("1yr", "3yr")
+                                  for option in ("No Upfront", "Partial Upfront", "All Upfront")]
+TERM_HOURS = {"1yr": 8760, "3yr": 3 * 8760}
+
+
+def _paths(index_dir):
+    return os.path.join(index_dir, "instance-prices.npy"), os.path.join(index_dir, "instance-prices.json")
+
+
+# -------------------------------
+# Ingest: EC2 offer file -> dense array
+# -------------------------------
+def _compute_products(f):
+    # Only the plain, shared-capacity listing of each instance is billed to a normal fleet
+    products = {}
+    for sku, product in ijson.kvitems(f, "products"):
+        if product.get("productFamily") != "Compute Instance":
+            continue
+        a = product.get("attributes", {})
+        if a.get("capacitystatus", "Used") != "Used" or a.get("preInstalledSw", "NA") != "NA":
+            continue
+        if not a.get("instanceType") or not a.get("regionCode"):
+            continue
+        products[sku] = (a["instanceType"], a["regionCode"], a.get("operatingSystem", "Linux"),
+                         a.get("tenancy", "Shared"), a.get("licenseModel", DEFAULT_LICENSE_MODELS[0]))
+    return products
+
+
+def _effective_hourly(offer, term_hours=None):
+    hourly = upfront = 0.0
+    for dimension in offer.get("priceDimensions", {}).values():
+        price = float(dimension["pricePerUnit"].get("USD", 0))
+        if dimension.get("unit", "").lower() in ("hrs", "hours"):
+            hourly += price
+        elif dimension.get("unit") == "Quantity":
+            upfront += price
+    return hourly + (upfront / term_hours if term_hours else 0.0)
+
+
+def iter_instance_prices(path):
+    # Yields ((type, region, os, tenancy, license model), purchase option, effective hourly price)
+    with open(path, "rb") as f:
+        products = _compute_products(f)
+
+    with open(path, "rb") as f:
+        for sku, offers in ijson.kvitems(f, "terms.OnDemand"):
+            if sku in products:
+                for offer in offers.values():
+                    yield products[sku], ON_DEMAND, _effective_hourly(offer)
+                    break
+
+    with open(path, "rb") as f:
+        for sku, offers in ijson.kvitems(f, "terms.Reserved"):
+            if sku not in products:
+                continue
+            for offer in offers.values():
+                terms = offer.get("termAttributes", {})
+                if terms.get("OfferingClass", "standard") != "standard":
+                    continue
+                option = f"{terms.get('LeaseContractLength')} {terms.get('PurchaseOption')}"
+                if option in PURCHASE_OPTIONS:
+                    yield products[sku], option, _effective_hourly(offer, TERM_HOURS[option.split()[0]])
+
+
+def build_instance_index(offer_paths, index_dir=DEFAULT_INDEX_DIR):
+    entries = [entry for path in offer_paths for entry in iter_instance_prices(path)]
+    labels = {axis: sorted({key[i] for key, _, _ in entries}) for i, axis in enumerate(AXES[:5])}
+    labels["purchase_option"] = list(PURCHASE_OPTIONS)
+    lookup = {axis: {label: i for i, label in enumerate(values)} for axis, values in labels.items()}
+
+    prices = np.full([len(labels[axis]) for axis in AXES], np.nan, dtype=np.float32)
+    if entries:
+        coords = np.array([[lookup[axis][key[i]] for i, axis in enumerate(AXES[:5])]
+                           + [lookup["purchase_option"][option]] for key, option, _ in entries])
+        prices[tuple(coords.T)] = [price for _, _, price in entries]
+
+    os.makedirs(index_dir, exist_ok=True)
+    array_path, labels_path = _paths(index_dir)
+    np.save(array_path, prices)
+    with open(labels_path, "w") as f:
+        json.dump({"version": INDEX_VERSION, "labels": labels}, f)
+    return prices.shape
+
+
+# -------------------------------
+# Reader and vectorized repricing
+# -------------------------------
+class InstancePriceIndex:
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        array_path, labels_path = _paths(index_dir)
+        self.prices = np.load(array_path, mmap_mode="r")
+        with open(labels_path) as f:
+            sidecar = json.load(f)
+        # Version 1 sidecars were the bare labels, without a license_model axis
+        if sidecar.get("version") != INDEX_VERSION or self.prices.ndim != len(AXES):
+            raise ValueError(f"{index_dir} holds an older instance price index; rebuild it with "
+                             f"`python instance_pricing.py <EC2 offer files>`")
+        self.labels = sidecar["labels"]
+
+    @classmethod
+    def load_default(cls, index_dir=DEFAULT_INDEX_DIR):
+        return cls(index_dir) if os.path.exists(_paths(index_dir)[0]) else None
+
+    def _codes(self, axis, values):
+        # Vectorized label -> position; -1 where the label is not in the index
+        return pd.Categorical(values, categories=self.labels[axis]).codes.astype(np.int64)
+
+    def _position(self, axis, value):
+        return self.labels[axis].index(value) if value in self.labels[axis] else -1
+
+    def hourly(self, instance_types, regions, operating_system="Linux", tenancy="Shared",
+               license_model=None, purchase_option=ON_DEMAND):
+        # One gather per candidate license model over the whole fleet; NaN for unknown types,
+        # regions or missing offers
+        types = self._codes("instance_type", instance_types)
+        region_codes = self._codes("region", regions)
+        system, tenancy_code, option = (self._position(axis, value) for axis, value in (
+            ("operating_system", operating_system), ("tenancy", tenancy), ("purchase_option", purchase_option)))
+        known = (types >= 0) & (region_codes >= 0)
+        result = np.full(len(types), np.nan, dtype=np.float32)
+        if min(system, tenancy_code, option) < 0:
+            return result
+        for model in ([license_model] if license_model else DEFAULT_LICENSE_MODELS):
+            position = self._position("license_model", model)
+            if position >= 0:
+                missing = known & np.isnan(result)
+                result[missing] = self.prices[types[missing], region_codes[missing], system, tenancy_code,
+                                              position, option]
+        return result
+
+    def monthly(self, instance_types, regions, **assumptions):
+        return self.hourly(instance_types, regions, **assumptions) * np.float32(HOURS_PER_MONTH)
+
+
+def reprice_savings(df, index, default_region="us-east-1", **assumptions):
+    # Savings are the monthly cost of instances flagged idle; rows the index can't price
+    # keep the value the Lambda reported
+    regions = df["region"] if "region" in df.columns else pd.Series(default_region, index=df.index)
+    monthly = index.monthly(df["instance_type"], regions.fillna(default_region), **assumptions)
+    idle = (df["status"] == "idle").to_numpy() if "status" in df.columns else np.ones(len(df), dtype=bool)
+    current = df["estimated_savings"].to_numpy(dtype=np.float32) if "estimated_savings" in df.columns \
+        else np.zeros(len(df), dtype=np.float32)
+    repriced = np.where(np.isnan(monthly), current, np.where(idle, monthly, np.float32(0)))
+    out = df.copy()
+    out["estimated_savings"] = repriced.astype(np.float32)
+    return out
+
+
+# -------------------------------
+# Benchmark: synthetic offer file, 100k rows repriced
+# -------------------------------
+def write_synthetic_offer(path, families=("t3", "m5", "c5", "r5", "m6i", "c6i", "r6i", "m7g"),
+                          sizes=("nano", "micro", "small", "medium", "large", "xlarge", "2xlarge", "4xlarge"),
+                          regions=("us-east-1", "us-west-2", "eu-west-1", "eu-central-1", "ap-south-1"),
+                          systems=("Linux", "Windows", "RHEL", "SUSE"), tenancies=("Shared", "Dedicated")):
+    products, on_demand, reserved = {}, {}, {}
+    sku_count = 0
+    for f_i, family in enumerate(families):
+        for s_i, size in enumerate(sizes):
+            base = 0.0052 * 2 ** s_i * (1 + 0.15 * f_i)
+            for r_i, region in enumerate(regions):
+                for o_i, system in enumerate(systems):
+                    # Windows is sold with the license and, at the Linux rate, as bring-your-own
+                    licenses = (("License Included", 1 + 0.4 * o_i), ("Bring your own license", 1.0)) \
+                        if system == "Windows" else (("No License required", 1 + 0.4 * o_i),)
+                    for t_i, tenancy in enumerate(tenancies):
+                        for license_model, os_factor in licenses:
+                            sku = f"SKU{sku_count:07d}"
+                            sku_count += 1
+                            hourly = base * (1 + 0.05 * r_i) * os_factor * (1 + 0.1 * t_i)
+                            products[sku] = {"sku": sku, "productFamily": "Compute Instance", "attributes": {
+                                "instanceType": f"{family}.{size}", "regionCode": region,
+                                "operatingSystem": system, "tenancy": tenancy, "licenseModel": license_model,
+                                "capacitystatus": "Used", "preInstalledSw": "NA"}}
+                            on_demand[sku] = {f"{sku}.OD": {"priceDimensions": {f"{sku}.OD.H": {
+                                "unit": "Hrs", "pricePerUnit": {"USD": f"{hourly:.6f}"}}}}}
+                            reserved[sku] = {f"{sku}.RI1": {
+                                "termAttributes": {"LeaseContractLength": "1yr", "OfferingClass": "standard",
+                                                   "PurchaseOption": "All Upfront"},
+                                "priceDimensions": {
+                                    f"{sku}.RI1.H": {"unit": "Hrs", "pricePerUnit": {"USD": "0"}},
+                                    f"{sku}.RI1.U": {"unit": "Quantity",
+                                                     "pricePerUnit": {"USD": f"{hourly * 8760 * 0.6:.2f}"}}}}}
+    with open(path, "w") as f:
+        json.dump({"offerCode": "AmazonEC2", "products": products,
+                   "terms": {"OnDemand": on_demand, "Reserved": reserved}}, f)
+
+
+def run_benchmark(rows=100_000):
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        offer = os.path.join(tmp, "offer.json")
+        write_synthetic_offer(offer)
+        started = time.perf_counter()
+        shape = build_instance_index([offer], tmp)
+        print(f"built {shape} price array in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(_paths(tmp)[0]) / 1024:.0f} KiB)")
+
+        index = InstancePriceIndex(tmp)
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            "instance_type": pd.Categorical(rng.choice(index.labels["instance_type"], rows)),
+            "region": pd.Categorical(rng.choice(index.labels["region"], rows)),
+            "status": pd.Categorical(rng.choice(["idle", "active"], rows)),
+            "estimated_savings": np.zeros(rows, dtype=np.float32),
+        })
+        for assumptions in ({}, {"operating_system": "Windows"},
+                            {"operating_system": "Windows", "license_model": "Bring your own license"},
+                            {"tenancy": "Dedicated", "purchase_option": "1yr All Upfront"}):
+            started = time.perf_counter()
+            repriced = reprice_savings(df, index, **assumptions)
+            elapsed = time.perf_counter() - started
+            print(f"repriced {rows} rows in {elapsed * 1000:.1f}ms {assumptions or '(Linux, Shared, On-Demand)'}: "
+                  f"${repriced['estimated_savings'].sum():,.0f}/month")
+
+
+if __name__ == "__main__":
+    # python instance_pricing.py <EC2 offer files>  builds the default index; no arguments runs the benchmark
+    if sys.argv[1:]:
+        print(f"built {build_instance_index(sys.argv[1:])} price array in {DEFAULT_INDEX_DIR}")
+    else:
+        run_benchmark()
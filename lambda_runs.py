@@ -0,0 +1,183 @@
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+# -------------------------------
+# Run status layout
+# -------------------------------
+# status/active.json is a lock naming the run in progress, so every dashboard session
+# attaches to it instead of invoking the Lambda again. status/<run_id>.json is a tiny
+# progress document the Lambda rewrites as it works.
+STATUS_PREFIX = "lambda-outputs/status"
+ACTIVE_KEY = f"{STATUS_PREFIX}/active.json"
+DEFAULT_RESULTS_KEY = "lambda-outputs/idle-instance-analysis.json"
+# A lock older than the Lambda's 15 minute limit (plus slack) belongs to a dead run
+LAMBDA_MAX_RUNTIME_SECONDS = 15 * 60
+STALE_RUN_SECONDS = LAMBDA_MAX_RUNTIME_SECONDS + 5 * 60
+
+TERMINAL_STATES = ("succeeded", "failed")
+
+
+def status_key(run_id):
+    return f"{STATUS_PREFIX}/{run_id}.json"
+
+
+def _error_code(error):
+    return error.response.get("Error", {}).get("Code")
+
+
+def _read_json(s3, bucket_name, key):
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if _error_code(e) in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return json.loads(response["Body"].read()), response["ETag"]
+
+
+def _put_json(s3, bucket_name, key, body, **conditions):
+    s3.put_object(Bucket=bucket_name, Key=key, Body=json.dumps(body).encode(),
+                  ContentType="application/json", **conditions)
+
+
+# -------------------------------
+# Status document (written by the Lambda as it progresses)
+# -------------------------------
+def update_run_status(s3, bucket_name, run_id, state, progress=None, message=None, result_key=None):
+    status, _ = _read_json(s3, bucket_name, status_key(run_id))
+    status = status or {"run_id": run_id}
+    status.update({"state": state, "updated_at": time.time()})
+    if progress is not None:
+        status["progress"] = progress
+    if message is not None:
+        status["message"] = message
+    if result_key is not None:
+        status["result_key"] = result_key
+    _put_json(s3, bucket_name, status_key(run_id), status)
+
+    if state in TERMINAL_STATES:
+        release_run(s3, bucket_name, run_id)
+    return status
+
+
+def release_run(s3, bucket_name, run_id):
+    active, etag = _read_json(s3, bucket_name, ACTIVE_KEY)
+    if active and active.get("run_id") == run_id:
+        # Only drop the lock if it still names this run
+        try:
+            s3.delete_object(Bucket=bucket_name, Key=ACTIVE_KEY, IfMatch=etag)
+        except ClientError as e:
+            if _error_code(e) not in ("PreconditionFailed", "NoSuchKey"):
+                raise
+
+
+def get_run_status(s3, bucket_name, run_id):
+    status, _ = _read_json(s3, bucket_name, status_key(run_id))
+    return status
+
+
+def _results_version(s3, bucket_name, key):
+    # (ETag, LastModified epoch) of the results object or manifest; None if absent
+    try:
+        head = s3.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if _error_code(e) in ("NoSuchKey", "404", "NotFound"):
+            return None
+        raise
+    return head["ETag"], head["LastModified"].timestamp()
+
+
+def poll_run(s3, bucket_name, run_id, timeout_seconds=STALE_RUN_SECONDS):
+    # The deployed Lambda doesn't write status documents, so a new version of the results
+    # object (or sharded manifest) since the run started also counts as completion; a run
+    # that shows neither within the Lambda's maximum runtime is failed and its lock released
+    status = get_run_status(s3, bucket_name, run_id) or {"run_id": run_id, "state": "queued"}
+    if status.get("state") in TERMINAL_STATES:
+        return status
+    started_at = status.get("started_at")
+    if started_at is None:
+        active, _ = _read_json(s3, bucket_name, ACTIVE_KEY)
+        started_at = active["started_at"] if active and active.get("run_id") == run_id else time.time()
+
+    result_key = status.get("result_key", DEFAULT_RESULTS_KEY)
+    version = _results_version(s3, bucket_name, result_key)
+    # LastModified has one-second resolution, hence the floor
+    changed = version is not None and version[0] != status.get("previous_etag") \
+        and version[1] >= int(started_at)
+    if changed:
+        return update_run_status(s3, bucket_name, run_id, "succeeded", progress=1.0,
+                                 message="Results updated", result_key=result_key)
+    if time.time() - started_at > timeout_seconds:
+        return update_run_status(s3, bucket_name, run_id, "failed",
+                                 message=f"No results after {int(timeout_seconds // 60)} minutes")
+    return status
+
+
+def get_active_run(s3, bucket_name):
+    active, _ = _read_json(s3, bucket_name, ACTIVE_KEY)
+    if active and time.time() - active["started_at"] < STALE_RUN_SECONDS:
+        return active["run_id"]
+    return None
+
+
+# -------------------------------
+# Starting a run (dashboard side)
+# -------------------------------
+def _claim_run(s3, bucket_name, run_id):
+    # Returns the run that owns the lock: ours if claimed, otherwise the one in progress
+    lock = {"run_id": run_id, "started_at": time.time()}
+    try:
+        _put_json(s3, bucket_name, ACTIVE_KEY, lock, IfNoneMatch="*")
+        return run_id
+    except ClientError as e:
+        if _error_code(e) not in ("PreconditionFailed", "ConditionalRequestConflict"):
+            raise
+
+    active, etag = _read_json(s3, bucket_name, ACTIVE_KEY)
+    if active is None:
+        return _claim_run(s3, bucket_name, run_id)
+    if time.time() - active["started_at"] < STALE_RUN_SECONDS:
+        return active["run_id"]
+
+    # The previous run died without releasing the lock; take it over
+    try:
+        _put_json(s3, bucket_name, ACTIVE_KEY, lock, IfMatch=etag)
+        return run_id
+    except ClientError as e:
+        if _error_code(e) not in ("PreconditionFailed", "ConditionalRequestConflict"):
+            raise
+        active, _ = _read_json(s3, bucket_name, ACTIVE_KEY)
+        return active["run_id"] if active else _claim_run(s3, bucket_name, run_id)
+
+
+def start_run(lambda_client, s3, bucket_name, function_name, results_key=DEFAULT_RESULTS_KEY):
+    # Returns (run_id, started); started is False when an existing run was joined
+    run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+    owner = _claim_run(s3, bucket_name, run_id)
+    if owner != run_id:
+        return owner, False
+
+    # Remember the results version that predates this run, so poll_run can tell a new one apart
+    previous = _results_version(s3, bucket_name, results_key)
+    _put_json(s3, bucket_name, status_key(run_id), {
+        "run_id": run_id, "started_at": time.time(), "previous_etag": previous[0] if previous else None})
+    update_run_status(s3, bucket_name, run_id, "queued", progress=0.0, message="Waiting for Lambda",
+                      result_key=results_key)
+    try:
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps({
+                "run_id": run_id,
+                "bucket": bucket_name,
+                "status_key": status_key(run_id),
+                "result_key": results_key,
+            }).encode()
+        )
+    except Exception as e:
+        update_run_status(s3, bucket_name, run_id, "failed", message=f"Invoke failed: {e}")
+        raise
+    return run_id, True
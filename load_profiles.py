@@ -0,0 +1,554 @@
+import bisect
+import csv
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import sys
+import threading
+import time
+from datetime import datetime
+
+from cpu_spike import DEFAULT_SLICE_SECONDS, _cpu_times
+
+# -------------------------------
+# Profile settings
+# -------------------------------
+# A profile maps each channel to a list of segments played back to back. Channels and units:
+#   cpu %, memory % (mem_used_percent), rss MiB held by this process, disk MB/s written,
+#   network bytes/s sent
+# e.g.
+#   {"cpu": [{"shape": "ramp", "start": 5, "end": 80, "duration": 300},
+#            {"shape": "square", "low": 5, "high": 90, "period": 120, "duty": 0.25, "duration": 600}],
+#    "memory": [{"shape": "diurnal", "low": 30, "high": 70, "period": 3600, "duration": 3600}],
+#    "options": {"disk": {"pattern": "random"}, "network": {"peer": "10.0.1.23:5201"}}}
+# "options" holds keyword arguments for each channel's driver.
+# Standard library only, like cpu_spike.py, so both files can be pushed to instances together.
+DEFAULT_TICK_SECONDS = 0.1
+DEFAULT_SAMPLE_SECONDS = 1.0
+# The last stretch before each tick deadline is spun rather than slept, which keeps tick
+# lateness well under a millisecond on an otherwise loaded box
+SPIN_SECONDS = 0.001
+MEMORY_CHUNK_BYTES = 8 * 1024 * 1024
+# At most this many chunks are allocated per tick, so a large step doesn't stall the scheduler
+MEMORY_STEP_CHUNKS = 8
+MEMORY_CEILING_PERCENT = 95.0
+PAGE_BYTES = 4096
+DISK_BLOCK_BYTES = 1024 * 1024
+DISK_FILE_MIB = 1024
+DEFAULT_SINK_PORT = 5201
+
+
+# -------------------------------
+# Segment shapes
+# -------------------------------
+def _parse_timestamp(value):
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def load_trace(path, metric=None):
+    # (offset_seconds, value) points from `aws cloudwatch get-metric-data` or
+    # `get-metric-statistics` JSON, or a "timestamp,value" CSV; sorted oldest first
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = [row for row in csv.reader(f) if row and not row[0].startswith("#")]
+        try:
+            float(rows[0][1])
+        except ValueError:
+            rows = rows[1:]
+        points = [(_parse_timestamp(t), float(v)) for t, v in rows]
+    else:
+        with open(path) as f:
+            data = json.load(f)
+        if "MetricDataResults" in data:
+            results = data["MetricDataResults"]
+            result = next((r for r in results if metric in (r.get("Id"), r.get("Label"))), results[0])
+            points = [(_parse_timestamp(t), float(v)) for t, v in zip(result["Timestamps"], result["Values"])]
+        else:
+            stat = metric or "Average"
+            points = [(_parse_timestamp(p["Timestamp"]), float(p[stat])) for p in data["Datapoints"]]
+    if not points:
+        raise ValueError(f"No datapoints in {path}")
+    points.sort()
+    return [(t - points[0][0], v) for t, v in points]
+
+
+def _segment(spec):
+    # Returns (duration, value_at(t)) for one segment; t runs from 0 to duration
+    shape = spec["shape"]
+    if shape == "replay":
+        speedup = float(spec.get("speedup", 1))
+        points = spec.get("points") or load_trace(spec["path"], spec.get("metric"))
+        times = [t / speedup for t, _ in points]
+        values = [v * float(spec.get("scale", 1)) for _, v in points]
+
+        def replay(t):
+            i = bisect.bisect_right(times, t)
+            if i == 0:
+                return values[0]
+            if i == len(times):
+                return values[-1]
+            span = times[i] - times[i - 1]
+            return values[i - 1] + (values[i] - values[i - 1]) * (t - times[i - 1]) / span if span else values[i]
+        return float(spec.get("duration", times[-1])), replay
+
+    duration = float(spec.get("duration", 0))
+    if shape == "constant":
+        value = float(spec["value"])
+        return duration, lambda t: value
+    if shape == "ramp":
+        start, end = float(spec["start"]), float(spec["end"])
+        return duration, lambda t: start + (end - start) * (t / duration if duration else 1)
+    if shape == "step":
+        # levels: [[hold_seconds, value], ...]
+        holds = [float(h) for h, _ in spec["levels"]]
+        values = [float(v) for _, v in spec["levels"]]
+        edges = [sum(holds[:i + 1]) for i in range(len(holds))]
+        return sum(holds), lambda t: values[min(bisect.bisect_right(edges, t), len(values) - 1)]
+    if shape == "square":
+        low, high, period = float(spec["low"]), float(spec["high"]), float(spec["period"])
+        duty = float(spec.get("duty", 0.5))
+        return duration, lambda t: high if (t % period) < duty * period else low
+    if shape in ("sine", "diurnal"):
+        # diurnal is a sine over one day (or a compressed "day" of `period` seconds) that
+        # peaks at peak_at, a fraction of the period (default 14:00)
+        low, high = float(spec["low"]), float(spec["high"])
+        period = float(spec.get("period", 86400 if shape == "diurnal" else 60))
+        peak_at = float(spec.get("peak_at", 14 / 24 if shape == "diurnal" else 0.25))
+        mid, amplitude = (low + high) / 2, (high - low) / 2
+        return duration, lambda t: mid + amplitude * math.sin(2 * math.pi * (t / period - peak_at + 0.25))
+    raise ValueError(f"Unknown profile shape: {shape}")
+
+
+def compile_profile(segments):
+    # Concatenates segments into one (duration, value_at(t)) curve
+    if isinstance(segments, dict):
+        segments = [segments]
+    parts = [_segment(spec) for spec in segments]
+    starts = [0.0]
+    for duration, _ in parts:
+        starts.append(starts[-1] + duration)
+
+    def value_at(t):
+        i = min(max(bisect.bisect_right(starts, t) - 1, 0), len(parts) - 1)
+        return parts[i][1](t - starts[i])
+    return starts[-1], value_at
+
+
+# -------------------------------
+# Channel drivers
+# -------------------------------
+def _follow(target, stop, slice_seconds):
+    # CPU worker: busy for `target` of every slice, re-reading the shared target each slice
+    deadline = time.monotonic()
+    x = 0
+    while not stop.is_set():
+        busy_until = deadline + slice_seconds * target.value
+        while time.monotonic() < busy_until:
+            for i in range(200):
+                x += i
+        deadline += slice_seconds
+        pause = deadline - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        else:
+            deadline = time.monotonic()
+
+
+class CpuDriver:
+    unit = "%"
+
+    def __init__(self, workers=None, slice_seconds=DEFAULT_SLICE_SECONDS):
+        self.workers = workers or os.cpu_count() or 1
+        self.slice_seconds = slice_seconds
+        self.target = multiprocessing.Value("d", 0.0, lock=False)
+        self.stop_event = multiprocessing.Event()
+        self.processes = []
+
+    def start(self):
+        self.processes = [multiprocessing.Process(target=_follow, daemon=True,
+                                                  args=(self.target, self.stop_event, self.slice_seconds))
+                          for _ in range(self.workers)]
+        for process in self.processes:
+            process.start()
+        self._last = _cpu_times()
+
+    def set(self, value):
+        self.target.value = min(max(value, 0.0), 100.0) / 100
+
+    def sample(self):
+        # Whole-machine utilization since the previous sample, as CloudWatch would see it
+        now = _cpu_times()
+        if not now or not self._last or now[1] <= self._last[1]:
+            return None
+        busy, total = now[0] - self._last[0], now[1] - self._last[1]
+        self._last = now
+        return 100 * busy / total
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join()
+
+
+def memory_used_percent():
+    # Same formula as the CloudWatch agent's mem_used_percent: (total - available) / total
+    info = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            info[key] = int(value.split()[0]) * 1024
+    return 100 * (info["MemTotal"] - info["MemAvailable"]) / info["MemTotal"], info["MemTotal"]
+
+
+class MemoryDriver:
+    # Closed loop on mem_used_percent: allocates or frees touched chunks until the machine
+    # sits at the target, so other processes' memory is accounted for
+    unit = "%"
+
+    def __init__(self, chunk_bytes=MEMORY_CHUNK_BYTES, ceiling_percent=MEMORY_CEILING_PERCENT,
+                 step_chunks=MEMORY_STEP_CHUNKS):
+        self.chunk_bytes = chunk_bytes
+        self.step_chunks = step_chunks
+        self.ceiling_percent = ceiling_percent
+        self.chunks = []
+
+    def start(self):
+        memory_used_percent()
+
+    def _resize(self, delta_bytes):
+        delta = int(delta_bytes / self.chunk_bytes)
+        for _ in range(min(max(delta, 0), self.step_chunks)):
+            chunk = bytearray(self.chunk_bytes)
+            # Touch one byte per page so the allocation is resident, not just reserved
+            chunk[::PAGE_BYTES] = b"\x01" * len(range(0, self.chunk_bytes, PAGE_BYTES))
+            self.chunks.append(chunk)
+        for _ in range(min(-delta, len(self.chunks)) if delta < 0 else 0):
+            self.chunks.pop()
+
+    def set(self, value):
+        used, total = memory_used_percent()
+        target = min(value, self.ceiling_percent)
+        if target > used or self.chunks:
+            self._resize((target - used) / 100 * total)
+
+    def sample(self):
+        return memory_used_percent()[0]
+
+    def stop(self):
+        self.chunks.clear()
+
+
+def resident_mib():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+class RssDriver(MemoryDriver):
+    # Holds this process's resident set at a target size in MiB, independent of what else
+    # is running; the machine-wide ceiling still applies
+    unit = "MiB"
+
+    def start(self):
+        resident_mib()
+
+    def set(self, value):
+        used = memory_used_percent()[0]
+        delta = (max(value, 0.0) - resident_mib()) * 1024 * 1024
+        if delta > 0 and used >= self.ceiling_percent:
+            return
+        self._resize(delta)
+
+    def sample(self):
+        return resident_mib()
+
+
+def _paced(get_rate, stop, write, block_bytes, after_burst=None):
+    # 10ms token bucket shared by the disk and network drivers; unsent budget carries over
+    # so short stalls are caught up
+    budget, last = 0.0, time.monotonic()
+    while not stop.is_set():
+        now = time.monotonic()
+        rate = get_rate()
+        budget = min(budget + rate * (now - last), max(rate, block_bytes))
+        last = now
+        wrote = False
+        while budget >= 1 and not stop.is_set():
+            n = min(int(budget), block_bytes)
+            write(n)
+            budget -= n
+            wrote = True
+        if wrote and after_burst:
+            after_burst()
+        time.sleep(0.01)
+
+
+class DiskDriver:
+    # Writes at the target MB/s into a file of file_mib, sequentially (wrapping around) or at
+    # random block offsets; every burst is fdatasync'ed so the page cache can't absorb it.
+    # The file is preallocated, so disk used_percent rises by its size for the run.
+    unit = "MB/s"
+
+    def __init__(self, path=None, pattern="sequential", file_mib=DISK_FILE_MIB, block_bytes=DISK_BLOCK_BYTES):
+        if pattern not in ("sequential", "random"):
+            raise ValueError(f"Unknown disk pattern: {pattern}")
+        self.path = path or os.path.join(tempfile.gettempdir(), f"load-profile-{os.getpid()}.dat")
+        self.pattern = pattern
+        self.blocks = max(int(file_mib * 1024 * 1024 // block_bytes), 1)
+        self.block_bytes = block_bytes
+        # Incompressible, so thin-provisioned or compressing storage sees the full volume
+        self.buffer = os.urandom(block_bytes)
+        self.rate = 0.0
+        self.written = 0
+        self._position = 0
+        self._stop = threading.Event()
+
+    def _write(self, n):
+        if self.pattern == "random":
+            offset = random.randrange(self.blocks) * self.block_bytes
+        else:
+            offset = self._position
+            self._position = (self._position + n) % (self.blocks * self.block_bytes)
+        os.pwrite(self.fd, self.buffer[:n], offset)
+        self.written += n
+
+    def start(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(self.fd, 0, self.blocks * self.block_bytes)
+        self._thread = threading.Thread(target=_paced, daemon=True,
+                                        args=(lambda: self.rate, self._stop, self._write, self.block_bytes,
+                                              lambda: os.fdatasync(self.fd)))
+        self._thread.start()
+        self._last = (time.monotonic(), 0)
+
+    def set(self, value):
+        self.rate = max(value, 0.0) * 1e6
+
+    def sample(self):
+        now, written = time.monotonic(), self.written
+        rate = (written - self._last[1]) / (now - self._last[0]) / 1e6 if now > self._last[0] else None
+        self._last = (now, written)
+        return rate
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        os.close(self.fd)
+        os.remove(self.path)
+
+
+class NetworkDriver:
+    # Sends at the target bytes/s to a peer running `load_profiles.py sink` ("host:port" or
+    # (host, port)), or to a local sink on loopback. Only peer traffic crosses eth0, which
+    # is the interface the agent's net bytes_sent/bytes_recv watch.
+    unit = "B/s"
+
+    def __init__(self, peer=None, buffer_bytes=64 * 1024):
+        if isinstance(peer, str):
+            host, _, port = peer.rpartition(":")
+            peer = (host, int(port or DEFAULT_SINK_PORT)) if host else (peer, DEFAULT_SINK_PORT)
+        self.peer = peer
+        self.buffer = b"\x00" * buffer_bytes
+        self.rate = 0.0
+        self.sent = 0
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+
+    def _sink(self, server):
+        connection, _ = server.accept()
+        with connection:
+            while connection.recv(1 << 20):
+                pass
+
+    def _write(self, n):
+        self.sock.sendall(self.buffer[:n])
+        self.sent += n
+
+    def start(self):
+        peer = self.peer
+        if peer is None:
+            self._server = socket.create_server(("127.0.0.1", 0))
+            peer = self._server.getsockname()
+            self._threads.append(threading.Thread(target=self._sink, args=(self._server,), daemon=True))
+            self._threads[-1].start()
+        self.sock = socket.create_connection(peer)
+        self._threads.append(threading.Thread(target=_paced, daemon=True,
+                                              args=(lambda: self.rate, self._stop, self._write, len(self.buffer))))
+        self._threads[-1].start()
+        self._last = (time.monotonic(), 0)
+
+    def set(self, value):
+        self.rate = max(value, 0.0)
+
+    def sample(self):
+        now, sent = time.monotonic(), self.sent
+        rate = (sent - self._last[1]) / (now - self._last[0]) if now > self._last[0] else None
+        self._last = (now, sent)
+        return rate
+
+    def stop(self):
+        # The pacing thread finishes its current sendall before the socket goes away
+        self._stop.set()
+        self._threads[-1].join()
+        self.sock.close()
+        if self._server is not None:
+            self._server.close()
+
+
+DRIVERS = {"cpu": CpuDriver, "memory": MemoryDriver, "rss": RssDriver, "disk": DiskDriver,
+           "network": NetworkDriver}
+
+
+def run_sink(port=DEFAULT_SINK_PORT, report_seconds=10):
+    # Peer end of the network mode: accepts any number of senders and discards the bytes
+    received = [0]
+
+    def drain(connection):
+        with connection:
+            while True:
+                data = connection.recv(1 << 20)
+                if not data:
+                    return
+                received[0] += len(data)
+
+    server = socket.create_server(("", port))
+    server.settimeout(report_seconds)
+    print(f"sink listening on :{port}")
+    last, mark = time.monotonic(), 0
+    while True:
+        try:
+            connection, _ = server.accept()
+            threading.Thread(target=drain, args=(connection,), daemon=True).start()
+        except socket.timeout:
+            pass
+        now = time.monotonic()
+        if now - last >= report_seconds:
+            print(f"received {(received[0] - mark) / (now - last) / 1e6:.2f} MB/s")
+            last, mark = now, received[0]
+
+
+def constant_profile(duration, **targets):
+    # One flat segment per channel, e.g. constant_profile(60, cpu=50, rss=512, disk=20)
+    return {name: [{"shape": "constant", "value": value, "duration": duration}]
+            for name, value in targets.items()}
+
+
+# -------------------------------
+# Low-jitter scheduler
+# -------------------------------
+def _wait_until(deadline):
+    remaining = deadline - time.monotonic()
+    if remaining > SPIN_SECONDS:
+        time.sleep(remaining - SPIN_SECONDS)
+    while time.monotonic() < deadline:
+        pass
+
+
+def run_profile(profile, tick_seconds=DEFAULT_TICK_SECONDS, sample_seconds=DEFAULT_SAMPLE_SECONDS,
+                drivers=None):
+    # Drives every channel in `profile` along its curve; each sample window compares the
+    # achieved value with the mean target over that window
+    curves = {name: compile_profile(segments) for name, segments in profile.items() if name in DRIVERS}
+    options = profile.get("options", {})
+    drivers = drivers or {}
+    drivers = {name: drivers.get(name) or DRIVERS[name](**options.get(name, {})) for name in curves}
+    duration = max(d for d, _ in curves.values())
+    for driver in drivers.values():
+        driver.start()
+
+    samples = {name: [] for name in curves}
+    window = {name: [] for name in curves}
+    lateness = []
+    started = time.monotonic()
+    next_sample = sample_seconds
+    tick = 0
+    try:
+        while True:
+            deadline = started + tick * tick_seconds
+            _wait_until(deadline)
+            t = time.monotonic() - started
+            lateness.append(t - tick * tick_seconds)
+            done = t >= duration
+            if not done:
+                for name, (curve_duration, value_at) in curves.items():
+                    target = value_at(min(t, curve_duration))
+                    drivers[name].set(target)
+                    window[name].append(target)
+            # The last, possibly partial, window is sampled too, so short runs still report
+            if t >= next_sample or done:
+                for name, driver in drivers.items():
+                    if not window[name]:
+                        continue
+                    achieved = driver.sample()
+                    target = sum(window[name]) / len(window[name])
+                    samples[name].append((round(t, 2), round(target, 2),
+                                          None if achieved is None else round(achieved, 2)))
+                    window[name] = []
+                next_sample += sample_seconds
+            if done:
+                break
+            tick += 1
+    finally:
+        for driver in drivers.values():
+            driver.stop()
+
+    lateness.sort()
+    report = {"duration_seconds": round(time.monotonic() - started, 2), "ticks": len(lateness),
+              "tick_lateness_ms": {"p50": round(1000 * lateness[len(lateness) // 2], 3),
+                                   "p99": round(1000 * lateness[int(len(lateness) * 0.99)], 3),
+                                   "max": round(1000 * lateness[-1], 3)},
+              "channels": {}}
+    for name, rows in samples.items():
+        measured = [(t, a) for _, t, a in rows if a is not None]
+        errors = [abs(a - t) for t, a in measured]
+        report["channels"][name] = {
+            "unit": drivers[name].unit,
+            "mean_target": round(sum(t for t, _ in measured) / len(measured), 2) if measured else None,
+            "mean_achieved": round(sum(a for _, a in measured) / len(measured), 2) if measured else None,
+            "mean_abs_error": round(sum(errors) / len(errors), 2) if errors else None,
+            "max_abs_error": round(max(errors), 2) if errors else None,
+            "samples": rows,
+        }
+    return report
+
+
+def print_report(report):
+    jitter = report["tick_lateness_ms"]
+    print(f"{report['ticks']} ticks over {report['duration_seconds']}s, lateness p50 {jitter['p50']}ms"
+          f" p99 {jitter['p99']}ms max {jitter['max']}ms")
+    for name, channel in report["channels"].items():
+        print(f"{name:>8}: mean |error| {channel['mean_abs_error']} {channel['unit']},"
+              f" max {channel['max_abs_error']} {channel['unit']}")
+        for t, target, achieved in channel["samples"][-5:]:
+            print(f"          t={t:>7}s target {target:>10} achieved {achieved}")
+
+
+if __name__ == "__main__":
+    # python3 load_profiles.py profile.json
+    # python3 load_profiles.py constant 60 cpu=50 rss=512 disk=20 network=5e6
+    # python3 load_profiles.py sink [port]      (peer for network mode)
+    # no arguments runs a short CPU ramp + square wave
+    args = sys.argv[1:]
+    if args[:1] == ["sink"]:
+        run_sink(int(args[1]) if args[1:] else DEFAULT_SINK_PORT)
+    if args[:1] == ["constant"]:
+        profile = constant_profile(float(args[1]), **{k: float(v) for k, v in (a.split("=", 1) for a in args[2:])})
+    elif args:
+        with open(args[0]) as f:
+            profile = json.load(f)
+    else:
+        profile = {"cpu": [{"shape": "ramp", "start": 10, "end": 70, "duration": 10},
+                           {"shape": "square", "low": 20, "high": 60, "period": 4, "duration": 8}]}
+    report = run_profile(profile)
+    print_report(report)
+    print(json.dumps({k: v for k, v in report.items() if k != "channels"}
+                     | {"channels": {n: {k: v for k, v in c.items() if k != "samples"}
+                                     for n, c in report["channels"].items()}}))
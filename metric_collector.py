@@ -0,0 +1,240 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import boto3
+import numpy as np
+from botocore.config import Config
+from idle_classifier import classify_fleet, cpu_from_idle, load_agent_config
+
+# -------------------------------
+# Collector settings
+# -------------------------------
+MAX_QUERIES_PER_CALL = 500
+DEFAULT_MAX_WORKERS = 8
+AGENT_NAMESPACE = "CWAgent"
+
+# metric name, namespace, statistic, how series of one instance combine (e.g. per-core CPU)
+MetricSpec = namedtuple("MetricSpec", ["name", "namespace", "stat", "combine"])
+MetricCube = namedtuple("MetricCube", ["instance_ids", "regions", "timestamps", "metrics", "values",
+                                       "api_calls"])
+
+EC2_METRICS = [
+    MetricSpec("CPUUtilization", "AWS/EC2", "Average", "mean"),
+    MetricSpec("NetworkIn", "AWS/EC2", "Sum", "sum"),
+    MetricSpec("NetworkOut", "AWS/EC2", "Sum", "sum"),
+]
+
+# How each agent measurement is published and aggregated per instance
+AGENT_METRIC_RULES = {
+    ("cpu", "cpu_usage_idle"): ("Average", "mean"),
+    ("cpu", "cpu_usage_iowait"): ("Average", "mean"),
+    ("cpu", "cpu_usage_user"): ("Average", "mean"),
+    ("cpu", "cpu_usage_system"): ("Average", "mean"),
+    ("mem", "mem_used_percent"): ("Average", "mean"),
+    ("net", "bytes_recv"): ("Sum", "sum"),
+    ("net", "bytes_sent"): ("Sum", "sum"),
+    ("disk", "used_percent"): ("Maximum", "max"),
+    ("disk", "inodes_used"): ("Maximum", "max"),
+}
+
+
+def agent_metric_specs(config=None):
+    # The agent publishes "<section>_<measurement>" unless the measurement is already prefixed
+    config = config or load_agent_config()
+    specs = []
+    for section, settings in config.items():
+        for measurement in settings["measurement"]:
+            stat, combine = AGENT_METRIC_RULES.get((section, measurement), ("Average", "mean"))
+            name = measurement if measurement.startswith(f"{section}_") else f"{section}_{measurement}"
+            specs.append(MetricSpec(name, AGENT_NAMESPACE, stat, combine))
+    return specs
+
+
+def default_metric_specs():
+    return EC2_METRICS + agent_metric_specs()
+
+
+# -------------------------------
+# Series discovery
+# -------------------------------
+def discover_series(cloudwatch, spec, instance_ids):
+    # Agent metrics carry extra dimensions (cpu core, disk path, interface), so list the
+    # concrete series once per metric instead of guessing the dimension sets
+    if spec.namespace != AGENT_NAMESPACE:
+        return [(i, [{"Name": "InstanceId", "Value": iid}]) for i, iid in enumerate(instance_ids)], 0
+
+    index = {iid: i for i, iid in enumerate(instance_ids)}
+    series = []
+    calls = 0
+    paginator = cloudwatch.get_paginator("list_metrics")
+    for page in paginator.paginate(Namespace=spec.namespace, MetricName=spec.name):
+        calls += 1
+        for metric in page["Metrics"]:
+            dims = metric["Dimensions"]
+            instance_id = next((d["Value"] for d in dims if d["Name"] == "InstanceId"), None)
+            if instance_id in index:
+                series.append((index[instance_id], dims))
+    return series, calls
+
+
+# -------------------------------
+# Batched GetMetricData for one region
+# -------------------------------
+def collect_metric(cloudwatch, instance_ids, spec, start, end, period, steps):
+    # Returns an (instances x steps) array for one metric, combining multiple series per instance
+    n = len(instance_ids)
+    start_epoch = start.timestamp()
+    totals = np.zeros((n, steps), dtype=np.float64)
+    counts = np.zeros((n, steps), dtype=np.int32)
+    maxima = np.full((n, steps), np.nan, dtype=np.float64)
+
+    series, api_calls = discover_series(cloudwatch, spec, instance_ids)
+    paginator = cloudwatch.get_paginator("get_metric_data")
+    for batch_start in range(0, len(series), MAX_QUERIES_PER_CALL):
+        batch = series[batch_start:batch_start + MAX_QUERIES_PER_CALL]
+        queries = [{
+            "Id": f"q{i}",
+            "MetricStat": {
+                "Metric": {"Namespace": spec.namespace, "MetricName": spec.name, "Dimensions": dims},
+                "Period": period,
+                "Stat": spec.stat,
+            },
+            "ReturnData": True,
+        } for i, (_, dims) in enumerate(batch)]
+
+        for page in paginator.paginate(MetricDataQueries=queries, StartTime=start, EndTime=end,
+                                       ScanBy="TimestampAscending"):
+            api_calls += 1
+            for result in page["MetricDataResults"]:
+                if not result["Timestamps"]:
+                    continue
+                inst = batch[int(result["Id"][1:])][0]
+                stamps = np.array([ts.timestamp() for ts in result["Timestamps"]])
+                slots = ((stamps - start_epoch) // period).astype(np.int64)
+                values = np.asarray(result["Values"], dtype=np.float64)
+                keep = (slots >= 0) & (slots < steps)
+                slots, values = slots[keep], values[keep]
+                np.add.at(totals[inst], slots, values)
+                np.add.at(counts[inst], slots, 1)
+                maxima[inst, slots] = np.fmax(maxima[inst, slots], values)
+
+    if spec.combine == "max":
+        combined = maxima
+    elif spec.combine == "sum":
+        combined = totals
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            combined = totals / counts
+    return np.where(counts > 0, combined, np.nan).astype(np.float32), api_calls
+
+
+def collect_region(cloudwatch, instance_ids, specs, start, end, period):
+    steps = int((end - start).total_seconds() // period)
+    values = np.full((len(instance_ids), steps, len(specs)), np.nan, dtype=np.float32)
+    api_calls = 0
+    # One metric at a time keeps the accumulators at (instances x steps)
+    for metric_index, spec in enumerate(specs):
+        values[:, :, metric_index], calls = collect_metric(cloudwatch, instance_ids, spec,
+                                                           start, end, period, steps)
+        api_calls += calls
+    return values, api_calls
+
+
+# -------------------------------
+# Fleet-wide collection across regions
+# -------------------------------
+def collect_fleet(instances_by_region, start=None, end=None, period=60, specs=None, session=None,
+                  max_workers=DEFAULT_MAX_WORKERS):
+    # instances_by_region: {region: [instance_id, ...]}; returns one dense
+    # (instance x time x metric) cube covering every region
+    session = session or boto3.session.Session()
+    end = end or datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    start = start or end - timedelta(days=14)
+    specs = specs or default_metric_specs()
+
+    config = Config(retries={"mode": "adaptive", "max_attempts": 10})
+    regions = [r for r, ids in instances_by_region.items() if ids]
+    clients = {r: session.client("cloudwatch", region_name=r, config=config) for r in regions}
+
+    def collect(region):
+        return collect_region(clients[region], list(instances_by_region[region]), specs, start, end, period)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        parts = list(pool.map(collect, regions))
+
+    steps = int((end - start).total_seconds() // period)
+    timestamps = np.array([start + timedelta(seconds=period * i) for i in range(steps)])
+    instance_ids = [iid for r in regions for iid in instances_by_region[r]]
+    instance_regions = [r for r in regions for _ in instances_by_region[r]]
+    values = (np.concatenate([v for v, _ in parts]) if parts
+              else np.empty((0, steps, len(specs)), dtype=np.float32))
+    return MetricCube(instance_ids, instance_regions, timestamps, [s.name for s in specs], values,
+                      sum(calls for _, calls in parts))
+
+
+# -------------------------------
+# Cube -> classifier inputs
+# -------------------------------
+def metric_slice(cube, name):
+    return cube.values[:, :, cube.metrics.index(name)] if name in cube.metrics else None
+
+
+def _prefer(primary, fallback):
+    if primary is None or fallback is None:
+        return fallback if primary is None else primary
+    return np.where(np.isnan(primary), fallback, primary)
+
+
+def classify_cube(cube, period=60, **thresholds):
+    # Prefer the agent's per-core idle time; fall back to the hypervisor CPUUtilization
+    idle = metric_slice(cube, "cpu_usage_idle")
+    cpu = metric_slice(cube, "CPUUtilization")
+    if idle is not None:
+        cpu = _prefer(cpu_from_idle(idle), cpu)
+
+    # Same per-datapoint fallback for each network direction: agent bytes where present,
+    # the hypervisor's NetworkIn/NetworkOut for instances (or datapoints) without the agent
+    received = _prefer(metric_slice(cube, "net_bytes_recv"), metric_slice(cube, "NetworkIn"))
+    sent = _prefer(metric_slice(cube, "net_bytes_sent"), metric_slice(cube, "NetworkOut"))
+    directions = [d for d in (received, sent) if d is not None]
+    if not directions:
+        network = np.full(cube.values.shape[:2], np.nan, dtype=np.float32)
+    else:
+        network = sum(np.where(np.isnan(d), 0, d) for d in directions)
+        network[np.logical_and.reduce([np.isnan(d) for d in directions])] = np.nan
+
+    return classify_fleet(cpu, network, interval_seconds=period, **thresholds)
+
+
+# -------------------------------
+# Demo against moto: API calls vs one query per instance
+# -------------------------------
+def run_demo(instances=600, hours=3, period=60):
+    from moto import mock_aws
+
+    with mock_aws():
+        session = boto3.session.Session(aws_access_key_id="testing", aws_secret_access_key="testing",
+                                        region_name="us-east-1")
+        cloudwatch = session.client("cloudwatch")
+        end = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        start = end - timedelta(hours=hours)
+        ids = [f"i-{i:017x}" for i in range(instances)]
+        for i, iid in enumerate(ids):
+            cloudwatch.put_metric_data(Namespace="CWAgent", MetricData=[{
+                "MetricName": "mem_used_percent",
+                "Dimensions": [{"Name": "InstanceId", "Value": iid}],
+                "Timestamp": end - timedelta(minutes=5),
+                "Value": float(i % 100),
+            }])
+
+        started = time.perf_counter()
+        cube = collect_fleet({"us-east-1": ids}, start, end, period, session=session)
+        elapsed = time.perf_counter() - started
+        per_instance_calls = instances * len(cube.metrics)
+        print(f"cube {cube.values.shape} in {elapsed:.1f}s using {cube.api_calls} API calls "
+              f"(one query per instance and metric would take {per_instance_calls})")
+
+
+if __name__ == "__main__":
+    run_demo()
@@ -0,0 +1,335 @@
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import ijson
+from cache_paths import CACHE_DIR
+
+# -------------------------------
+# Index layout
+# -------------------------------
+# Open-addressing hash table in one file, read through mmap:
+#   header | capacity slots | UTF-8 key blob
+# Each slot holds the key's 64-bit hash, where its "service|region|usage type" bytes live
+# in the blob, the price normalised to USD per month (per unit for GB-Mo style units)
+# and a unit code. A zero hash marks an empty slot; lookups probe linearly from hash & mask.
+INDEX_MAGIC = b"PRIX"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<4sIII")       # magic, version, capacity, count
+SLOT = struct.Struct("<QIHBxd")        # hash, key offset, key length, unit code, monthly price
+LOAD_FACTOR = 0.5
+HOURS_PER_MONTH = 730
+
+DEFAULT_INDEX_PATH = os.path.join(CACHE_DIR, "pricing.idx")
+
+# Monthly price is per month (Hrs, Mo), per GB-month (GB-Mo), per provisioned IOPS-month or
+# per MiBps-month; anything else is kept as billed
+UNIT_CODES = {"month": 0, "gb-month": 1, "iops-month": 2, "mibps-month": 3, "other": 9}
+_UNIT_NAMES = {code: name for name, code in UNIT_CODES.items()}
+
+# "EUW1-EBS:VolumeUsage.gp3" -> "EBS:VolumeUsage.gp3"; us-east-1 usage types carry no prefix
+_REGION_PREFIX = re.compile(r"^[A-Z]{2,4}\d?-(?=[A-Za-z])")
+
+
+def normalize_usage_type(usage_type):
+    return _REGION_PREFIX.sub("", usage_type, count=1)
+
+
+def _normalize_price(price, unit):
+    unit = unit.lower()
+    if unit in ("hrs", "hours", "hour"):
+        return price * HOURS_PER_MONTH, UNIT_CODES["month"]
+    if unit in ("mo", "month", "months"):
+        return price, UNIT_CODES["month"]
+    if unit in ("gb-mo", "gb-month"):
+        return price, UNIT_CODES["gb-month"]
+    if unit in ("iops-mo", "iops-month"):
+        return price, UNIT_CODES["iops-month"]
+    if unit in ("mibps-mo", "gibps-mo", "mibps-month"):
+        # gp3 throughput is billed per MiBps-month
+        return price, UNIT_CODES["mibps-month"]
+    return price, UNIT_CODES["other"]
+
+
+def _key_bytes(service, region, usage_type):
+    return f"{service}|{region}|{normalize_usage_type(usage_type)}".encode()
+
+
+def _hash(key):
+    # Stable across processes (unlike hash()); never zero, which marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+# -------------------------------
+# Ingest: bulk Price List offer files -> index
+# -------------------------------
+def iter_offer_prices(path, usage_prefixes=None):
+    # Streams one offer file twice: products (sku -> key) then terms.OnDemand (sku -> price).
+    # usage_prefixes limits the index to e.g. ("EBS:", "PublicIPv4:") to keep it small.
+    products = {}
+    with open(path, "rb") as f:
+        offer_code = None
+        for prefix, event, value in ijson.parse(f):
+            if prefix == "offerCode":
+                offer_code = value
+                break
+    with open(path, "rb") as f:
+        for sku, product in ijson.kvitems(f, "products"):
+            attributes = product.get("attributes", {})
+            usage_type = attributes.get("usagetype")
+            region = attributes.get("regionCode")
+            if not usage_type or not region:
+                continue
+            usage_type = normalize_usage_type(usage_type)
+            if usage_prefixes and not usage_type.startswith(tuple(usage_prefixes)):
+                continue
+            service = attributes.get("servicecode") or offer_code
+            products[sku] = (service, region, usage_type)
+
+    with open(path, "rb") as f:
+        for sku, offers in ijson.kvitems(f, "terms.OnDemand"):
+            key = products.get(sku)
+            if key is None:
+                continue
+            for offer in offers.values():
+                # Tiered dimensions: the first tier (beginRange 0) is the list price
+                dimensions = sorted(offer.get("priceDimensions", {}).values(),
+                                    key=lambda d: float(d.get("beginRange", 0) or 0))
+                if not dimensions:
+                    continue
+                price = float(dimensions[0]["pricePerUnit"].get("USD", 0))
+                yield key, _normalize_price(price, dimensions[0].get("unit", ""))
+                break
+
+
+def build_index(offer_paths, index_path=DEFAULT_INDEX_PATH, usage_prefixes=None):
+    entries = {}
+    for path in offer_paths:
+        for (service, region, usage_type), price in iter_offer_prices(path, usage_prefixes):
+            entries[_key_bytes(service, region, usage_type)] = price
+
+    capacity = 1
+    while capacity * LOAD_FACTOR < max(len(entries), 1):
+        capacity *= 2
+    mask = capacity - 1
+    slots = [None] * capacity
+    blob = bytearray()
+    for key, (monthly, unit) in entries.items():
+        position = _hash(key) & mask
+        while slots[position] is not None:
+            position = (position + 1) & mask
+        slots[position] = SLOT.pack(_hash(key), len(blob), len(key), unit, monthly)
+        blob += key
+
+    empty = SLOT.pack(0, 0, 0, 0, 0.0)
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    tmp = f"{index_path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, capacity, len(entries)))
+        f.write(b"".join(slot or empty for slot in slots))
+        f.write(blob)
+    os.replace(tmp, index_path)
+    return len(entries)
+
+
+# -------------------------------
+# Reader (memory-mapped)
+# -------------------------------
+class PriceIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.capacity, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} is not a version {INDEX_VERSION} price index")
+        self._mask = self.capacity - 1
+        self._blob = HEADER.size + self.capacity * SLOT.size
+        self._memo = {}
+
+    def __len__(self):
+        return self.count
+
+    def get(self, service, region, usage_type):
+        # Returns (monthly price, unit name) or None
+        key = _key_bytes(service, region, usage_type)
+        if key in self._memo:
+            return self._memo[key]
+        wanted = _hash(key)
+        position = wanted & self._mask
+        result = None
+        for _ in range(self.capacity):
+            slot_hash, offset, length, unit, monthly = SLOT.unpack_from(self._map, HEADER.size + position * SLOT.size)
+            if slot_hash == 0:
+                break
+            if slot_hash == wanted and self._map[self._blob + offset:self._blob + offset + length] == key:
+                result = (monthly, _UNIT_NAMES.get(unit, "other"))
+                break
+            position = (position + 1) & self._mask
+        # Fleet-wide estimates hit a handful of distinct keys over and over
+        self._memo[key] = result
+        return result
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+# -------------------------------
+# Catalog: typed lookups with list-price fallbacks
+# -------------------------------
+# us-east-1 list prices, used when no index has been built or a key is missing
+FALLBACK_MONTHLY = {
+    "EBS:VolumeUsage.gp2": 0.10,
+    "EBS:VolumeUsage.gp3": 0.08,
+    "EBS:VolumeUsage.piops": 0.125,
+    "EBS:VolumeUsage.io2": 0.125,
+    "EBS:VolumeUsage.st1": 0.045,
+    "EBS:VolumeUsage.sc1": 0.015,
+    "EBS:VolumeUsage": 0.05,
+    "EBS:VolumeP-IOPS.piops": 0.065,
+    "EBS:VolumeP-IOPS.io2": 0.065,
+    "EBS:VolumeP-IOPS.gp3": 0.005,
+    "EBS:VolumeP-Throughput.gp3": 0.04,
+    "EBS:SnapshotUsage": 0.05,
+    "EBS:SnapshotArchiveStorage": 0.0125,
+    "PublicIPv4:IdleAddress": 0.005 * HOURS_PER_MONTH,
+}
+
+VOLUME_USAGE_TYPES = {
+    "gp2": "EBS:VolumeUsage.gp2",
+    "gp3": "EBS:VolumeUsage.gp3",
+    "io1": "EBS:VolumeUsage.piops",
+    "io2": "EBS:VolumeUsage.io2",
+    "st1": "EBS:VolumeUsage.st1",
+    "sc1": "EBS:VolumeUsage.sc1",
+    "standard": "EBS:VolumeUsage",
+}
+IOPS_USAGE_TYPES = {"io1": "EBS:VolumeP-IOPS.piops", "io2": "EBS:VolumeP-IOPS.io2", "gp3": "EBS:VolumeP-IOPS.gp3"}
+# gp3 includes 3000 IOPS and 125 MiBps; only provisioning above that is billed
+GP3_FREE_IOPS = 3000
+GP3_FREE_THROUGHPUT = 125
+SNAPSHOT_USAGE_TYPES = {"standard": "EBS:SnapshotUsage", "archive": "EBS:SnapshotArchiveStorage"}
+# EIPs moved from EC2's ElasticIP:IdleAddress to VPC's public IPv4 charge in 2024
+EIP_USAGE_TYPES = [("AmazonVPC", "PublicIPv4:IdleAddress"), ("AmazonEC2", "ElasticIP:IdleAddress")]
+
+
+class PriceCatalog:
+    def __init__(self, index=None):
+        self.index = index
+
+    def monthly(self, service, region, usage_type):
+        if self.index is not None:
+            found = self.index.get(service, region, usage_type)
+            if found is not None:
+                return found[0]
+        return FALLBACK_MONTHLY.get(normalize_usage_type(usage_type), 0.0)
+
+    def volume_monthly_cost(self, region, volume_type, size_gib, iops=None, throughput=None):
+        usage_type = VOLUME_USAGE_TYPES.get(volume_type, VOLUME_USAGE_TYPES["gp2"])
+        cost = size_gib * self.monthly("AmazonEC2", region, usage_type)
+        if volume_type in IOPS_USAGE_TYPES and iops:
+            billed = max(0, iops - GP3_FREE_IOPS) if volume_type == "gp3" else iops
+            cost += billed * self.monthly("AmazonEC2", region, IOPS_USAGE_TYPES[volume_type])
+        if volume_type == "gp3" and throughput:
+            cost += max(0, throughput - GP3_FREE_THROUGHPUT) \
+                * self.monthly("AmazonEC2", region, "EBS:VolumeP-Throughput.gp3")
+        return cost
+
+    def snapshot_monthly_cost(self, region, size_gib, tier="standard"):
+        usage_type = SNAPSHOT_USAGE_TYPES.get(tier, SNAPSHOT_USAGE_TYPES["standard"])
+        return size_gib * self.monthly("AmazonEC2", region, usage_type)
+
+    def eip_monthly_cost(self, region):
+        if self.index is not None:
+            for service, usage_type in EIP_USAGE_TYPES:
+                found = self.index.get(service, region, usage_type)
+                if found is not None:
+                    return found[0]
+        return FALLBACK_MONTHLY["PublicIPv4:IdleAddress"]
+
+
+# index path -> (index mtime or None, catalog)
+_default_catalogs = {}
+
+
+def default_catalog(index_path=DEFAULT_INDEX_PATH):
+    # Uses the built index when there is one; otherwise list-price fallbacks only. Keyed on
+    # the index's mtime so a long-running dashboard picks up an index built or refreshed later
+    # (build_index replaces the file, so readers of the old one keep a valid mapping)
+    mtime = os.path.getmtime(index_path) if os.path.exists(index_path) else None
+    cached = _default_catalogs.get(index_path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, PriceCatalog(PriceIndex(index_path) if mtime is not None else None))
+        _default_catalogs[index_path] = cached
+    return cached[1]
+
+
+# -------------------------------
+# Benchmark: synthetic offer file, 100k resources priced
+# -------------------------------
+REGION_PREFIXES = {"us-east-1": "", "us-west-2": "USW2-", "eu-west-1": "EU-", "eu-central-1": "EUC1-",
+                   "ap-south-1": "APS3-", "ap-northeast-1": "APN1-", "sa-east-1": "SAE1-"}
+
+
+def write_synthetic_offer(path, filler_products=50_000):
+    import json
+    products, terms = {}, {}
+
+    def add(sku, region, usage_type, price, unit, service="AmazonEC2"):
+        products[sku] = {"sku": sku, "attributes": {"servicecode": service, "regionCode": region,
+                                                     "usagetype": REGION_PREFIXES[region] + usage_type}}
+        terms[sku] = {f"{sku}.JRTCKXETXF": {"priceDimensions": {f"{sku}.JRTCKXETXF.6YS6EN2CT7": {
+            "unit": unit, "beginRange": "0", "endRange": "Inf", "pricePerUnit": {"USD": f"{price:.10f}"}}}}}
+
+    for r, region in enumerate(REGION_PREFIXES):
+        markup = 1 + 0.1 * r
+        for i, usage_type in enumerate(u for u in FALLBACK_MONTHLY if u.startswith("EBS:")):
+            unit = {"EBS:VolumeP-IOPS": "IOPS-Mo", "EBS:VolumeP-Throughput": "MiBps-Mo"}.get(
+                usage_type.split(".")[0], "GB-Mo")
+            add(f"E{r:02d}{i:03d}", region, usage_type, FALLBACK_MONTHLY[usage_type] * markup, unit)
+        add(f"V{r:02d}", region, "PublicIPv4:IdleAddress", 0.005 * markup, "Hrs", service="AmazonVPC")
+    for i in range(filler_products):
+        add(f"F{i:06d}", "us-east-1", f"BoxUsage:filler{i}.large", 0.01, "Hrs")
+
+    with open(path, "w") as f:
+        json.dump({"formatVersion": "v1.0", "offerCode": "AmazonEC2", "products": products,
+                   "terms": {"OnDemand": terms}}, f)
+
+
+def run_benchmark(resources=100_000):
+    import random
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        offer = os.path.join(tmp, "offer.json")
+        index_path = os.path.join(tmp, "pricing.idx")
+        write_synthetic_offer(offer)
+        started = time.perf_counter()
+        count = build_index([offer], index_path)
+        print(f"indexed {count} prices from {os.path.getsize(offer) / 2**20:.1f} MiB in "
+              f"{time.perf_counter() - started:.1f}s -> {os.path.getsize(index_path) / 1024:.0f} KiB index")
+
+        catalog = PriceCatalog(PriceIndex(index_path))
+        rng = random.Random(0)
+        regions = list(REGION_PREFIXES)
+        volumes = [(rng.choice(regions), rng.choice(list(VOLUME_USAGE_TYPES)), rng.randint(8, 2000),
+                    rng.choice([3000, 6000, 16000]), rng.choice([125, 250, 1000])) for _ in range(resources)]
+        started = time.perf_counter()
+        total = sum(catalog.volume_monthly_cost(*v) for v in volumes)
+        elapsed = time.perf_counter() - started
+        flat = sum(size * 0.10 for _, _, size, _, _ in volumes)
+        print(f"priced {resources} volumes in {elapsed:.2f}s ({elapsed / resources * 1e6:.1f}us each): "
+              f"${total:,.0f}/month vs ${flat:,.0f} at a flat $0.10/GB")
+        catalog.index.close()
+
+
+if __name__ == "__main__":
+    # python pricing_catalog.py offer.json [...]  builds the default index; no arguments runs the benchmark
+    if sys.argv[1:]:
+        print(f"indexed {build_index(sys.argv[1:], usage_prefixes=None)} prices into {DEFAULT_INDEX_PATH}")
+    else:
+        run_benchmark()
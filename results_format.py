@@ -0,0 +1,163 @@
+import io
+import json
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+import zstandard
+from analysis_stream import NUMERIC_COLUMNS, apply_analysis_dtypes
+
+# -------------------------------
+# Sharded results layout
+# -------------------------------
+# The manifest is small JSON written where the single-file results used to live:
+#   {"format": "sharded-v1", "metadata": {...}, "summary": {...},
+#    "shards": [{"key": ..., "region": ..., "account": ..., "format": ..., "records": n}, ...]}
+# Each shard holds detailed_analysis records for one (region, account) pair, as
+# zstd-compressed NDJSON or Parquet. idle_instances is derived from status == "idle".
+SHARDED_FORMAT = "sharded-v1"
+SHARD_FORMATS = ("ndjson.zst", "parquet")
+DEFAULT_MAX_WORKERS = 16
+ZSTD_LEVEL = 3
+
+
+def is_sharded(data):
+    return bool(data) and data.get("format") == SHARDED_FORMAT
+
+
+def shard_values(manifest, field):
+    return sorted({shard[field] for shard in manifest.get("shards", [])})
+
+
+# -------------------------------
+# Writer (used by the idle-detection Lambda)
+# -------------------------------
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _encode_shard(records, fmt):
+    # Metrics such as "N/A" become nulls so every shard has one numeric type per column
+    records = [{k: _as_number(v) if k in NUMERIC_COLUMNS else v for k, v in r.items()} for r in records]
+    if fmt == "ndjson.zst":
+        raw = "".join(json.dumps(r, default=str) + "\n" for r in records).encode()
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    if fmt == "parquet":
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pylist(records), buffer, compression="zstd")
+        return buffer.getvalue()
+    raise ValueError(f"Unsupported shard format: {fmt}")
+
+
+def write_sharded_results(s3, bucket_name, manifest_key, analysis, fmt="ndjson.zst",
+                          max_workers=DEFAULT_MAX_WORKERS):
+    if fmt not in SHARD_FORMATS:
+        raise ValueError(f"Unsupported shard format: {fmt}")
+    metadata = analysis.get("metadata", {})
+    default_region = metadata.get("region", "unknown")
+    default_account = metadata.get("account_id", "unknown")
+
+    groups = {}
+    for record in analysis.get("detailed_analysis", []):
+        shard_key = (record.get("region", default_region), record.get("account_id", default_account))
+        groups.setdefault(shard_key, []).append(record)
+
+    prefix = posixpath.splitext(manifest_key)[0]
+    shards = []
+    for (region, account), records in sorted(groups.items()):
+        shards.append({
+            "key": f"{prefix}/shards/region={region}/account={account}/part-0000.{fmt}",
+            "region": region,
+            "account": account,
+            "format": fmt,
+            "records": len(records),
+        })
+
+    def upload(item):
+        shard, records = item
+        s3.put_object(Bucket=bucket_name, Key=shard["key"], Body=_encode_shard(records, fmt))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(upload, zip(shards, (groups[(s["region"], s["account"])] for s in shards))))
+
+    # The manifest goes last so readers never see shards that are still uploading
+    manifest = {
+        "format": SHARDED_FORMAT,
+        "metadata": metadata,
+        "summary": analysis.get("summary", {}),
+        "shards": shards,
+    }
+    s3.put_object(Bucket=bucket_name, Key=manifest_key, Body=json.dumps(manifest).encode(),
+                  ContentType="application/json")
+    return manifest
+
+
+# -------------------------------
+# Reader
+# -------------------------------
+def _decode_shard(raw, fmt):
+    if fmt == "ndjson.zst":
+        # Both the zstd decoder and Arrow's JSON reader release the GIL
+        data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(raw)).read()
+        return pa_json.read_json(io.BytesIO(data))
+    if fmt == "parquet":
+        return pq.read_table(io.BytesIO(raw))
+    raise ValueError(f"Unsupported shard format: {fmt}")
+
+
+def select_shards(manifest, regions=None, accounts=None):
+    return [
+        shard for shard in manifest.get("shards", [])
+        if (regions is None or shard["region"] in regions)
+        and (accounts is None or shard["account"] in accounts)
+    ]
+
+
+def summarize(df):
+    if df.empty:
+        return {"total_instances_analyzed": 0, "idle_instances": 0, "active_instances": 0,
+                "potential_monthly_savings": 0.0}
+    idle = df["status"] == "idle"
+    return {
+        "total_instances_analyzed": int(len(df)),
+        "idle_instances": int(idle.sum()),
+        "active_instances": int((df["status"] == "active").sum()),
+        "potential_monthly_savings": float(df.loc[idle, "estimated_savings"].sum()),
+    }
+
+
+def load_sharded_results(s3, bucket_name, manifest, regions=None, accounts=None, cache=None,
+                         max_workers=DEFAULT_MAX_WORKERS):
+    shards = select_shards(manifest, regions, accounts)
+
+    def fetch(shard):
+        if cache is not None:
+            with cache.open(s3, bucket_name, shard["key"]) as body:
+                raw = body.read()
+        else:
+            raw = s3.get_object(Bucket=bucket_name, Key=shard["key"])["Body"].read()
+        return _decode_shard(raw, shard["format"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        tables = list(pool.map(fetch, shards))
+
+    if tables:
+        df = pa.concat_tables(tables, promote_options="default").to_pandas()
+    else:
+        df = pd.DataFrame(columns=["instance_id", "instance_type", "status"] + NUMERIC_COLUMNS)
+    df = apply_analysis_dtypes(df)
+
+    # The manifest summary covers the whole fleet; recompute it when shards were filtered out
+    filtered = len(shards) != len(manifest.get("shards", []))
+    return {
+        "metadata": manifest.get("metadata", {}),
+        "summary": summarize(df) if filtered else manifest.get("summary", {}),
+        "detailed_analysis": df,
+        "idle_instances": df[df["status"] == "idle"].reset_index(drop=True),
+        "shards_loaded": len(shards),
+    }
@@ -0,0 +1,266 @@
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from cache_paths import CACHE_DIR
+
+# -------------------------------
+# Rightsizing settings
+# -------------------------------
+# p95 CPU should land at or below this share of the new type's vCPUs, and the busiest
+# datapoint (max CPU) must still fit under the ceiling
+DEFAULT_CPU_TARGET = 0.60
+DEFAULT_CPU_CEILING = 0.90
+DEFAULT_MEMORY_TARGET = 0.75
+# Candidates outside the instance's own family are limited to general purpose classes
+GENERAL_PURPOSE_CLASSES = ("m", "c", "r")
+DEFAULT_CHUNK_ROWS = 4096
+DEFAULT_CAPABILITIES_PATH = os.path.join(CACHE_DIR, "instance-types.parquet")
+CAPABILITIES_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+# "m6gd.large" -> class "m", generation 6, attributes "gd", size "large"
+_TYPE_PATTERN = re.compile(r"^([a-z]+?)(\d+)([a-z0-9-]*)\.([a-z0-9-]+)$")
+
+
+def parse_instance_type(instance_type):
+    match = _TYPE_PATTERN.match(instance_type)
+    if not match:
+        return None
+    family_class, generation, attributes, size = match.groups()
+    return family_class, int(generation), f"{family_class}{generation}{attributes}", size
+
+
+def instance_attributes(instance_type):
+    # "m6gd.large" -> "gd"; "" for types outside the naming scheme
+    match = _TYPE_PATTERN.match(instance_type)
+    return match.group(3) if match else ""
+
+
+def processor_vendor(attributes):
+    # AMD and Graviton carry a letter; Intel is "i" from the 6th generation and unmarked before
+    return "amd" if "a" in attributes else "graviton" if "g" in attributes else "intel"
+
+
+# -------------------------------
+# Capability table (vCPU, memory, family, generation)
+# -------------------------------
+def describe_capabilities(ec2):
+    rows = []
+    for page in ec2.get_paginator("describe_instance_types").paginate():
+        for item in page["InstanceTypes"]:
+            parsed = parse_instance_type(item["InstanceType"])
+            if parsed is None:
+                continue
+            family_class, generation, family, size = parsed
+            rows.append({
+                "instance_type": item["InstanceType"],
+                "family_class": family_class,
+                "family": family,
+                "generation": generation,
+                "size": size,
+                "vcpu": item["VCpuInfo"]["DefaultVCpus"],
+                "memory_gib": item["MemoryInfo"]["SizeInMiB"] / 1024,
+                "architecture": item["ProcessorInfo"]["SupportedArchitectures"][0],
+                "burstable": bool(item.get("BurstablePerformanceSupported", False)),
+            })
+    return pd.DataFrame(rows).sort_values("instance_type", ignore_index=True)
+
+
+def load_capabilities(ec2=None, path=DEFAULT_CAPABILITIES_PATH, max_age_seconds=CAPABILITIES_MAX_AGE_SECONDS):
+    # describe_instance_types is ~1000 rows and rarely changes; keep a local copy for a week
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age_seconds:
+        return pd.read_parquet(path)
+    if ec2 is None:
+        import boto3
+        ec2 = boto3.client("ec2")
+    capabilities = describe_capabilities(ec2)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    capabilities.to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+    return capabilities
+
+
+# -------------------------------
+# Memory demand from the CloudWatch agent's mem_used_percent
+# -------------------------------
+def memory_p95(cube):
+    # p95 of mem_used_percent per instance from a metric_collector cube; NaN where the
+    # agent reported nothing (the instance then keeps at least its current memory)
+    from metric_collector import metric_slice
+    mem = metric_slice(cube, "mem_used_percent")
+    p95 = np.full(len(cube.instance_ids), np.nan, dtype=np.float32)
+    if mem is None:
+        return p95
+    # Rows with no datapoints at all stay NaN without tripping nanpercentile's all-NaN warning
+    reported = ~np.isnan(mem).all(axis=1)
+    if reported.any():
+        p95[reported] = np.nanpercentile(mem[reported], 95, axis=1)
+    return p95
+
+
+# -------------------------------
+# Vectorized cheapest fit
+# -------------------------------
+def _fill(values, fallback):
+    values = np.asarray(values, dtype=np.float32)
+    return np.where(np.isnan(values), fallback, values)
+
+
+def recommend(df, capabilities, hourly_prices=None, cpu_target=DEFAULT_CPU_TARGET,
+              cpu_ceiling=DEFAULT_CPU_CEILING, memory_target=DEFAULT_MEMORY_TARGET,
+              chunk_rows=DEFAULT_CHUNK_ROWS):
+    # df needs instance_type plus p95_cpu (falls back to max_cpu, then avg_cpu) and
+    # optionally p95_mem; hourly_prices(types, regions) -> array prices every candidate.
+    # Returns the recommended type, monthly savings and "downsize" / "upsize" per row
+    # (NaN / None if no change). Without prices only smaller types are offered, since a
+    # bigger one can't be shown to save anything; with prices any cheaper fit is.
+    n = len(df)
+    caps = capabilities.reset_index(drop=True)
+    cap_index = {t: i for i, t in enumerate(caps["instance_type"])}
+    current = np.array([cap_index.get(t, -1) for t in df["instance_type"].astype(str)], dtype=np.int64)
+    known = current >= 0
+    cur = np.where(known, current, 0)
+
+    vcpu = caps["vcpu"].to_numpy(dtype=np.float32)
+    memory = caps["memory_gib"].to_numpy(dtype=np.float32)
+    generation = caps["generation"].to_numpy()
+    burstable = caps["burstable"].to_numpy()
+    family_class = caps["family_class"].to_numpy()
+    arch_codes, arch = np.unique(caps["architecture"].to_numpy(), return_inverse=True)
+    general = np.isin(family_class, GENERAL_PURPOSE_CLASSES)
+    attributes = [instance_attributes(t) for t in caps["instance_type"]]
+    local_storage = np.array(["d" in a for a in attributes], dtype=bool)
+    network_optimized = np.array(["n" in a for a in attributes], dtype=bool)
+    vendor_codes, vendor = np.unique([processor_vendor(a) for a in attributes], return_inverse=True)
+
+    # Demand in absolute vCPUs and GiB on the current type
+    p95 = _fill(df["p95_cpu"] if "p95_cpu" in df.columns else np.full(n, np.nan), np.nan)
+    peak = _fill(df["max_cpu"] if "max_cpu" in df.columns else np.full(n, np.nan), np.nan)
+    avg = _fill(df["avg_cpu"] if "avg_cpu" in df.columns else np.full(n, np.nan), np.nan)
+    p95 = np.where(np.isnan(p95), np.where(np.isnan(peak), avg, peak), p95)
+    peak = np.where(np.isnan(peak), p95, peak)
+    mem = _fill(df["p95_mem"] if "p95_mem" in df.columns else np.full(n, np.nan), np.nan)
+
+    need_vcpu = np.maximum(vcpu[cur] * p95 / 100 / cpu_target, vcpu[cur] * peak / 100 / cpu_ceiling)
+    # Without memory metrics the instance keeps at least its current memory
+    need_memory = np.where(np.isnan(mem), memory[cur], memory[cur] * mem / 100 / memory_target)
+    usable = known & ~np.isnan(need_vcpu)
+
+    regions = df["region"].astype(str).to_numpy() if "region" in df.columns else np.full(n, "us-east-1")
+    if hourly_prices is not None:
+        current_price = hourly_prices(caps["instance_type"].to_numpy()[cur], regions)
+    else:
+        current_price = np.full(n, np.nan, dtype=np.float32)
+
+    best = np.full(n, -1, dtype=np.int64)
+    best_price = np.full(n, np.nan, dtype=np.float32)
+    types = caps["instance_type"].to_numpy()
+    for start in range(0, n, chunk_rows):
+        rows = slice(start, min(start + chunk_rows, n))
+        c = cur[rows]
+        fits = (vcpu[None, :] >= need_vcpu[rows, None]) & (memory[None, :] >= need_memory[rows, None])
+        fits &= arch[None, :] == arch[c][:, None]
+        # Never step back a generation; stay burstable only if already burstable
+        fits &= generation[None, :] >= generation[c][:, None]
+        fits &= ~burstable[None, :] | burstable[c][:, None]
+        fits &= general[None, :] | (family_class[None, :] == family_class[c][:, None])
+        # Keep local instance storage ("d"), enhanced networking ("n") and the CPU vendor,
+        # which workloads and AMIs are built around
+        fits &= local_storage[None, :] | ~local_storage[c][:, None]
+        fits &= network_optimized[None, :] | ~network_optimized[c][:, None]
+        fits &= vendor[None, :] == vendor[c][:, None]
+        fits &= usable[rows, None]
+
+        if hourly_prices is not None:
+            # One (rows x candidates) price matrix, gathered per region present in the chunk
+            cost = np.full(fits.shape, np.inf, dtype=np.float32)
+            chunk_regions = regions[rows]
+            for region in np.unique(chunk_regions):
+                in_region = chunk_regions == region
+                prices = hourly_prices(types, np.full(len(types), region))
+                cost[in_region] = np.where(np.isnan(prices), np.inf, prices)[None, :]
+        else:
+            # No price data: the current type itself, or one no bigger in either dimension and
+            # smaller in one; the smallest fitting machine by vCPU, then memory wins
+            no_bigger = (vcpu[None, :] <= vcpu[c][:, None]) & (memory[None, :] <= memory[c][:, None])
+            smaller = (vcpu[None, :] < vcpu[c][:, None]) | (memory[None, :] < memory[c][:, None])
+            fits &= (no_bigger & smaller) | (np.arange(len(types))[None, :] == c[:, None])
+            cost = np.broadcast_to(vcpu * 1e4 + memory, fits.shape).astype(np.float32)
+        cost = np.where(fits, cost, np.inf)
+        choice = np.argmin(cost, axis=1)
+        found = np.isfinite(cost[np.arange(len(choice)), choice])
+        best[rows] = np.where(found, choice, -1)
+        if hourly_prices is not None:
+            best_price[rows] = np.where(found, cost[np.arange(len(choice)), choice], np.nan)
+
+    changed = (best >= 0) & (best != cur) & known
+    savings = (current_price - best_price) * 730
+    if hourly_prices is not None:
+        changed &= savings > 0
+    chosen = np.where(best >= 0, best, 0)
+    upsize = (vcpu[chosen] > vcpu[cur]) | (memory[chosen] > memory[cur])
+    return pd.DataFrame({
+        "rightsize_to": np.where(changed, types[chosen], None),
+        "rightsize_savings": np.where(changed, savings, np.nan).astype(np.float32),
+        "rightsize_action": np.where(changed, np.where(upsize, "upsize", "downsize"), None),
+    }, index=df.index)
+
+
+def add_rightsizing(df, capabilities, hourly_prices=None, **targets):
+    # Adds rightsize_to, rightsize_savings, rightsize_action and the "downsize to X, save $Y"
+    # text column; idle instances are left alone since stopping them is the better recommendation
+    out = df.copy()
+    candidates = out["status"] != "idle" if "status" in out.columns else pd.Series(True, index=out.index)
+    result = recommend(out[candidates], capabilities, hourly_prices, **targets)
+    out["rightsize_to"] = result["rightsize_to"].reindex(out.index)
+    out["rightsize_savings"] = result["rightsize_savings"].reindex(out.index).astype("float32")
+    out["rightsize_action"] = result["rightsize_action"].reindex(out.index)
+    move = out["rightsize_action"].astype(str) + " to " + out["rightsize_to"].astype(str)
+    text = np.where(out["rightsize_savings"].notna(),
+                    move + ", save $" + out["rightsize_savings"].map(lambda v: f"{v:,.2f}"), move)
+    out["rightsize"] = pd.Series(np.where(out["rightsize_to"].notna(), text, ""), index=out.index)
+    return out
+
+
+# -------------------------------
+# Benchmark against moto's instance type catalog
+# -------------------------------
+def run_benchmark(instances=50_000):
+    import boto3
+    from moto import mock_aws
+
+    with mock_aws():
+        ec2 = boto3.client("ec2", region_name="us-east-1", aws_access_key_id="testing",
+                           aws_secret_access_key="testing")
+        capabilities = describe_capabilities(ec2)
+
+    # Prices roughly proportional to size, with memory-heavy classes costing more per vCPU
+    per_type = (0.02 * capabilities["vcpu"] + 0.005 * capabilities["memory_gib"]).to_numpy(dtype=np.float32)
+    price_of = dict(zip(capabilities["instance_type"], per_type))
+
+    def hourly_prices(types, regions):
+        return np.array([price_of.get(t, np.nan) for t in types], dtype=np.float32)
+
+    rng = np.random.default_rng(0)
+    common = capabilities[capabilities["family_class"].isin(["m", "c", "r", "t"])]["instance_type"].to_numpy()
+    df = pd.DataFrame({
+        "instance_type": rng.choice(common, instances),
+        "region": "us-east-1",
+        "status": rng.choice(["idle", "active"], instances, p=[0.3, 0.7]),
+        "p95_cpu": rng.gamma(2.0, 8.0, instances).clip(0, 100).astype(np.float32),
+        "p95_mem": rng.uniform(10, 90, instances).astype(np.float32),
+    })
+    df["max_cpu"] = np.minimum(df["p95_cpu"] * 1.5, 100).astype(np.float32)
+
+    started = time.perf_counter()
+    result = add_rightsizing(df, capabilities, hourly_prices)
+    elapsed = time.perf_counter() - started
+    changed = result["rightsize_to"].notna()
+    print(f"{instances} instances x {len(capabilities)} types in {elapsed:.2f}s: {int(changed.sum())} changes, "
+          f"${result['rightsize_savings'].sum():,.0f}/month")
+    print(result.loc[changed, ["instance_type", "p95_cpu", "p95_mem", "rightsize"]].head(5).to_string(index=False))
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,123 @@
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+import pandas as pd
+from botocore.exceptions import ClientError
+from results_format import write_sharded_results
+
+# -------------------------------
+# Run history layout
+# -------------------------------
+# Every scheduled run is kept under its own timestamped key, and a small SQLite
+# index maps run timestamp -> key -> summary so trends never need the payloads.
+HISTORY_PREFIX = "lambda-outputs/runs"
+INDEX_KEY = f"{HISTORY_PREFIX}/index.sqlite"
+MAX_INDEX_RETRIES = 5
+
+INDEX_COLUMNS = ["run_timestamp", "result_key", "total_instances_analyzed", "idle_instances",
+                 "active_instances", "potential_monthly_savings"]
+
+
+def run_timestamp(analysis):
+    value = analysis.get("metadata", {}).get("timestamp")
+    if value:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    else:
+        parsed = datetime.now(timezone.utc)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def run_key(timestamp, prefix=HISTORY_PREFIX):
+    stamp = timestamp.strftime("%Y%m%dT%H%M%SZ")
+    return f"{prefix}/{timestamp:%Y/%m/%d}/idle-instance-analysis-{stamp}.json"
+
+
+def _init_index(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS runs ("
+        " run_timestamp TEXT PRIMARY KEY,"
+        " result_key TEXT NOT NULL,"
+        " total_instances_analyzed INTEGER,"
+        " idle_instances INTEGER,"
+        " active_instances INTEGER,"
+        " potential_monthly_savings REAL)"
+    )
+
+
+def _is_conflict(error):
+    return error.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict")
+
+
+# -------------------------------
+# Writer (used by the idle-detection Lambda)
+# -------------------------------
+def record_run(s3, bucket_name, analysis, sharded=False, index_key=INDEX_KEY, prefix=HISTORY_PREFIX):
+    timestamp = run_timestamp(analysis)
+    key = run_key(timestamp, prefix=prefix)
+
+    if sharded:
+        write_sharded_results(s3, bucket_name, key, analysis)
+    else:
+        s3.put_object(Bucket=bucket_name, Key=key, Body=json.dumps(analysis, default=str).encode(),
+                      ContentType="application/json")
+
+    summary = analysis.get("summary", {})
+    row = (timestamp.isoformat(), key, summary.get("total_instances_analyzed", 0),
+           summary.get("idle_instances", 0), summary.get("active_instances", 0),
+           summary.get("potential_monthly_savings", 0.0))
+
+    # Read-modify-write of the index, guarded by a conditional PUT on its ETag so two
+    # overlapping runs cannot drop each other's rows
+    for _ in range(MAX_INDEX_RETRIES):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.sqlite")
+            try:
+                response = s3.get_object(Bucket=bucket_name, Key=index_key)
+                with open(path, "wb") as f:
+                    f.write(response["Body"].read())
+                condition = {"IfMatch": response["ETag"]}
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                    raise
+                condition = {"IfNoneMatch": "*"}
+
+            conn = sqlite3.connect(path)
+            _init_index(conn)
+            conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)", row)
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.close()
+
+            with open(path, "rb") as f:
+                body = f.read()
+            try:
+                s3.put_object(Bucket=bucket_name, Key=index_key, Body=body, **condition)
+                return key
+            except ClientError as e:
+                if not _is_conflict(e):
+                    raise
+    raise RuntimeError(f"Could not update {index_key} after {MAX_INDEX_RETRIES} attempts")
+
+
+# -------------------------------
+# Reader
+# -------------------------------
+def load_run_index(s3, bucket_name, cache, index_key=INDEX_KEY, since=None):
+    # The index is revalidated by ETag like the results object, so polling it is cheap
+    path, _ = cache.fetch(s3, bucket_name, index_key)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        query = f"SELECT {', '.join(INDEX_COLUMNS)} FROM runs"
+        params = ()
+        if since is not None:
+            query += " WHERE run_timestamp >= ?"
+            params = (since.isoformat(),)
+        df = pd.read_sql_query(query + " ORDER BY run_timestamp", conn, params=params)
+    finally:
+        conn.close()
+    df["run_timestamp"] = pd.to_datetime(df["run_timestamp"], utc=True)
+    return df
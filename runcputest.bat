@@ -1,38 +1,16 @@
 @echo off
-REM Usage: run_cpu_spike.bat
+REM Usage: runcputest.bat ["Key=Value" tag] [seconds] [cpu_percent]
+REM Runs the load generator on every running instance with the tag via fleet_loadtest.py
+REM (quote the tag; cmd splits unquoted arguments on "=")
 
-REM Set your instance IDs (comma-separated)
-set INSTANCE_IDS=i-0947fbb97472402b8,i-0b96e4c108e5d3b8a,i-00283969519116462
+set "TAG=%~1"
+if "%TAG%"=="" set "TAG=LoadTest=true"
+set "DURATION=%~2"
+if "%DURATION%"=="" set "DURATION=300"
+set "CPU_PERCENT=%~3"
+if "%CPU_PERCENT%"=="" set "CPU_PERCENT=80"
 
 REM Set AWS region
-set REGION=us-east-1
+if "%AWS_DEFAULT_REGION%"=="" set "AWS_DEFAULT_REGION=us-east-1"
 
-REM AWS CLI command to create & run CPU spike Python script on all instances
-aws ssm send-command ^
-  --targets "Key=instanceIds,Values=%INSTANCE_IDS%" ^
-  --document-name "AWS-RunShellScript" ^
-  --comment "Run Python CPU spike on 4 EC2 instances" ^
-  --parameters "commands=[
-\"cat > /tmp/cpu_spike.py <<EOF
-import time
-
-def simulate_cpu_spike(duration=30, cpu_percent=80):
-    print(f\\\"Simulating CPU spike at {cpu_percent}%...\\\")
-    start_time = time.time()
-    target_percent = cpu_percent / 100
-    total_iterations = int(target_percent * 5_000_000)
-    for _ in range(total_iterations):
-        result = 0
-        for i in range(1, 1001):
-            result += i
-    elapsed_time = time.time() - start_time
-    remaining_time = max(0, duration - elapsed_time)
-    time.sleep(remaining_time)
-    print(\\\"CPU spike simulation completed.\\\")
-
-if __name__ == '__main__':
-    simulate_cpu_spike(duration=30, cpu_percent=80)
-EOF\",
-\"python3 /tmp/cpu_spike.py\"
-]" ^
-  --region %REGION%
+python "%~dp0fleet_loadtest.py" "%TAG%" %DURATION% cpu=%CPU_PERCENT%
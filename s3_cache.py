@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from botocore.exceptions import ClientError
+from cache_paths import CACHE_DIR
+
+# -------------------------------
+# Cache settings
+# -------------------------------
+DEFAULT_CACHE_DIR = os.path.join(CACHE_DIR, "s3")
+# Reruns within this window reuse the local copy without asking S3 at all
+DEFAULT_MAX_AGE_SECONDS = 15
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def _is_not_modified(error):
+    response = error.response
+    return (response.get("Error", {}).get("Code") in ("304", "NotModified")
+            or response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304)
+
+
+# -------------------------------
+# Conditional-GET object cache
+# -------------------------------
+class S3ObjectCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_seconds
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, bucket, key):
+        digest = hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest), os.path.join(self.cache_dir, digest + ".meta.json")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _load_meta(self, meta_path):
+        # The metadata names the body file it describes, so replacing the metadata is what
+        # publishes a new version: a reader never pairs one version's ETag with another's body
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # Entries from before BodyFile existed are simply fetched again
+        if "BodyFile" not in meta or not os.path.exists(os.path.join(self.cache_dir, meta["BodyFile"])):
+            return None
+        return meta
+
+    def _write_meta(self, meta_path, meta):
+        tmp_path = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _get(self, s3, bucket, key, force_revalidate):
+        # Returns (body path, metadata, None) when the local copy is current; otherwise
+        # (None, previous metadata, download) with the new version still to be read
+        bucket, key = bucket.strip(), key.strip()
+        base, meta_path = self._paths(bucket, key)
+        meta = self._load_meta(meta_path)
+        body_path = meta and os.path.join(self.cache_dir, meta["BodyFile"])
+
+        if meta and not force_revalidate and time.time() - meta["validated_at"] < self.max_age_seconds:
+            self._count("hits")
+            return body_path, meta, None
+
+        request = {"Bucket": bucket, "Key": key}
+        if meta:
+            request["IfNoneMatch"] = meta["ETag"]
+        try:
+            response = s3.get_object(**request)
+        except ClientError as e:
+            if meta and _is_not_modified(e):
+                # 304: one round trip, no payload
+                self._count("revalidations")
+                meta["validated_at"] = time.time()
+                self._write_meta(meta_path, meta)
+                return body_path, meta, None
+            raise
+
+        self._count("misses")
+        return None, meta, _CachingBody(self, bucket, key, base, meta_path, response, meta)
+
+    def fetch(self, s3, bucket, key, force_revalidate=False):
+        # Returns (local_path, metadata) for an up-to-date copy of the object
+        body_path, meta, download = self._get(s3, bucket, key, force_revalidate)
+        if download is None:
+            return body_path, meta
+        with download:
+            while download.read(COPY_CHUNK_BYTES):
+                pass
+        return download.body_path, download.meta
+
+    def open(self, s3, bucket, key, force_revalidate=False):
+        # On a miss the object is parsed as it downloads: reads come straight from S3 and are
+        # written to the cache file on the way through
+        body_path, _, download = self._get(s3, bucket, key, force_revalidate)
+        return open(body_path, "rb") if download is None else download
+
+
+# -------------------------------
+# Tee from the S3 body into the cache
+# -------------------------------
+class _CachingBody:
+    # File-like reader over a GetObject body that copies every chunk into a new body file.
+    # Closing it drains whatever the caller didn't read, then publishes the file by
+    # replacing the metadata; leaving a with block on an exception discards the partial file.
+    def __init__(self, cache, bucket, key, base, meta_path, response, previous_meta):
+        self.cache = cache
+        self.meta_path = meta_path
+        self.response = response
+        self.previous_meta = previous_meta
+        self.body_path = f"{base}.{uuid.uuid4().hex}.body"
+        self.meta = {
+            "Bucket": bucket,
+            "Key": key,
+            "ETag": response["ETag"],
+            "LastModified": response["LastModified"].isoformat() if response.get("LastModified") else None,
+            "ContentLength": response.get("ContentLength"),
+            "BodyFile": os.path.basename(self.body_path),
+        }
+        self._file = open(self.body_path + ".tmp", "wb")
+        self.closed = False
+
+    def read(self, amt=None):
+        chunk = self.response["Body"].read(amt)
+        self._file.write(chunk)
+        return chunk
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            while self.read(COPY_CHUNK_BYTES):
+                pass
+        except BaseException:
+            self._discard()
+            raise
+        self._file.close()
+        self.response["Body"].close()
+        os.replace(self._file.name, self.body_path)
+        self.meta["validated_at"] = time.time()
+        self.cache._write_meta(self.meta_path, self.meta)
+        if self.previous_meta:
+            # Readers that already hold the old file keep their handle
+            try:
+                os.remove(os.path.join(self.cache.cache_dir, self.previous_meta["BodyFile"]))
+            except FileNotFoundError:
+                pass
+
+    def _discard(self):
+        self.closed = True
+        self._file.close()
+        self.response["Body"].close()
+        os.remove(self._file.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif not self.closed:
+            self._discard()
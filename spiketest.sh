@@ -1,36 +1,4 @@
-aws ssm send-command \
-  --targets "Key=instanceIds,Values=i-xxxx,i-yyyy,i-zzzz,i-wwww" \
-  --document-name "AWS-RunShellScript" \
-  --comment "Run CPU spike Python" \
-  --parameters 'commands=[
-"cat > /tmp/cpu_spike.py <<EOF
-import time
-def simulate_cpu_spike(duration=30, cpu_percent=80):
-    print(f"Simulating CPU spike at {cpu_percent}%...")
-    start_time = time.time()
-
-    # Calculate the number of iterations needed to achieve the desired CPU utilization
-    target_percent = cpu_percent / 100
-    total_iterations = int(target_percent * 5_000_000)  # Adjust the number as needed
-
-    # Perform simple arithmetic operations to spike CPU utilization
-    for _ in range(total_iterations):
-        result = 0
-        for i in range(1, 1001):
-            result += i
-
-    # Wait for the rest of the time interval
-    elapsed_time = time.time() - start_time
-    remaining_time = max(0, duration - elapsed_time)
-    time.sleep(remaining_time)
-
-    print("CPU spike simulation completed.")
-
-if __name__ == '__main__':
-    # Simulate a CPU spike for 30 seconds with 80% CPU utilization
-    simulate_cpu_spike(duration=30, cpu_percent=80)
-
-EOF",
-"python3 /tmp/cpu_spike.py"
-]' \
-  --region us-east-1
+#!/bin/bash
+# Short smoke test: 30s at 80% CPU on instances tagged LoadTest=true (see runcpuSpike.sh)
+AWS_DEFAULT_REGION="${AWS_DEFAULT_REGION:-us-east-1}" \
+  python3 "$(dirname "$0")/fleet_loadtest.py" LoadTest=true 30 cpu=80
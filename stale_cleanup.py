@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from cache_paths import CACHE_DIR
+from throttling import RateLimiter, call_with_backoff
+
+# -------------------------------
+# Cleanup settings
+# -------------------------------
+# Sustained calls per second per region and API; EC2 throttles mutating calls per region,
+# so every region gets its own buckets
+DEFAULT_API_RATES = {
+    "CreateSnapshot": 2,
+    "DeleteVolume": 5,
+    "ReleaseAddress": 5,
+    "DeleteSnapshot": 5,
+}
+DEFAULT_MAX_WORKERS = 16
+# Final snapshots are the slow part (waiters can block for up to an hour); they run in their
+# own small pool so the fast deletes never queue behind them
+DEFAULT_SNAPSHOT_CONCURRENCY = 4
+AUDIT_LOG_PATH = os.path.join(CACHE_DIR, "cleanup-audit.jsonl")
+
+# status is one of: deleted, released, failed
+CleanupOutcome = namedtuple("CleanupOutcome", ["resource_type", "resource_id", "region", "action", "status",
+                                               "message", "final_snapshot_id", "elapsed"])
+
+
+def _error_message(error):
+    details = error.response.get("Error", {})
+    return f"{details.get('Code')}: {details.get('Message', '')}"
+
+
+# -------------------------------
+# Audit log (append-only JSON lines)
+# -------------------------------
+class AuditLog:
+    def __init__(self, path=AUDIT_LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def write(self, outcome, actor=None):
+        entry = {"timestamp": datetime.now(timezone.utc).isoformat(), "actor": actor, **outcome._asdict()}
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def tail(self, lines=200):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            return [json.loads(line) for line in f.readlines()[-lines:]]
+
+
+# -------------------------------
+# Per-resource actions
+# -------------------------------
+class _RegionLimits:
+    # Lazily builds one RateLimiter per (region, API)
+    def __init__(self, rates):
+        self.rates = rates
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, region, api):
+        with self._lock:
+            key = (region, api)
+            if key not in self._limiters:
+                self._limiters[key] = RateLimiter(self.rates[api], burst=self.rates[api])
+            return self._limiters[key]
+
+
+def delete_volume(ec2, row, limits, final_snapshot=False, waiter_delay=15):
+    region, volume_id = row["Region"], row["VolumeId"]
+    final_snapshot_id = None
+    if final_snapshot:
+        snapshot = call_with_backoff(ec2.create_snapshot, VolumeId=volume_id,
+                                     Description=f"Final snapshot before cleanup of {volume_id}",
+                                     limiter=limits.get(region, "CreateSnapshot"))
+        final_snapshot_id = snapshot["SnapshotId"]
+        # The volume must outlive the snapshot's copy of its blocks
+        ec2.get_waiter("snapshot_completed").wait(SnapshotIds=[final_snapshot_id],
+                                                  WaiterConfig={"Delay": waiter_delay, "MaxAttempts": 240})
+    call_with_backoff(ec2.delete_volume, VolumeId=volume_id, limiter=limits.get(region, "DeleteVolume"))
+    return "deleted", final_snapshot_id
+
+
+def release_eip(ec2, row, limits):
+    allocation_id = row.get("AllocationId")
+    kwargs = {"AllocationId": allocation_id} if allocation_id and allocation_id != "N/A" \
+        else {"PublicIp": row["PublicIp"]}
+    call_with_backoff(ec2.release_address, limiter=limits.get(row["Region"], "ReleaseAddress"), **kwargs)
+    return "released", None
+
+
+def delete_snapshot(ec2, row, limits):
+    call_with_backoff(ec2.delete_snapshot, SnapshotId=row["SnapshotId"],
+                      limiter=limits.get(row["Region"], "DeleteSnapshot"))
+    return "deleted", None
+
+
+RESOURCE_ID_FIELDS = {"volumes": "VolumeId", "eips": "PublicIp", "snapshots": "SnapshotId"}
+ACTIONS = {"volumes": "delete-volume", "eips": "release-address", "snapshots": "delete-snapshot"}
+
+
+# -------------------------------
+# Parallel cleanup
+# -------------------------------
+def iter_cleanup(selections, session=None, final_snapshots=True, max_workers=DEFAULT_MAX_WORKERS,
+                 snapshot_concurrency=DEFAULT_SNAPSHOT_CONCURRENCY, rates=None, audit_log=None,
+                 waiter_delay=15):
+    # selections: {"volumes": [row, ...], "eips": [...], "snapshots": [...]} using the
+    # stale_scanner row format. Outcomes are yielded as each resource finishes.
+    session = session or boto3.session.Session()
+    audit_log = audit_log or AuditLog()
+    limits = _RegionLimits({**DEFAULT_API_RATES, **(rates or {})})
+
+    regions = {row["Region"] for rows in selections.values() for row in rows}
+    config = Config(retries={"mode": "adaptive", "max_attempts": 10},
+                    max_pool_connections=max(10, max_workers))
+    clients = {r: session.client("ec2", region_name=r, config=config) for r in regions}
+    try:
+        actor = session.client("sts").get_caller_identity()["Arn"]
+    except Exception:
+        actor = None
+
+    def run(resource_type, row):
+        ec2 = clients[row["Region"]]
+        started = time.perf_counter()
+        final_snapshot_id = None
+        try:
+            if resource_type == "volumes":
+                status, final_snapshot_id = delete_volume(ec2, row, limits, final_snapshots, waiter_delay)
+            elif resource_type == "eips":
+                status, final_snapshot_id = release_eip(ec2, row, limits)
+            else:
+                status, final_snapshot_id = delete_snapshot(ec2, row, limits)
+            message = ""
+        except ClientError as e:
+            status, message = "failed", _error_message(e)
+        except Exception as e:
+            status, message = "failed", str(e)
+        outcome = CleanupOutcome(resource_type, row[RESOURCE_ID_FIELDS[resource_type]], row["Region"],
+                                 ACTIONS[resource_type], status, message, final_snapshot_id,
+                                 time.perf_counter() - started)
+        audit_log.write(outcome, actor)
+        return outcome
+
+    # Snapshot-then-delete volumes get their own pool; EIP releases, snapshot deletes and
+    # plain volume deletes share the main one
+    with ThreadPoolExecutor(max_workers=max_workers) as pool, \
+            ThreadPoolExecutor(max_workers=max(1, snapshot_concurrency)) as snapshot_pool:
+        futures = [(snapshot_pool if resource_type == "volumes" and final_snapshots else pool)
+                   .submit(run, resource_type, row)
+                   for resource_type, rows in selections.items() for row in rows]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# -------------------------------
+# Demo against moto
+# -------------------------------
+def run_demo(regions=("us-east-1", "eu-west-1"), volumes=100, snapshots=100, eips=5):
+    import tempfile
+    from moto import mock_aws
+    from stale_scanner import _seed_region, iter_stale_resources
+
+    os.environ.setdefault("MOTO_EC2_LOAD_DEFAULT_AMIS", "false")
+    with mock_aws(), tempfile.TemporaryDirectory() as tmp:
+        session = boto3.session.Session(aws_access_key_id="testing", aws_secret_access_key="testing",
+                                        region_name=regions[0])
+        for region in regions:
+            _seed_region(session, region, volumes, snapshots, eips)
+
+        def scan():
+            found = {"volumes": [], "eips": [], "snapshots": []}
+            for result in iter_stale_resources(session, regions=list(regions), snapshot_max_age_days=-1):
+                found[result.resource_type].extend(result.rows)
+            return found
+
+        found = scan()
+        print("found", {k: len(v) for k, v in found.items()})
+        audit = AuditLog(os.path.join(tmp, "audit.jsonl"))
+        started = time.perf_counter()
+        statuses = {}
+        outcomes = list(iter_cleanup(found, session=session, audit_log=audit, waiter_delay=0,
+                                     rates={api: 1000 for api in DEFAULT_API_RATES}))
+        elapsed = time.perf_counter() - started
+        for outcome in outcomes:
+            statuses[outcome.status] = statuses.get(outcome.status, 0) + 1
+        print(f"{len(outcomes)} resources in {elapsed:.2f}s ({len(outcomes) / elapsed:.0f}/s): {statuses}; "
+              f"{len(audit.tail(10_000))} audit entries")
+        remaining = scan()
+        print("remaining", {k: len(v) for k, v in remaining.items()}, "(final snapshots are kept)")
+
+
+if __name__ == "__main__":
+    run_demo()
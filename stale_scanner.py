@@ -0,0 +1,202 @@
+import os
+import time
+import boto3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from botocore.config import Config
+from pricing_catalog import default_catalog
+
+# -------------------------------
+# Scan settings
+# -------------------------------
+# Prices come from pricing_catalog (volume type, region and snapshot tier aware)
+SNAPSHOT_MAX_AGE_DAYS = 60
+
+RESOURCE_TYPES = ("volumes", "eips", "snapshots")
+DEFAULT_MAX_WORKERS = 16
+
+# One result per (region, resource type) task, yielded as soon as it finishes
+ScanResult = namedtuple("ScanResult", ["region", "resource_type", "rows", "error", "elapsed"])
+
+
+# -------------------------------
+# Region discovery
+# -------------------------------
+def list_enabled_regions(session=None):
+    session = session or boto3.session.Session()
+    ec2 = session.client("ec2")
+    # Without AllRegions, DescribeRegions only returns regions enabled for the account
+    response = ec2.describe_regions()
+    return sorted(r["RegionName"] for r in response["Regions"])
+
+
+# -------------------------------
+# Per-resource scanners (paginated)
+# -------------------------------
+def scan_unattached_volumes(ec2, catalog=None):
+    region = ec2.meta.region_name
+    catalog = catalog or default_catalog()
+    paginator = ec2.get_paginator("describe_volumes")
+    rows = []
+    for page in paginator.paginate(Filters=[{"Name": "status", "Values": ["available"]}],
+                                   PaginationConfig={"PageSize": 500}):
+        for v in page["Volumes"]:
+            rows.append({
+                "VolumeId": v["VolumeId"],
+                "Size (GiB)": v["Size"],
+                "VolumeType": v.get("VolumeType", "N/A"),
+                "CreationDate": v["CreateTime"].strftime("%Y-%m-%d"),
+                "Region": region,
+                "EstimatedMonthlyCost($)": round(catalog.volume_monthly_cost(
+                    region, v.get("VolumeType", "gp2"), v["Size"], v.get("Iops"), v.get("Throughput")), 2)
+            })
+    return rows
+
+
+def scan_unassociated_eips(ec2, catalog=None):
+    region = ec2.meta.region_name
+    eip_cost = round((catalog or default_catalog()).eip_monthly_cost(region), 2)
+    # DescribeAddresses has no paginator; it always returns the full list for the region
+    addresses = ec2.describe_addresses()
+    return [
+        {
+            "PublicIp": addr["PublicIp"],
+            "AllocationId": addr.get("AllocationId", "N/A"),
+            "Domain": addr.get("Domain", "N/A"),
+            "Region": region,
+            "EstimatedMonthlyCost($)": eip_cost
+        }
+        for addr in addresses["Addresses"]
+        # Moto reports an empty InstanceId rather than omitting it
+        if not addr.get("InstanceId") and not addr.get("AssociationId")
+    ]
+
+
+def scan_old_snapshots(ec2, max_age_days=SNAPSHOT_MAX_AGE_DAYS, catalog=None):
+    region = ec2.meta.region_name
+    catalog = catalog or default_catalog()
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+    paginator = ec2.get_paginator("describe_snapshots")
+    rows = []
+    for page in paginator.paginate(OwnerIds=["self"], PaginationConfig={"PageSize": 1000}):
+        for s in page["Snapshots"]:
+            start_time = s["StartTime"]
+            if start_time.tzinfo is None:
+                start_time = start_time.replace(tzinfo=timezone.utc)
+            if start_time >= cutoff_date:
+                continue
+            rows.append({
+                "SnapshotId": s["SnapshotId"],
+                "VolumeId": s.get("VolumeId", "N/A"),
+                "StartTime": start_time.strftime("%Y-%m-%d"),
+                "State": s["State"],
+                "Size (GiB)": s.get("VolumeSize", 0),
+                "Region": region,
+                "StorageTier": s.get("StorageTier", "standard"),
+                "EstimatedMonthlyCost($)": round(catalog.snapshot_monthly_cost(
+                    region, s.get("VolumeSize", 0), s.get("StorageTier", "standard")), 2)
+            })
+    return rows
+
+
+SCANNERS = {
+    "volumes": scan_unattached_volumes,
+    "eips": scan_unassociated_eips,
+}
+
+
+def _run_scan(ec2, resource_type, snapshot_max_age_days, catalog):
+    started = time.perf_counter()
+    try:
+        if resource_type == "snapshots":
+            rows = scan_old_snapshots(ec2, max_age_days=snapshot_max_age_days, catalog=catalog)
+        else:
+            rows = SCANNERS[resource_type](ec2, catalog=catalog)
+        error = None
+    except Exception as e:
+        rows, error = [], str(e)
+    return ScanResult(ec2.meta.region_name, resource_type, rows, error,
+                      time.perf_counter() - started)
+
+
+# -------------------------------
+# Fan-out across regions x resource types
+# -------------------------------
+def iter_stale_resources(session=None, regions=None, resource_types=RESOURCE_TYPES,
+                         max_workers=DEFAULT_MAX_WORKERS,
+                         snapshot_max_age_days=SNAPSHOT_MAX_AGE_DAYS, catalog=None):
+    session = session or boto3.session.Session()
+    # Opened once here so the worker threads share one memory-mapped index
+    catalog = catalog or default_catalog()
+    if regions is None:
+        regions = list_enabled_regions(session)
+
+    # Sessions are not thread-safe, so every client is built here before fanning out;
+    # the clients themselves are safe to share across the pool.
+    config = Config(retries={"mode": "adaptive", "max_attempts": 10},
+                    max_pool_connections=max(10, max_workers))
+    clients = {r: session.client("ec2", region_name=r, config=config) for r in regions}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_run_scan, clients[region], resource_type, snapshot_max_age_days, catalog)
+            for region in regions
+            for resource_type in resource_types
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def total_estimated_savings(*row_lists):
+    return sum(row["EstimatedMonthlyCost($)"] for rows in row_lists for row in rows)
+
+
+# -------------------------------
+# Benchmark (moto-backed)
+# -------------------------------
+def _seed_region(session, region, volumes, snapshots, eips):
+    ec2 = session.client("ec2", region_name=region)
+    zone = f"{region}a"
+    for _ in range(volumes):
+        ec2.create_volume(AvailabilityZone=zone, Size=8)
+    volume_id = ec2.create_volume(AvailabilityZone=zone, Size=8)["VolumeId"]
+    for _ in range(snapshots):
+        ec2.create_snapshot(VolumeId=volume_id)
+    for _ in range(eips):
+        ec2.allocate_address(Domain="vpc")
+
+
+def run_benchmark(region_counts=(1, 2, 4, 8, 17), latency_ms=50, volumes=200,
+                  snapshots=50, eips=5, max_workers=DEFAULT_MAX_WORKERS):
+    from moto import mock_aws
+
+    # Skip moto's bundled AMIs so only the seeded snapshots are scanned
+    os.environ.setdefault("MOTO_EC2_LOAD_DEFAULT_AMIS", "false")
+    with mock_aws():
+        session = boto3.session.Session(aws_access_key_id="testing",
+                                        aws_secret_access_key="testing",
+                                        region_name="us-east-1")
+        all_regions = session.get_available_regions("ec2")[:max(region_counts)]
+        for region in all_regions:
+            _seed_region(session, region, volumes, snapshots, eips)
+
+        # Moto answers in-process, so add a fixed per-call delay to stand in for network latency
+        session.events.register("before-call.ec2", lambda **kwargs: time.sleep(latency_ms / 1000))
+
+        print(f"{'regions':>8} {'serial (s)':>12} {'pooled (s)':>12} {'speedup':>8} {'rows':>8}")
+        for count in region_counts:
+            regions = all_regions[:count]
+            timings = {}
+            for workers in (1, max_workers):
+                started = time.perf_counter()
+                # moto stamps snapshots with the current time, so count every snapshot as old
+                rows = sum(len(r.rows) for r in iter_stale_resources(
+                    session, regions=regions, max_workers=workers, snapshot_max_age_days=-1))
+                timings[workers] = time.perf_counter() - started
+            serial, pooled = timings[1], timings[max_workers]
+            print(f"{count:>8} {serial:>12.2f} {pooled:>12.2f} {serial / pooled:>7.1f}x {rows:>8}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -1,8 +1,18 @@
 import streamlit as st
 import boto3
-import json
+import functools
 import pandas as pd
 import plotly.express as px
+from botocore.exceptions import ClientError
+from analysis_stream import load_analysis
+from chart_data import histogram_bins, status_counts
+from results_format import is_sharded, load_sharded_results, select_shards, shard_values
+from instance_actions import iter_stop_instances
+from instance_pricing import InstancePriceIndex, reprice_savings
+from rightsizing import add_rightsizing, load_capabilities
+from lambda_runs import get_active_run, poll_run, start_run
+from run_history import load_run_index
+from s3_cache import S3ObjectCache
 
 # -------------------------------
 # Streamlit Page Configuration
@@ -20,37 +30,278 @@ st.set_page_config(
 def get_aws_clients():
     return {
         "s3": boto3.client("s3"),
-        "lambda": boto3.client("lambda")
+        "lambda": boto3.client("lambda"),
+        "ec2": boto3.client("ec2")
     }
 
 # -------------------------------
 # Helper to read JSON from S3
 # -------------------------------
 
-def get_lambda_results_from_s3(bucket_name, key):
+@st.cache_resource
+def get_s3_cache():
+    return S3ObjectCache()
+
+
+def get_lambda_results_from_s3(bucket_name, key, on_header=None, force_revalidate=False):
     try:
         clients = get_aws_clients()
-        response = clients["s3"].get_object(Bucket='cost-optimization-data-s3', Key="lambda-outputs/idle-instance-analysis.json")
-        data = json.loads(response["Body"].read())
-        return data
+        # Revalidate the local copy with its ETag, then parse it incrementally
+        with get_s3_cache().open(clients["s3"], bucket_name, key, force_revalidate) as body:
+            return load_analysis(body, on_header=on_header)
     except Exception as e:
         st.error(f"Error reading from S3: {str(e)}")
         return None
 
+# -------------------------------
+# Run history index
+# -------------------------------
+def get_run_history(bucket_name):
+    try:
+        return load_run_index(get_aws_clients()["s3"], bucket_name.strip(), get_s3_cache())
+    except ClientError as e:
+        # No index yet just means no runs have been recorded with history enabled
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            st.error(f"Error reading run history: {str(e)}")
+        return None
+
 # -------------------------------
 # Invoke Lambda for fresh analysis
 # -------------------------------
-def invoke_lambda_analysis(function_name="Detect_idle_ec2-instances"):
+RUN_POLL_SECONDS = 5
+
+
+def invoke_lambda_analysis(bucket_name, results_key, function_name="Detect_idle_ec2-instances"):
+    # Fire-and-forget invocation; joins the run already in progress if there is one
     try:
         clients = get_aws_clients()
-        response = clients["lambda"].invoke(
-            FunctionName=function_name,
-            InvocationType="RequestResponse"
-        )
-        return json.loads(response["Payload"].read())
+        run_id, started = start_run(clients["lambda"], clients["s3"], bucket_name.strip(),
+                                    function_name, results_key.strip())
+        return run_id, started
     except Exception as e:
         st.error(f"Error invoking Lambda: {str(e)}")
+        return None, False
+
+
+@st.fragment(run_every=RUN_POLL_SECONDS)
+def render_run_progress(bucket_name):
+    # Reruns on its own every few seconds, so the rest of the page stays interactive
+    run_id = st.session_state.get("run_id")
+    if not run_id:
+        return
+    # Completes on a status document or on a new results object, whichever appears first
+    status = poll_run(get_aws_clients()["s3"], bucket_name.strip(), run_id)
+    state = status.get("state", "queued")
+
+    if state == "succeeded":
+        st.session_state.pop("run_id", None)
+        st.session_state.force_revalidate = True
+        st.cache_data.clear()
+        st.rerun()
+    elif state == "failed":
+        st.session_state.pop("run_id", None)
+        st.error(f"Analysis run {run_id} failed: {status.get('message', 'unknown error')}")
+    else:
+        st.progress(min(float(status.get("progress", 0.0)), 1.0),
+                    text=f"Analysis run {run_id}: {state} — {status.get('message', '')}")
+
+# -------------------------------
+# Bulk stop / hibernate
+# -------------------------------
+def run_instance_action(instance_ids, regions=None, hibernate=False, dry_run_only=True):
+    # Groups the selection per region and streams outcomes into the page as batches finish
+    default_region = boto3.session.Session().region_name or "us-east-1"
+    by_region = {}
+    for instance_id, region in zip(instance_ids, regions or [None] * len(instance_ids)):
+        region = region if isinstance(region, str) and region else default_region
+        by_region.setdefault(region, []).append(instance_id)
+
+    progress = st.progress(0.0, text="Dry run...")
+    live = st.empty()
+    outcomes = st.session_state.setdefault("action_outcomes", {})
+    rows = []
+    for batch in iter_stop_instances(by_region, hibernate=hibernate, dry_run_only=dry_run_only):
+        rows.extend(o._asdict() for o in batch)
+        outcomes.update({o.instance_id: f"{o.status}: {o.message}" for o in batch})
+        progress.progress(min(len(rows) / len(instance_ids), 1.0),
+                          text=f"{len(rows)}/{len(instance_ids)} instances processed")
+        live.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+    failed = sum(1 for r in rows if r["status"] == "failed")
+    if failed:
+        st.error(f"{failed} of {len(rows)} instances failed; see the Last Action column.")
+    elif dry_run_only:
+        st.success(f"Dry run passed for {len(rows)} instances. Untick 'Dry run only' to apply.")
+    else:
+        st.success(f"{len(rows)} instances are {'hibernating' if hibernate else 'stopping'}.")
+
+# -------------------------------
+# Sidebar: S3 cache statistics
+# -------------------------------
+def render_s3_cache_stats():
+    stats = get_s3_cache().stats
+    st.sidebar.subheader("🗄️ S3 Results Cache")
+    st.sidebar.metric("Hits", stats["hits"])
+    st.sidebar.metric("Misses (full download)", stats["misses"])
+    st.sidebar.metric("Revalidated (304)", stats["revalidations"])
+
+# -------------------------------
+# Sidebar: pricing assumptions
+# -------------------------------
+@st.cache_resource
+def get_instance_price_index():
+    # Built offline with `python instance_pricing.py <EC2 offer files>`; None if absent.
+    # An index in an older layout raises, so it is not cached and a rebuild is picked up
+    return InstancePriceIndex.load_default()
+
+
+def render_pricing_assumptions(price_index):
+    st.sidebar.subheader("💲 Pricing Assumptions")
+    if not st.sidebar.checkbox("Re-price savings locally", value=False):
         return None
+    labels = price_index.labels
+    return {
+        "operating_system": st.sidebar.selectbox("Operating system", labels["operating_system"],
+                                                 index=labels["operating_system"].index("Linux")
+                                                 if "Linux" in labels["operating_system"] else 0),
+        "tenancy": st.sidebar.selectbox("Tenancy", labels["tenancy"],
+                                        index=labels["tenancy"].index("Shared")
+                                        if "Shared" in labels["tenancy"] else 0),
+        "license_model": st.sidebar.selectbox("License model", [None] + labels["license_model"],
+                                              format_func=lambda v: "Default for the OS" if v is None else v),
+        "purchase_option": st.sidebar.selectbox("Purchase option", labels["purchase_option"]),
+        "default_region": st.sidebar.selectbox("Region for rows without one", labels["region"],
+                                               index=labels["region"].index("us-east-1")
+                                               if "us-east-1" in labels["region"] else 0),
+    }
+
+
+def reprice_analysis(data, price_index, assumptions):
+    # One vectorized gather per frame; the summary total follows the new prices
+    detailed = reprice_savings(data["detailed_analysis"], price_index, **assumptions)
+    idle = reprice_savings(data["idle_instances"], price_index, **assumptions)
+    savings = detailed.loc[detailed["status"] == "idle", "estimated_savings"].sum() \
+        if "status" in detailed.columns else idle["estimated_savings"].sum()
+    summary = {**data["summary"], "potential_monthly_savings": float(savings)}
+    return {**data, "detailed_analysis": detailed, "idle_instances": idle, "summary": summary}
+
+# -------------------------------
+# Sidebar: rightsizing
+# -------------------------------
+@st.cache_resource
+def get_instance_capabilities():
+    # vCPU / memory / family / generation per type, cached on disk for a week. Errors
+    # propagate so a failed describe is retried on the next rerun instead of cached
+    return load_capabilities(get_aws_clients()["ec2"])
+
+
+def rightsize_analysis(data, capabilities, price_index=None, assumptions=None):
+    # Active instances get a "downsize to X, save $Y" column next to the idle/active status
+    hourly_prices = None
+    if price_index is not None:
+        options = {k: v for k, v in (assumptions or {}).items() if k != "default_region"}
+        hourly_prices = functools.partial(price_index.hourly, **options)
+    detailed = add_rightsizing(data["detailed_analysis"], capabilities, hourly_prices)
+    return {**data, "detailed_analysis": detailed}
+
+
+# -------------------------------
+# Summary block
+# -------------------------------
+def render_summary(placeholder, metadata, summary):
+    with placeholder.container():
+        st.subheader("📈 Analysis Summary")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Instances", summary.get("total_instances_analyzed", 0))
+        with col2:
+            st.metric("Idle Instances", summary.get("idle_instances", 0))
+        with col3:
+            st.metric("Active Instances", summary.get("active_instances", 0))
+        with col4:
+            st.metric("Potential Savings", f"${summary.get('potential_monthly_savings', 0):,.2f}")
+
+        with st.expander("Analysis Metadata"):
+            st.write(f"**Timestamp:** {metadata.get('timestamp','N/A')}")
+            st.write(f"**Evaluation Period:** {metadata.get('evaluation_period_minutes',0)} minutes")
+            st.write(f"**CPU Threshold:** {metadata.get('cpu_threshold',0)}%")
+            st.write(f"**Network Threshold:** {metadata.get('network_threshold',0)} bytes")
+
+# -------------------------------
+# Instance details table (paged)
+# -------------------------------
+DETAIL_COLUMNS = ["instance_id", "instance_type", "status", "avg_cpu",
+                  "max_cpu", "total_network", "recommendation", "estimated_savings", "rightsize"]
+DETAIL_FORMATS = {
+    "avg_cpu": "{:.2f}%",
+    "max_cpu": "{:.2f}%",
+    "total_network": "{:,.0f} bytes",
+    "estimated_savings": "${:,.2f}"
+}
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def query_details(df, search="", statuses=None, instance_types=None, sort_by=None, ascending=True):
+    # Filter and sort on the typed frame; returns row positions rather than a copy of the frame
+    mask = pd.Series(True, index=df.index)
+    if search:
+        mask &= df["instance_id"].str.contains(search, case=False, regex=False).fillna(False)
+    if statuses:
+        mask &= df["status"].isin(statuses)
+    if instance_types:
+        mask &= df["instance_type"].isin(instance_types)
+    selected = df.index[mask.to_numpy()]
+    if sort_by:
+        column = df.loc[selected, sort_by]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Category codes follow first appearance, so sort on the labels instead
+            column = column.astype("string")
+        selected = column.sort_values(ascending=ascending, kind="stable").index
+    return selected
+
+
+def format_window(window):
+    window = window.copy()
+    for column, fmt in DETAIL_FORMATS.items():
+        if column in window.columns:
+            window[column] = [fmt.format(v) if pd.notna(v) else "" for v in window[column]]
+    return window
+
+
+@st.fragment
+def render_details_table(df):
+    # A fragment, so paging and sorting rerun only the table; only the visible rows
+    # are formatted and sent to the browser
+    columns = [c for c in DETAIL_COLUMNS if c in df.columns]
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        search = st.text_input("Search instance ID", key="details_search")
+    with col2:
+        statuses = st.multiselect("Status", sorted(df["status"].dropna().unique()), key="details_status")
+    with col3:
+        types = st.multiselect("Instance type", sorted(df["instance_type"].dropna().unique()),
+                               key="details_types")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_by = st.selectbox("Sort by", columns, index=columns.index("estimated_savings")
+                               if "estimated_savings" in columns else 0, key="details_sort")
+    with col2:
+        ascending = st.toggle("Ascending", value=False, key="details_ascending")
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key="details_page_size")
+
+    rows = query_details(df, search, statuses, types, sort_by, ascending)
+    pages = max(1, -(-len(rows) // page_size))
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="details_page")
+    page = min(page, pages)
+
+    start = (page - 1) * page_size
+    window = df.loc[rows[start:start + page_size], columns]
+    st.dataframe(format_window(window), hide_index=True, use_container_width=True)
+    st.caption(f"Rows {min(start + 1, len(rows))}–{start + len(window)} of {len(rows):,}"
+               f" (fleet: {len(df):,}) · page {page} of {pages}")
 
 # -------------------------------
 # Main App
@@ -82,79 +333,117 @@ def main():
     col1, col2 = st.columns([1, 1])
     with col1:
         if st.button("🔄 Run New Analysis"):
-            with st.spinner("Invoking Lambda function..."):
-                result = invoke_lambda_analysis()
-                if result:
-                    st.success("Analysis completed! Refreshing data...")
-                    st.cache_data.clear()
-                    st.rerun()
+            run_id, started = invoke_lambda_analysis(s3_bucket, s3_key)
+            if run_id:
+                st.session_state.run_id = run_id
+                if started:
+                    st.success(f"Started analysis run {run_id}")
                 else:
-                    st.error("Lambda invocation failed")
+                    st.info(f"Analysis run {run_id} is already in progress; following it")
+            else:
+                st.error("Lambda invocation failed")
 
     with col2:
         if st.button("📊 Refresh Dashboard"):
             st.cache_data.clear()
+            st.session_state.force_revalidate = True
             st.rerun()
 
+    # Pick up a run started by another user so nobody triggers a duplicate
+    if "run_id" not in st.session_state:
+        active_run = get_active_run(get_aws_clients()["s3"], s3_bucket.strip())
+        if active_run:
+            st.session_state.run_id = active_run
+    render_run_progress(s3_bucket)
+
+    # ---------------------------
+    # Run selection (history index)
+    # ---------------------------
+    history = get_run_history(s3_bucket)
+    if history is not None and not history.empty:
+        runs = history.sort_values("run_timestamp", ascending=False)
+        labels = runs["run_timestamp"].dt.strftime("%Y-%m-%d %H:%M UTC").tolist()
+        choice = st.sidebar.selectbox("Analysis run", ["Latest"] + labels)
+        if choice != "Latest":
+            s3_key = runs["result_key"].iloc[labels.index(choice)]
+
     # ---------------------------
     # Load Data from S3
     # ---------------------------
-    if "auto_loaded" not in st.session_state:
-        st.session_state.auto_loaded = True
-        data = get_lambda_results_from_s3(s3_bucket, s3_key)
-    else:
-        data = get_lambda_results_from_s3(s3_bucket, s3_key)
+    # The summary renders as soon as its block is parsed, before the instance records
+    summary_area = st.empty()
+
+    def show_summary(metadata, summary):
+        render_summary(summary_area, metadata, summary)
+
+    with st.spinner("Loading analysis results..."):
+        data = get_lambda_results_from_s3(s3_bucket, s3_key, on_header=show_summary,
+                                          force_revalidate=st.session_state.pop("force_revalidate", False))
+    render_s3_cache_stats()
 
     if not data:
         st.warning("No analysis data found. Please run the Lambda function first.")
         return
 
+    if is_sharded(data):
+        # Sharded layout: only the shards for the selected regions are downloaded
+        all_regions = shard_values(data, "region")
+        regions = st.sidebar.multiselect("Regions", all_regions, default=all_regions)
+        with st.spinner(f"Loading {len(select_shards(data, regions))} result shards..."):
+            data = load_sharded_results(get_aws_clients()["s3"], s3_bucket.strip(), data,
+                                        regions=regions, cache=get_s3_cache())
+        show_summary(data["metadata"], data["summary"])
+
     # ---------------------------
-    # Summary Section
+    # Pricing assumptions (re-price savings locally)
     # ---------------------------
-    metadata = data.get("metadata", {})
-    summary = data.get("summary", {})
+    try:
+        price_index = get_instance_price_index()
+    except ValueError as e:
+        st.sidebar.warning(str(e))
+        price_index = None
+    if price_index is not None and not data["detailed_analysis"].empty:
+        assumptions = render_pricing_assumptions(price_index)
+        if assumptions:
+            data = reprice_analysis(data, price_index, assumptions)
+            show_summary(data["metadata"], data["summary"])
 
-    st.subheader("📈 Analysis Summary")
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric("Total Instances", summary.get("total_instances_analyzed", 0))
-    with col2:
-        st.metric("Idle Instances", summary.get("idle_instances", 0))
-    with col3:
-        st.metric("Active Instances", summary.get("active_instances", 0))
-    with col4:
-        st.metric("Potential Savings", f"${summary.get('potential_monthly_savings', 0):,.2f}")
+    # ---------------------------
+    # Rightsizing (alternative to stop for active instances)
+    # ---------------------------
+    if not data["detailed_analysis"].empty and "instance_type" in data["detailed_analysis"].columns:
+        st.sidebar.subheader("📐 Rightsizing")
+        if st.sidebar.checkbox("Recommend smaller instance types", value=False):
+            try:
+                data = rightsize_analysis(data, get_instance_capabilities(), price_index,
+                                          assumptions if price_index is not None else None)
+            except ClientError as e:
+                st.sidebar.warning(f"Could not describe instance types: {e}")
 
-    with st.expander("Analysis Metadata"):
-        st.write(f"**Timestamp:** {metadata.get('timestamp','N/A')}")
-        st.write(f"**Evaluation Period:** {metadata.get('evaluation_period_minutes',0)} minutes")
-        st.write(f"**CPU Threshold:** {metadata.get('cpu_threshold',0)}%")
-        st.write(f"**Network Threshold:** {metadata.get('network_threshold',0)} bytes")
+    # ---------------------------
+    # Trends across runs
+    # ---------------------------
+    if history is not None and len(history) > 1:
+        st.subheader("📉 Trends Across Runs")
+        col1, col2 = st.columns(2)
+        with col1:
+            fig_idle = px.line(history, x="run_timestamp", y=["idle_instances", "active_instances"],
+                               title="Idle vs Active Instances per Run")
+            fig_idle.update_layout(xaxis_title="Run", yaxis_title="Instances")
+            st.plotly_chart(fig_idle, use_container_width=True)
+        with col2:
+            fig_savings = px.line(history, x="run_timestamp", y="potential_monthly_savings",
+                                  title="Potential Monthly Savings per Run")
+            fig_savings.update_layout(xaxis_title="Run", yaxis_title="USD / month")
+            st.plotly_chart(fig_savings, use_container_width=True)
 
     # ---------------------------
     # Detailed Instance Analysis
     # ---------------------------
     st.subheader("📋 Instance Analysis Details")
-    detailed_analysis = data.get("detailed_analysis", [])
-    if detailed_analysis:
-        df = pd.DataFrame(detailed_analysis)
-
-        # Ensure numeric columns for charts
-        for col in ["avg_cpu", "max_cpu", "total_network", "estimated_savings"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        st.dataframe(
-            df[["instance_id", "instance_type", "status", "avg_cpu",
-                "max_cpu", "total_network", "recommendation", "estimated_savings"]]
-            .style.format({
-                "avg_cpu": "{:.2f}%",
-                "max_cpu": "{:.2f}%",
-                "total_network": "{:,.0f} bytes",
-                "estimated_savings": "${:,.2f}"
-            }),
-            use_container_width=True
-        )
+    df = data["detailed_analysis"]
+    if not df.empty:
+        render_details_table(df)
 
         # -----------------------
         # Visualizations
@@ -162,54 +451,69 @@ def main():
         st.subheader("📊 Visualizations")
         col1, col2 = st.columns(2)
 
+        # Only the aggregates are sent to the browser, not one value per instance
         with col1:
-            status_counts = df["status"].value_counts()
-            if not status_counts.empty:
+            counts = status_counts(df["status"])
+            if not counts.empty:
                 fig_pie = px.pie(
-                    values=status_counts.values,
-                    names=status_counts.index,
+                    counts,
+                    values="count",
+                    names="status",
                     title="Instance Status Distribution"
                 )
                 st.plotly_chart(fig_pie, use_container_width=True)
 
         with col2:
             if "avg_cpu" in df.columns:
-                fig_hist = px.histogram(
-                    df[df["status"] != "error"],
-                    x="avg_cpu",
-                    nbins=20,
+                bins = histogram_bins(df.loc[df["status"] != "error", "avg_cpu"], bins=20)
+                fig_hist = px.bar(
+                    bins,
+                    x="center",
+                    y="count",
                     title="CPU Utilization Distribution"
                 )
-                fig_hist.update_layout(xaxis_title="Average CPU %", yaxis_title="Count")
+                fig_hist.update_traces(width=(bins["right"] - bins["left"]).tolist())
+                fig_hist.update_layout(xaxis_title="Average CPU %", yaxis_title="Count", bargap=0)
                 st.plotly_chart(fig_hist, use_container_width=True)
 
         # -----------------------
         # Idle Instances (Actions)
         # -----------------------
-        idle_instances = data.get("idle_instances", [])
-        if idle_instances:
+        idle_df = data["idle_instances"]
+        if not idle_df.empty:
             st.subheader("💤 Idle Instances - Action Required")
-            idle_df = pd.DataFrame(idle_instances)
 
-            # Add a checkbox column for selection
-            idle_df["select"] = False
+            # Add a checkbox column for selection, plus the outcome of the last action
+            outcomes = st.session_state.get("action_outcomes", {})
+            idle_df["select"] = st.checkbox("Select all idle instances", key="select_all_idle")
+            idle_df["outcome"] = idle_df["instance_id"].map(outcomes).fillna("")
             edited_df = st.data_editor(
                 idle_df[["instance_id", "instance_type", "avg_cpu",
-                         "total_network", "estimated_savings", "select"]],
+                         "total_network", "estimated_savings", "select", "outcome"]],
                 column_config={
                     "select": st.column_config.CheckboxColumn("Select for Action"),
                     "estimated_savings": st.column_config.NumberColumn(
                         "Monthly Savings", format="$%.2f"
                     ),
-                    "avg_cpu": st.column_config.NumberColumn("Avg CPU %", format="%.2f")
+                    "avg_cpu": st.column_config.NumberColumn("Avg CPU %", format="%.2f"),
+                    "outcome": st.column_config.TextColumn("Last Action")
                 },
+                disabled=["outcome"],
                 use_container_width=True
             )
 
-            selected_instances = edited_df[edited_df["select"]]["instance_id"].tolist()
+            selected = edited_df["select"].to_numpy(dtype=bool)
+            selected_instances = edited_df.loc[selected, "instance_id"].tolist()
             if selected_instances:
-                if st.button(f"🛑 Stop {len(selected_instances)} Selected Instances"):
-                    st.warning("⚠️ Action not yet implemented. You can wire this to a cleanup Lambda.")
+                col1, col2 = st.columns(2)
+                with col1:
+                    hibernate = st.radio("Action", ["Stop", "Hibernate"], horizontal=True) == "Hibernate"
+                with col2:
+                    dry_run_only = st.checkbox("Dry run only", value=True)
+                label = "Hibernate" if hibernate else "Stop"
+                if st.button(f"🛑 {label} {len(selected_instances)} Selected Instances"):
+                    regions = idle_df.loc[selected, "region"].tolist() if "region" in idle_df.columns else None
+                    run_instance_action(selected_instances, regions, hibernate, dry_run_only)
     else:
         st.info("No detailed analysis available.")
 
@@ -217,7 +521,13 @@ def main():
     # Raw JSON
     # ---------------------------
     with st.expander("📂 Raw JSON Output"):
-        st.json(data)
+        # Records are held as DataFrames; show the small blocks and record counts only
+        st.json({
+            "metadata": data["metadata"],
+            "summary": data["summary"],
+            "detailed_analysis": f"{len(data['detailed_analysis'])} records",
+            "idle_instances": f"{len(data['idle_instances'])} records"
+        })
 
 
 # Run the app
@@ -0,0 +1,50 @@
+import io
+import json
+from analysis_stream import iter_analysis, load_analysis, read_analysis_header
+
+
+def _stream(document):
+    return io.BytesIO(json.dumps(document).encode())
+
+
+def test_iter_analysis_keeps_nested_fields_and_other_top_level_keys():
+    document = {"format": "sharded-v1", "metadata": {"run": 1}, "summary": {"idle_instances": 1},
+                "shards": [{"key": "a", "records": 2}],
+                "detailed_analysis": [{"instance_id": "i-1", "tags": {"team": "x"}, "hours": [1, 2]}]}
+    pairs = list(iter_analysis(_stream(document)))
+    assert pairs == [("format", "sharded-v1"), ("metadata", {"run": 1}), ("summary", {"idle_instances": 1}),
+                     ("shards", [{"key": "a", "records": 2}]),
+                     ("detailed_analysis", {"instance_id": "i-1", "tags": {"team": "x"}, "hours": [1, 2]})]
+
+
+def test_load_analysis_back_fills_columns_first_seen_mid_stream():
+    records = [{"instance_id": "i-1", "status": "idle", "avg_cpu": 1.5},
+               {"instance_id": "i-2", "status": "active", "avg_cpu": 30.0, "p95_mem": 40.0},
+               {"instance_id": "i-3", "status": "active"}]
+    result = load_analysis(_stream({"metadata": {}, "summary": {}, "detailed_analysis": records}), chunk_rows=2)
+    df = result["detailed_analysis"]
+    assert list(df["instance_id"]) == ["i-1", "i-2", "i-3"]
+    assert df["p95_mem"].isna().tolist() == [True, False, True]
+    assert df["avg_cpu"].isna().tolist() == [False, False, True]
+    assert str(df["avg_cpu"].dtype) == "float32"
+
+
+def test_read_analysis_header():
+    header = read_analysis_header(_stream({"metadata": {"a": 1}, "summary": {"b": 2}, "detailed_analysis": []}))
+    assert header == {"metadata": {"a": 1}, "summary": {"b": 2}}
+
+
+def test_records_split_across_small_reads_match_json_load(monkeypatch):
+    # Brackets and separators inside strings must not be taken for item boundaries
+    records = [{"instance_id": f"i-{i}", "status": "x}, {\"y\": 1}]", "avg_cpu": i / 2,
+                **({"tags": {"team": {"name": "}"}}} if i % 3 == 0 else {})} for i in range(40)]
+    document = {"metadata": {"run": "é"}, "summary": {}, "detailed_analysis": records,
+                "idle_instances": ["i-0", "i-3"], "tail": 12345}
+    for indent in (None, 2):
+        body = json.dumps(document, indent=indent, ensure_ascii=False).encode()
+        for size in (1, 7, 64, 1024):
+            monkeypatch.setattr("analysis_stream.READ_CHUNK_BYTES", size)
+            pairs = list(iter_analysis(io.BytesIO(body)))
+            assert pairs == [("metadata", {"run": "é"}), ("summary", {})] \
+                + [("detailed_analysis", r) for r in records] \
+                + [("idle_instances", "i-0"), ("idle_instances", "i-3"), ("tail", 12345)]
@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import date, timedelta
+from ce_cache import _as_date, iter_days
+from ce_fetcher import CE_MAX_TPS, fetch_cost_and_usage, month_windows
+
+SERVICE_GROUP = [{"Type": "DIMENSION", "Key": "SERVICE"}]
+
+
+class StubCostExplorer:
+    # Serves deterministic SERVICE-grouped daily costs, splitting each response into
+    # pages of page_size groups so periods straddle page boundaries
+    def __init__(self, services, page_size=7, latency=0.02):
+        self.services = list(services)
+        self.page_size = page_size
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def groups(self, start, end):
+        for day in iter_days(start, end):
+            for i, service in enumerate(self.services):
+                amount = f"{(day.toordinal() % 97) * 0.01 + i:.2f}"
+                yield day.isoformat(), {"Keys": [service],
+                                        "Metrics": {"UnblendedCost": {"Amount": amount, "Unit": "USD"}}}
+
+    def get_cost_and_usage(self, TimePeriod, Granularity, Metrics, GroupBy=None, NextPageToken=None):
+        with self._lock:
+            self.calls.append((time.monotonic(), TimePeriod["Start"], TimePeriod["End"]))
+        time.sleep(self.latency)
+
+        groups = list(self.groups(TimePeriod["Start"], TimePeriod["End"]))
+        offset = int(NextPageToken or 0)
+        results = []
+        for day, group in groups[offset:offset + self.page_size]:
+            if not results or results[-1]["TimePeriod"]["Start"] != day:
+                next_day = (_as_date(day) + timedelta(days=1)).isoformat()
+                results.append({"TimePeriod": {"Start": day, "End": next_day},
+                                "Total": {}, "Groups": [], "Estimated": False})
+            results[-1]["Groups"].append(group)
+
+        response = {"ResultsByTime": results, "GroupDefinitions": GroupBy or []}
+        if offset + self.page_size < len(groups):
+            response["NextPageToken"] = str(offset + self.page_size)
+        return response
+
+
+def test_month_windows_split_on_calendar_months():
+    assert month_windows(date(2025, 1, 15), date(2025, 3, 10)) == [
+        (date(2025, 1, 15), date(2025, 2, 1)), (date(2025, 2, 1), date(2025, 3, 1)),
+        (date(2025, 3, 1), date(2025, 3, 10))]
+    assert month_windows(date(2025, 1, 1), date(2025, 1, 1)) == []
+
+
+def test_pages_are_followed_and_stitched_in_order():
+    start, end = date(2025, 1, 15), date(2025, 4, 10)
+    stub = StubCostExplorer([f"Service {i}" for i in range(5)], page_size=12, latency=0)
+    results = fetch_cost_and_usage(stub, start, end, group_by=SERVICE_GROUP, max_tps=1000)
+
+    assert [r["TimePeriod"]["Start"] for r in results] == [d.isoformat() for d in iter_days(start, end)]
+    expected = {(day, g["Keys"][0]): g for day, g in stub.groups(start, end)}
+    assert all(len(r["Groups"]) == 5 for r in results)
+    for r in results:
+        for g in r["Groups"]:
+            assert expected[(r["TimePeriod"]["Start"], g["Keys"][0])] == g
+    # Every request stays inside one calendar month
+    windows = {(s, e) for _, s, e in stub.calls}
+    assert windows == {(s.isoformat(), e.isoformat()) for s, e in month_windows(start, end)}
+
+
+def test_requests_stay_under_the_rate_limit():
+    stub = StubCostExplorer([f"Service {i}" for i in range(5)], page_size=12)
+    fetch_cost_and_usage(stub, date(2025, 1, 15), date(2025, 4, 10), group_by=SERVICE_GROUP)
+    # Any one-second window may hold the initial burst plus CE_MAX_TPS further calls
+    times = [t for t, _, _ in stub.calls]
+    busiest = max(sum(1 for t in times if c <= t < c + 1) for c in times)
+    assert len(times) > CE_MAX_TPS * 2
+    assert busiest <= CE_MAX_TPS + 1
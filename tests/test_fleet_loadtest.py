@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+from fleet_loadtest import FleetLoadTest, LocalSSM, generator_bundle
+
+PROFILE = {"cpu": [{"shape": "constant", "value": 5, "duration": 1}], "options": {"cpu": {"workers": 1}}}
+
+
+def test_wiped_install_is_reinstalled_and_retried(tmp_path):
+    ssm = LocalSSM(root=str(tmp_path / "ssm"))
+    registry = str(tmp_path / "installed.json")
+    runner = FleetLoadTest(ssm, poll_seconds=0.1, installed_path=registry)
+    fleet = ["i-0000000001", "i-0000000002", "i-0000000003"]
+    digest, _ = generator_bundle()
+
+    report, pushed = runner.run(fleet, PROFILE)
+    assert pushed == 3
+    assert set(report["status"]) == {"Success"}
+
+    # The registry still lists the instance, but its generator directory is gone
+    shutil.rmtree(os.path.join(ssm.root, fleet[1]))
+    report, pushed = runner.run(fleet, PROFILE)
+    assert pushed == 1
+    assert sorted(report["instance_id"]) == fleet
+    assert set(report["status"]) == {"Success"}
+    with open(registry) as f:
+        assert json.load(f)[digest] == fleet
+
+
+def test_failed_load_reports_the_output_tail(tmp_path):
+    ssm = LocalSSM(root=str(tmp_path / "ssm"))
+    runner = FleetLoadTest(ssm, poll_seconds=0.1, installed_path=str(tmp_path / "installed.json"))
+    broken = ("broken0000000000", {"load_profiles.py": b"import sys\nprint('no space left on device')\nsys.exit(3)\n"})
+    report, _ = runner.run(["i-0000000001"], PROFILE, bundle=broken)
+    assert report["status"].iloc[0] == "Failed"
+    assert report["message"].iloc[0] == "no space left on device"
+
+
+def test_offline_instances_do_not_fail_their_batch_mates(tmp_path):
+    fleet = [f"i-{n:010d}" for n in range(6)]
+    ssm = LocalSSM(root=str(tmp_path / "ssm"), offline=[fleet[2]])
+    runner = FleetLoadTest(ssm, poll_seconds=0.1, installed_path=str(tmp_path / "installed.json"))
+    report, _ = runner.run(fleet, PROFILE)
+    statuses = dict(zip(report["instance_id"], report["status"]))
+    assert statuses.pop(fleet[2]) == "Undeliverable"
+    assert set(statuses.values()) == {"Success"}
+
+    # An instance that drops offline after the check only fails itself
+    ssm.offline = {fleet[4]}
+    racing = FleetLoadTest(ssm, poll_seconds=0.1, installed_path=str(tmp_path / "installed.json"))
+    racing.online = lambda ids: set(ids)
+    report, _ = racing.run(fleet, PROFILE)
+    statuses = dict(zip(report["instance_id"], report["status"]))
+    assert statuses.pop(fleet[4]) == "Failed"
+    assert set(statuses.values()) == {"Success"}
@@ -0,0 +1,16 @@
+import numpy as np
+from idle_classifier import classify_chunk, classify_fleet
+
+
+def test_zero_width_window_returns_no_data_rows():
+    result = classify_chunk(np.empty((3, 0)), np.empty((3, 0)))
+    assert list(result["status"]) == ["error"] * 3
+    assert list(result["datapoints"]) == [0, 0, 0]
+    assert np.isnan(result["p95_cpu"]).all() and np.isnan(result["avg_cpu"]).all()
+
+
+def test_zero_width_matches_all_nan_rows():
+    empty = classify_fleet(np.empty((2, 0)), np.empty((2, 0)))
+    missing = classify_fleet(np.full((2, 4), np.nan), np.full((2, 4), np.nan))
+    assert list(empty["status"]) == list(missing["status"])
+    assert set(empty) == set(missing)
@@ -0,0 +1,67 @@
+import io
+import json
+import boto3
+import numpy as np
+import pandas as pd
+from moto import mock_aws
+import idle_fanout
+from analysis_stream import load_analysis
+from metric_collector import MetricCube
+from results_format import is_sharded, load_sharded_results
+from run_history import INDEX_KEY
+
+
+def _cube(ids, cpu, network, memory):
+    return MetricCube(ids, ["us-east-1"] * len(ids), np.arange(cpu.shape[1]),
+                      ["CPUUtilization", "NetworkIn", "mem_used_percent"],
+                      np.stack([cpu, network, memory], axis=2).astype(np.float32), 0)
+
+
+def test_error_row_round_trips_through_analysis_stream(monkeypatch):
+    shard = {"shard_id": "00000", "region": "us-east-1", "instances": [
+        {"instance_id": "i-busy", "instance_type": "t3.medium", "region": "us-east-1"},
+        {"instance_id": "i-nodata", "instance_type": "t3.medium", "region": "us-east-1"},
+    ]}
+    cpu = np.vstack([np.full(12, 40.0), np.full(12, np.nan)])
+    network = np.vstack([np.full(12, 1e6), np.full(12, np.nan)])
+    memory = np.vstack([np.arange(12) * 5.0, np.full(12, np.nan)])
+    monkeypatch.setattr(idle_fanout, "_shard_cube",
+                        lambda shard, settings: _cube(["i-busy", "i-nodata"], cpu, network, memory))
+
+    partial = idle_fanout.analyze_shard(shard)
+    merged = idle_fanout.merge_partials([partial])
+    body = json.dumps(merged, allow_nan=False).encode()
+    df = load_analysis(io.BytesIO(body))["detailed_analysis"]
+
+    assert list(df["status"]) == ["active", "error"]
+    assert df["avg_cpu"].iloc[0] == 40.0
+    assert np.isnan(df["avg_cpu"].iloc[1]) and np.isnan(df["p95_cpu"].iloc[1])
+    assert df["p95_mem"].iloc[0] == np.float32(52.25) and np.isnan(df["p95_mem"].iloc[1])
+
+
+class _InlineBackend:
+    def run(self, shards, settings):
+        return [idle_fanout.analyze_shard(shard, settings) for shard in shards]
+
+
+def test_merged_analysis_is_published_for_the_dashboard_and_history():
+    fleet = [{"instance_id": f"i-{i:017x}", "instance_type": "t3.medium", "region": region}
+             for i, region in enumerate(["us-east-1", "eu-west-1"] * 30)]
+    settings = {"metrics_source": "synthetic", "evaluation_period_minutes": 120}
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1", aws_access_key_id="testing",
+                          aws_secret_access_key="testing")
+        s3.create_bucket(Bucket="results")
+        analysis = idle_fanout.run_fanout(_InlineBackend(), fleet, settings, shard_size=20, s3=s3,
+                                          bucket_name="results")
+        manifest = json.loads(s3.get_object(Bucket="results", Key=idle_fanout.DEFAULT_RESULTS_KEY)["Body"].read())
+        assert is_sharded(manifest)
+        loaded = load_sharded_results(s3, "results", manifest)
+        keys = [o["Key"] for o in s3.list_objects_v2(Bucket="results")["Contents"]]
+
+    assert isinstance(loaded["detailed_analysis"], pd.DataFrame)
+    assert len(loaded["detailed_analysis"]) == analysis["summary"]["total_instances_analyzed"] == 60
+    # The synthetic metrics include the agent's mem_used_percent, so rightsizing gets p95_mem
+    assert loaded["detailed_analysis"]["p95_mem"].between(0, 100).all()
+    assert INDEX_KEY in keys
+    assert any(k.startswith("lambda-outputs/runs/") and k.endswith(".json") for k in keys)
@@ -0,0 +1,54 @@
+import boto3
+import pytest
+from moto import mock_aws
+import instance_actions
+from instance_actions import iter_stop_instances
+
+REGIONS = ("us-east-1", "eu-west-1")
+MISSING = "i-0000000000000dead"
+
+
+@pytest.fixture
+def fleet(monkeypatch):
+    # Small batches so each region's selection spans several of them
+    monkeypatch.setenv("MOTO_EC2_LOAD_DEFAULT_AMIS", "false")
+    batches = instance_actions._batches
+    monkeypatch.setattr(instance_actions, "_batches", lambda ids: batches(ids, size=4))
+    with mock_aws():
+        session = boto3.session.Session(aws_access_key_id="testing", aws_secret_access_key="testing",
+                                        region_name=REGIONS[0])
+        instances = {}
+        for region in REGIONS:
+            reservation = session.client("ec2", region_name=region).run_instances(
+                ImageId="ami-12345678", MinCount=10, MaxCount=10, InstanceType="t3.micro")
+            instances[region] = [i["InstanceId"] for i in reservation["Instances"]]
+        yield session, instances
+
+
+def test_outcomes_arrive_per_batch_and_a_bad_id_only_fails_itself(fleet):
+    session, instances = fleet
+    instances[REGIONS[0]].append(MISSING)
+    batches = list(iter_stop_instances(instances, session=session))
+
+    # 11 IDs in one region and 10 in the other, four per call
+    assert sorted(len(b) for b in batches) == [2, 3, 4, 4, 4, 4]
+    outcomes = {o.instance_id: o for b in batches for o in b}
+    assert outcomes.pop(MISSING).status == "failed"
+    assert len(outcomes) == 20 and {o.status for o in outcomes.values()} == {"stopping"}
+
+
+def test_an_unexpected_error_fails_only_its_own_batch(fleet, monkeypatch):
+    session, instances = fleet
+    broken = instances[REGIONS[1]][4]
+    stop_batch = instance_actions.stop_batch
+
+    def flaky(ec2, region, instance_ids, hibernate=False, dry_run=False):
+        if broken in instance_ids:
+            raise RuntimeError("connection reset")
+        return stop_batch(ec2, region, instance_ids, hibernate, dry_run)
+
+    monkeypatch.setattr(instance_actions, "stop_batch", flaky)
+    outcomes = [o for b in iter_stop_instances(instances, dry_run_only=True, session=session) for o in b]
+    failed = {o.instance_id for o in outcomes if o.status == "failed"}
+    assert failed == set(instances[REGIONS[1]][4:8])
+    assert len(outcomes) == 20 and {o.status for o in outcomes if o.instance_id not in failed} == {"would-stop"}
@@ -0,0 +1,41 @@
+import json
+import numpy as np
+import pytest
+from instance_pricing import InstancePriceIndex, build_instance_index, iter_instance_prices, write_synthetic_offer
+
+
+def test_windows_license_models_are_priced_separately(tmp_path):
+    offer = str(tmp_path / "offer.json")
+    write_synthetic_offer(offer, families=("m5",), sizes=("large",), regions=("us-east-1",),
+                          systems=("Linux", "Windows"), tenancies=("Shared",))
+    on_demand = {key: price for key, option, price in iter_instance_prices(offer) if option == "On-Demand"}
+    included = on_demand[("m5.large", "us-east-1", "Windows", "Shared", "License Included")]
+    byol = on_demand[("m5.large", "us-east-1", "Windows", "Shared", "Bring your own license")]
+    assert byol < included
+
+    build_instance_index([offer], str(tmp_path))
+    index = InstancePriceIndex(str(tmp_path))
+    windows = index.hourly(["m5.large"], ["us-east-1"], operating_system="Windows")
+    assert np.isclose(windows[0], included, rtol=1e-6)
+    assert np.isclose(index.hourly(["m5.large"], ["us-east-1"], operating_system="Windows",
+                                   license_model="Bring your own license")[0], byol, rtol=1e-6)
+    linux = index.hourly(["m5.large"], ["us-east-1"])
+    assert np.isclose(linux[0], on_demand[("m5.large", "us-east-1", "Linux", "Shared", "No License required")],
+                      rtol=1e-6)
+
+
+def test_index_from_an_older_layout_is_refused(tmp_path):
+    offer = str(tmp_path / "offer.json")
+    write_synthetic_offer(offer, families=("m5",), sizes=("large",), regions=("us-east-1",),
+                          systems=("Linux",), tenancies=("Shared",))
+    build_instance_index([offer], str(tmp_path))
+    # Version 1 wrote the bare axis labels and had no license model axis
+    array_path, labels_path = str(tmp_path / "instance-prices.npy"), str(tmp_path / "instance-prices.json")
+    with open(labels_path) as f:
+        labels = json.load(f)["labels"]
+    del labels["license_model"]
+    with open(labels_path, "w") as f:
+        json.dump(labels, f)
+    np.save(array_path, np.load(array_path)[:, :, :, :, 0, :])
+    with pytest.raises(ValueError, match="rebuild"):
+        InstancePriceIndex(str(tmp_path))
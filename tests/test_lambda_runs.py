@@ -0,0 +1,54 @@
+import json
+import time
+import boto3
+import pytest
+from moto import mock_aws
+import lambda_runs
+from lambda_runs import ACTIVE_KEY, DEFAULT_RESULTS_KEY, poll_run, start_run
+
+BUCKET = "results-bucket"
+
+
+class _Lambda:
+    def __init__(self):
+        self.payloads = []
+
+    def invoke(self, **kwargs):
+        self.payloads.append(json.loads(kwargs["Payload"]))
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="testing",
+                              aws_secret_access_key="testing")
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key=DEFAULT_RESULTS_KEY, Body=b'{"old": true}')
+        yield client
+
+
+def _lock(s3):
+    try:
+        return json.loads(s3.get_object(Bucket=BUCKET, Key=ACTIVE_KEY)["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        return None
+
+
+def test_new_results_object_completes_the_run(s3):
+    run_id, started = start_run(_Lambda(), s3, BUCKET, "fn")
+    assert started and poll_run(s3, BUCKET, run_id)["state"] == "queued"
+
+    s3.put_object(Bucket=BUCKET, Key=DEFAULT_RESULTS_KEY, Body=b'{"new": true}')
+    assert poll_run(s3, BUCKET, run_id)["state"] == "succeeded"
+    assert _lock(s3) is None
+
+
+def test_run_without_results_times_out_and_releases_the_lock(s3, monkeypatch):
+    run_id, _ = start_run(_Lambda(), s3, BUCKET, "fn")
+    assert _lock(s3)["run_id"] == run_id
+
+    now = time.time()
+    monkeypatch.setattr(lambda_runs.time, "time", lambda: now + lambda_runs.STALE_RUN_SECONDS + 1)
+    status = poll_run(s3, BUCKET, run_id)
+    assert status["state"] == "failed"
+    assert _lock(s3) is None
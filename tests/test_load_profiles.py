@@ -0,0 +1,17 @@
+import threading
+import time
+from load_profiles import NetworkDriver
+
+
+def test_network_driver_stops_cleanly_mid_send(monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    driver = NetworkDriver()
+    driver.start()
+    driver.set(200e6)
+    time.sleep(0.2)
+    driver.stop()
+    assert driver.sent > 0
+    assert not driver._threads[-1].is_alive()
+    assert driver.sock.fileno() == -1 and driver._server.fileno() == -1
+    assert errors == []
@@ -0,0 +1,33 @@
+import numpy as np
+from metric_collector import MetricCube, classify_cube
+
+
+def _cube(metrics, values):
+    n, t = values[metrics[0]].shape
+    stacked = np.stack([values[m] for m in metrics], axis=2).astype(np.float32)
+    return MetricCube([f"i-{i}" for i in range(n)], ["us-east-1"] * n, list(range(t)), metrics, stacked, 0)
+
+
+def test_agentless_instance_falls_back_to_hypervisor_network():
+    t = 60
+    nan = np.full((2, t), np.nan)
+    values = {
+        "CPUUtilization": np.full((2, t), 1.0),
+        "cpu_usage_idle": np.vstack([np.full(t, 99.0), np.full(t, np.nan)]),
+        "NetworkIn": np.full((2, t), 2e9),
+        "NetworkOut": np.full((2, t), 1e6),
+        # Instance 0 runs the agent; instance 1 has no agent datapoints at all
+        "net_bytes_recv": np.vstack([np.full(t, 10.0), nan[0]]),
+        "net_bytes_sent": np.vstack([np.full(t, 10.0), nan[0]]),
+    }
+    result = classify_cube(_cube(list(values), values))
+    assert list(result["status"]) == ["idle", "active"]
+    assert np.isclose(result["total_network"][1], t * (2e9 + 1e6), rtol=1e-6)
+
+
+def test_missing_sent_spec_uses_received_only():
+    t = 60
+    values = {"CPUUtilization": np.full((1, t), 1.0), "net_bytes_recv": np.full((1, t), 100.0)}
+    result = classify_cube(_cube(list(values), values))
+    assert result["total_network"][0] == t * 100.0
+    assert list(result["status"]) == ["idle"]
@@ -0,0 +1,46 @@
+import os
+import pytest
+from pricing_catalog import (FALLBACK_MONTHLY, GP3_FREE_IOPS, GP3_FREE_THROUGHPUT, HOURS_PER_MONTH, PriceCatalog,
+                             PriceIndex, build_index, default_catalog, write_synthetic_offer)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    offer = str(tmp_path / "offer.json")
+    write_synthetic_offer(offer, filler_products=10)
+    path = str(tmp_path / "pricing.idx")
+    build_index([offer], path)
+    return path
+
+
+def test_volumes_are_priced_by_type_region_and_provisioning(index_path):
+    index = PriceIndex(index_path)
+    catalog = PriceCatalog(index)
+    # write_synthetic_offer marks up the n-th region by 10% per step; eu-west-1 is the third
+    markup = 1.2
+    gp3 = catalog.volume_monthly_cost("eu-west-1", "gp3", 100, iops=GP3_FREE_IOPS + 1000,
+                                      throughput=GP3_FREE_THROUGHPUT + 75)
+    expected = (100 * FALLBACK_MONTHLY["EBS:VolumeUsage.gp3"] + 1000 * FALLBACK_MONTHLY["EBS:VolumeP-IOPS.gp3"]
+                + 75 * FALLBACK_MONTHLY["EBS:VolumeP-Throughput.gp3"]) * markup
+    assert gp3 == pytest.approx(expected)
+    # Baseline gp3 IOPS and throughput are free
+    assert catalog.volume_monthly_cost("us-east-1", "gp3", 100, iops=GP3_FREE_IOPS, throughput=GP3_FREE_THROUGHPUT) \
+        == pytest.approx(100 * FALLBACK_MONTHLY["EBS:VolumeUsage.gp3"])
+    assert catalog.volume_monthly_cost("us-east-1", "io2", 10, iops=500) == pytest.approx(
+        10 * FALLBACK_MONTHLY["EBS:VolumeUsage.io2"] + 500 * FALLBACK_MONTHLY["EBS:VolumeP-IOPS.io2"])
+    assert catalog.snapshot_monthly_cost("eu-west-1", 50, "archive") == pytest.approx(
+        50 * FALLBACK_MONTHLY["EBS:SnapshotArchiveStorage"] * markup)
+    assert catalog.eip_monthly_cost("eu-west-1") == pytest.approx(0.005 * markup * HOURS_PER_MONTH)
+    # A region the index doesn't know falls back to us-east-1 list prices
+    assert catalog.volume_monthly_cost("me-south-1", "st1", 100) == pytest.approx(
+        100 * FALLBACK_MONTHLY["EBS:VolumeUsage.st1"])
+    index.close()
+
+
+def test_default_catalog_picks_up_an_index_built_later(tmp_path, index_path):
+    later = str(tmp_path / "later.idx")
+    assert default_catalog(later).index is None
+    os.replace(index_path, later)
+    catalog = default_catalog(later)
+    assert catalog.index is not None
+    assert default_catalog(later) is catalog
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+from rightsizing import add_rightsizing, parse_instance_type
+
+SPECS = {"m5.large": (2, 8), "m5.xlarge": (4, 16), "c5.large": (2, 4), "c5.xlarge": (4, 8)}
+
+
+def capabilities(specs=SPECS):
+    rows = []
+    for instance_type, (vcpu, memory) in specs.items():
+        family_class, generation, family, size = parse_instance_type(instance_type)
+        rows.append({"instance_type": instance_type, "family_class": family_class, "family": family,
+                     "generation": generation, "size": size, "vcpu": vcpu, "memory_gib": float(memory),
+                     "architecture": "x86_64", "burstable": False})
+    return pd.DataFrame(rows)
+
+
+def fleet():
+    return pd.DataFrame({"instance_type": ["m5.large", "m5.xlarge"], "status": ["active", "active"],
+                         "p95_cpu": [85.0, 10.0], "max_cpu": [85.0, 10.0], "p95_mem": [np.nan, 20.0]})
+
+
+def test_without_prices_only_smaller_types_are_offered():
+    out = add_rightsizing(fleet(), capabilities())
+    # A busy m5.large needs more vCPUs; that is never shown as a downsize without prices
+    assert pd.isna(out["rightsize_to"].iloc[0])
+    assert out["rightsize"].iloc[0] == ""
+    assert out["rightsize_to"].iloc[1] == "m5.large"
+    assert out["rightsize"].iloc[1] == "downsize to m5.large"
+
+
+def test_cheaper_bigger_type_is_labelled_an_upsize():
+    prices = {"m5.large": 0.20, "m5.xlarge": 0.192, "c5.large": 0.085, "c5.xlarge": 0.17}
+
+    def hourly_prices(types, regions):
+        return np.array([prices[t] for t in types], dtype=np.float32)
+
+    out = add_rightsizing(fleet(), capabilities(), hourly_prices)
+    assert out["rightsize_to"].iloc[0] == "c5.xlarge"
+    assert out["rightsize_action"].iloc[0] == "upsize"
+    assert out["rightsize"].iloc[0].startswith("upsize to c5.xlarge, save $")
+    assert out["rightsize_action"].iloc[1] == "downsize"
+
+
+def test_storage_networking_and_vendor_attributes_are_kept():
+    specs = {"c5d.xlarge": (4, 8), "c5d.large": (2, 4), "c5.large": (2, 4), "c5a.large": (2, 4),
+             "c5n.xlarge": (4, 10.5), "c5n.large": (2, 5.25), "c5ad.large": (2, 4)}
+    prices = {"c5d.xlarge": 0.192, "c5d.large": 0.096, "c5.large": 0.085, "c5a.large": 0.077,
+              "c5n.xlarge": 0.216, "c5n.large": 0.108, "c5ad.large": 0.086}
+
+    def hourly_prices(types, regions):
+        return np.array([prices[t] for t in types], dtype=np.float32)
+
+    df = pd.DataFrame({"instance_type": ["c5d.xlarge", "c5n.xlarge"], "status": ["active", "active"],
+                       "p95_cpu": [10.0, 10.0], "max_cpu": [10.0, 10.0], "p95_mem": [20.0, 20.0]})
+    out = add_rightsizing(df, capabilities(specs), hourly_prices)
+    # Cheaper types without local NVMe, enhanced networking or an Intel CPU are skipped
+    assert list(out["rightsize_to"]) == ["c5d.large", "c5n.large"]
@@ -0,0 +1,62 @@
+import json
+import os
+import boto3
+import pytest
+from moto import mock_aws
+from analysis_stream import read_analysis_header
+from s3_cache import S3ObjectCache
+
+BUCKET = "results-bucket"
+KEY = "lambda-outputs/idle-instance-analysis.json"
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="testing",
+                              aws_secret_access_key="testing")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def _document(run):
+    return json.dumps({"metadata": {"run": run}, "summary": {},
+                       "detailed_analysis": [{"instance_id": f"i-{i}"} for i in range(2000)]}).encode()
+
+
+def test_miss_is_parsed_while_it_downloads_and_cached_on_close(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=_document(1))
+    cache = S3ObjectCache(str(tmp_path), max_age_seconds=0)
+
+    with cache.open(s3, BUCKET, KEY) as body:
+        # Nothing is published until the download finishes
+        assert not os.path.exists(cache._paths(BUCKET, KEY)[1])
+        # The header is all this reader needs; closing drains the rest into the cache
+        assert read_analysis_header(body)["metadata"] == {"run": 1}
+    path, meta = cache.fetch(s3, BUCKET, KEY)
+    with open(path, "rb") as f:
+        assert f.read() == _document(1)
+    assert cache.stats == {"hits": 0, "misses": 1, "revalidations": 1}
+
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=_document(2))
+    with cache.open(s3, BUCKET, KEY) as body:
+        assert body.read() == _document(2)
+    new_path, new_meta = cache.fetch(s3, BUCKET, KEY)
+    assert new_meta["ETag"] != meta["ETag"] and not os.path.exists(path)
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(new_path),
+                                                   os.path.basename(cache._paths(BUCKET, KEY)[1])])
+
+
+def test_failed_read_leaves_the_previous_copy_in_place(s3, tmp_path):
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=_document(1))
+    cache = S3ObjectCache(str(tmp_path), max_age_seconds=0)
+    path, meta = cache.fetch(s3, BUCKET, KEY)
+
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=_document(2))
+    with pytest.raises(RuntimeError):
+        with cache.open(s3, BUCKET, KEY) as body:
+            body.read(100)
+            raise RuntimeError("parser gave up")
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(path),
+                                                   os.path.basename(cache._paths(BUCKET, KEY)[1])])
+    assert cache._load_meta(cache._paths(BUCKET, KEY)[1]) == meta
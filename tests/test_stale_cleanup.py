@@ -0,0 +1,39 @@
+import threading
+import boto3
+from moto import mock_aws
+import stale_cleanup
+from stale_cleanup import AuditLog, iter_cleanup
+
+
+def test_slow_final_snapshots_do_not_starve_fast_deletes(monkeypatch, tmp_path):
+    released = threading.Event()
+    in_flight = []
+
+    def slow_volume(ec2, row, limits, final_snapshot=False, waiter_delay=15):
+        in_flight.append(row["VolumeId"])
+        # Stands in for an hour-long snapshot waiter; finishes once the fast work is done
+        assert released.wait(timeout=10)
+        return "deleted", "snap-final"
+
+    fast = []
+    monkeypatch.setattr(stale_cleanup, "delete_volume", slow_volume)
+    monkeypatch.setattr(stale_cleanup, "release_eip", lambda ec2, row, limits: fast.append(1) or ("released", None))
+    monkeypatch.setattr(stale_cleanup, "delete_snapshot", lambda ec2, row, limits: fast.append(1) or ("deleted", None))
+
+    selections = {
+        "volumes": [{"Region": "us-east-1", "VolumeId": f"vol-{i}"} for i in range(20)],
+        "eips": [{"Region": "us-east-1", "PublicIp": f"10.0.0.{i}"} for i in range(20)],
+        "snapshots": [{"Region": "us-east-1", "SnapshotId": f"snap-{i}"} for i in range(20)],
+    }
+    with mock_aws():
+        session = boto3.session.Session(aws_access_key_id="testing", aws_secret_access_key="testing",
+                                        region_name="us-east-1")
+        outcomes = []
+        for outcome in iter_cleanup(selections, session=session, audit_log=AuditLog(str(tmp_path / "a.jsonl"))):
+            outcomes.append(outcome)
+            if len(fast) == 40 and not released.is_set():
+                # Every EIP and snapshot finished while volumes were still blocked
+                assert len(in_flight) <= stale_cleanup.DEFAULT_SNAPSHOT_CONCURRENCY
+                released.set()
+    assert len(outcomes) == 60
+    assert {o.status for o in outcomes} == {"deleted", "released"}
@@ -0,0 +1,48 @@
+import random
+import threading
+import time
+from botocore.exceptions import ClientError
+
+# -------------------------------
+# Token bucket shared by worker threads
+# -------------------------------
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# -------------------------------
+# Retry with exponential backoff and full jitter
+# -------------------------------
+RETRYABLE_ERROR_CODES = ("RequestLimitExceeded", "Throttling", "ThrottlingException", "TooManyRequestsException",
+                         "ServiceUnavailable", "Unavailable", "InternalError", "InternalFailure")
+
+
+def call_with_backoff(fn, *args, retries=5, base_delay=0.5, max_delay=20.0, limiter=None,
+                      retryable=RETRYABLE_ERROR_CODES, **kwargs):
+    # Retries only throttling/transient ClientErrors; anything else is raised immediately
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except ClientError as e:
+            if attempt == retries or e.response.get("Error", {}).get("Code") not in retryable:
+                raise
+        time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))